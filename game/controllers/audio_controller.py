@@ -3,6 +3,7 @@ import sounddevice as sd
 import numpy as np
 import logging
 import soundfile as sf
+from utils import song_package
 import time
 
 class AudioController:
@@ -72,17 +73,12 @@ class AudioController:
                     self.logger.warning(f"Skipping non-audio file: {audio_file}")
                     continue
                     
-                info = sf.info(audio_file)
-                if self.sample_rate is None:
-                    self.sample_rate = info.samplerate
-                
-                frames_to_read = int(30 * info.samplerate)
-                data, _ = sf.read(
-                    audio_file,
-                    dtype='float32',
-                    frames=frames_to_read,
-                    always_2d=True
-                )
+                with song_package.open_binary(audio_file) as f, sf.SoundFile(f) as sound_file:
+                    if self.sample_rate is None:
+                        self.sample_rate = sound_file.samplerate
+
+                    frames_to_read = int(30 * sound_file.samplerate)
+                    data = sound_file.read(frames_to_read, dtype='float32', always_2d=True)
                 self.original_audio_data[audio_file] = data
             
             if self.original_audio_data:  # Проверяем, что есть что кэшировать
@@ -96,15 +92,11 @@ class AudioController:
         """Загружает полные аудио файлы для режима игры."""
         try:
             for audio_file in self.audio_files:
-                info = sf.info(audio_file)
-                if self.sample_rate is None:
-                    self.sample_rate = info.samplerate
-                
-                data, _ = sf.read(
-                    audio_file,
-                    dtype='float32',
-                    always_2d=True
-                )
+                # soundfile не закрывает переданный файловый объект - закрываем сами
+                with song_package.open_binary(audio_file) as f, sf.SoundFile(f) as sound_file:
+                    if self.sample_rate is None:
+                        self.sample_rate = sound_file.samplerate
+                    data = sound_file.read(dtype='float32', always_2d=True)
                 self.audio_data[audio_file] = data
                 # Сохраняем копию оригинальных данных
                 self.original_audio_data[audio_file] = data.copy()
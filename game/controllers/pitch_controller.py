@@ -0,0 +1,188 @@
+# game/controllers/pitch_controller.py
+
+import threading
+import logging
+import numpy as np
+import sounddevice as sd
+
+
+def hz_to_midi(frequency):
+    """Переводит частоту в Гц в номер MIDI-ноты (дробный)."""
+    return 69.0 + 12.0 * np.log2(np.asarray(frequency, dtype=np.float64) / 440.0)
+
+
+def yin_pitch(frame, sample_rate, fmin=70.0, fmax=1000.0, threshold=0.15):
+    """
+    Оценивает основную частоту фрейма алгоритмом YIN.
+
+    :param frame: Одномерный массив отсчётов.
+    :param sample_rate: Частота дискретизации.
+    :return: Кортеж (частота в Гц или 0.0, уверенность 0..1).
+    """
+    x = np.asarray(frame, dtype=np.float64)
+    x = x - x.mean()
+    n = len(x)
+    tau_min = max(2, int(sample_rate / fmax))
+    tau_max = min(n - 1, int(sample_rate / fmin))
+    if tau_max <= tau_min:
+        return 0.0, 0.0
+
+    # Разностная функция через автокорреляцию в частотной области
+    spectrum = np.fft.rfft(x, 2 * n)
+    acf = np.fft.irfft(spectrum * np.conj(spectrum), 2 * n)[:tau_max + 1]
+    energy = np.concatenate(([0.0], np.cumsum(x * x)))
+    taus = np.arange(tau_max + 1)
+    diff = energy[n - taus] + (energy[n] - energy[taus]) - 2.0 * acf
+
+    # Кумулятивно-нормированная разностная функция
+    cmnd = np.ones_like(diff)
+    running = np.cumsum(diff[1:])
+    running[running == 0] = 1e-12
+    cmnd[1:] = diff[1:] * taus[1:] / running
+
+    candidates = np.flatnonzero(cmnd[tau_min:tau_max] < threshold)
+    if len(candidates):
+        tau = tau_min + candidates[0]
+        while tau + 1 < tau_max and cmnd[tau + 1] < cmnd[tau]:
+            tau += 1
+    else:
+        tau = tau_min + int(np.argmin(cmnd[tau_min:tau_max]))
+
+    # Параболическая интерполяция минимума
+    if 0 < tau < tau_max:
+        a, b, c = cmnd[tau - 1], cmnd[tau], cmnd[tau + 1]
+        denominator = a - 2 * b + c
+        shift = 0.5 * (a - c) / denominator if denominator else 0.0
+    else:
+        shift = 0.0
+
+    confidence = float(np.clip(1.0 - cmnd[tau], 0.0, 1.0))
+    return float(sample_rate / (tau + shift)), confidence
+
+
+class PitchController:
+    """
+    Controller for tracking the singer's pitch from the microphone.
+    Frames are produced in the audio thread and read in batches from the main thread.
+    """
+
+    def __init__(self, input_device=None, clock=None, sample_rate=44100,
+                 frame_size=2048, hop_size=512, silence_rms=0.01):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.input_device = self.get_valid_input_device(input_device)
+        self.clock = clock
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.hop_size = hop_size
+        self.silence_rms = silence_rms
+        self.stream = None
+        self.lock = threading.Lock()
+        self._window = np.zeros(frame_size, dtype=np.float32)
+        self._pending = 0
+        self._times = []
+        self._pitches = []
+        self._confidences = []
+
+    @property
+    def frame_period(self):
+        """Интервал между кадрами высоты тона в секундах."""
+        return self.hop_size / self.sample_rate
+
+    def get_valid_input_device(self, preferred_device):
+        try:
+            if preferred_device is not None:
+                device_index = int(preferred_device.split(":")[0])
+                sd.query_devices(device_index)
+                return device_index
+        except Exception as e:
+            self.logger.warning(f"Preferred input device '{preferred_device}' not found. Using default device. Error: {e}")
+        return None
+
+    def start(self):
+        """Starts capturing the microphone."""
+        if self.stream:
+            return
+        try:
+            self.stream = sd.InputStream(
+                device=self.input_device,
+                samplerate=self.sample_rate,
+                channels=1,
+                blocksize=self.hop_size,
+                dtype='float32',
+                latency='low',
+                callback=self.audio_callback
+            )
+            self.stream.start()
+            self.logger.info("Pitch tracking started.")
+        except Exception as e:
+            self.logger.exception("Error starting microphone stream.")
+            self.stream = None
+
+    def stop(self):
+        """Stops capturing the microphone."""
+        if not self.stream:
+            return
+        try:
+            self.stream.stop()
+            self.stream.close()
+        except Exception as e:
+            self.logger.error(f"Error stopping microphone stream: {e}")
+        self.stream = None
+
+    def audio_callback(self, indata, frames, time_info, status):
+        """Накапливает отсчёты и считает высоту тона на каждый hop."""
+        samples = indata[:, 0]
+        now = self.clock() if self.clock else 0.0
+        offset = 0
+        produced = []
+        while offset < len(samples):
+            take = min(self.hop_size - self._pending, len(samples) - offset)
+            self._window = np.roll(self._window, -take)
+            self._window[-take:] = samples[offset:offset + take]
+            self._pending += take
+            offset += take
+            if self._pending == self.hop_size:
+                self._pending = 0
+                # Время кадра - момент его последнего отсчёта относительно часов песни
+                frame_time = now - (len(samples) - offset) / self.sample_rate
+                produced.append((frame_time,) + self.analyze(self._window))
+
+        if produced:
+            with self.lock:
+                for frame_time, pitch, confidence in produced:
+                    self._times.append(frame_time)
+                    self._pitches.append(pitch)
+                    self._confidences.append(confidence)
+
+    def analyze(self, window):
+        """Возвращает (MIDI-высота или NaN, уверенность) для окна отсчётов."""
+        rms = float(np.sqrt(np.mean(window * window)))
+        if rms < self.silence_rms:
+            return float('nan'), 0.0
+        frequency, confidence = yin_pitch(window, self.sample_rate)
+        if frequency <= 0:
+            return float('nan'), 0.0
+        return float(hz_to_midi(frequency)), confidence
+
+    def read_frames(self):
+        """
+        Забирает все накопленные кадры.
+
+        :return: Кортеж массивов (время, MIDI-высота, уверенность).
+        """
+        with self.lock:
+            times, pitches, confidences = self._times, self._pitches, self._confidences
+            self._times, self._pitches, self._confidences = [], [], []
+        return (
+            np.asarray(times, dtype=np.float64),
+            np.asarray(pitches, dtype=np.float32),
+            np.asarray(confidences, dtype=np.float32)
+        )
+
+    def read_batches(self):
+        """
+        Забирает все накопленные кадры одной пачкой (интерфейс общий с ReplayPlayback).
+
+        :return: Список из одного кортежа массивов (время, MIDI-высота, уверенность).
+        """
+        return [self.read_frames()]
@@ -0,0 +1,160 @@
+# game/controllers/scoring_engine.py
+
+import bisect
+import logging
+import numpy as np
+
+
+class ScoringEngine:
+    """
+    Инкрементальный подсчёт очков по кадрам трекера высоты тона.
+
+    Кадры приходят пачками и сопоставляются с активными нотами векторно:
+    отклонение в центах сворачивается по октаве, очки за кадр убывают
+    линейно от FULL_CREDIT_CENTS до ZERO_CREDIT_CENTS. Нота засчитывается
+    в комбо, когда она закончилась и набрала не меньше HIT_RATIO.
+    """
+
+    MAX_SCORE = 1000000
+    FULL_CREDIT_CENTS = 50.0
+    ZERO_CREDIT_CENTS = 200.0
+    HIT_RATIO = 0.5
+    MIN_CONFIDENCE = 0.5
+
+    def __init__(self, chart):
+        """
+        :param chart: Экземпляр NoteChart.
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.chart = chart
+        self.reset()
+
+    def reset(self):
+        """Сбрасывает результаты для нового прохода песни."""
+        count = len(self.chart)
+        self.note_credit = np.zeros(count, dtype=np.float64)
+        self.note_frames = np.zeros(count, dtype=np.int64)
+        self.note_hit = np.zeros(count, dtype=bool)
+        self.finalized = 0
+        self.earned_time = 0.0
+        self.credit_sum = 0.0
+        self.frames_in_notes = 0
+        self.current_combo = 0
+        self.max_combo = 0
+        self.chart.index.reset()
+
+    @property
+    def score(self):
+        total = self.chart.total_duration
+        if total <= 0:
+            return 0
+        return int(round(self.MAX_SCORE * min(1.0, self.earned_time / total)))
+
+    @property
+    def accuracy(self):
+        """Средняя точность попадания в процентах по кадрам внутри нот."""
+        if self.frames_in_notes == 0:
+            return 0.0
+        return 100.0 * self.credit_sum / self.frames_in_notes
+
+    def frame_credit(self, sung, target, confidence):
+        """
+        Возвращает очки (0..1) за каждый кадр.
+
+        :param sung: MIDI-высота, спетая игроком (NaN - тишина).
+        :param target: MIDI-высота ноты.
+        :param confidence: Уверенность трекера.
+        """
+        cents = 100.0 * (sung - target)
+        # Сворачиваем по октаве: игрок может петь на октаву ниже или выше
+        folded = np.abs((cents + 600.0) % 1200.0 - 600.0)
+        credit = np.clip(
+            (self.ZERO_CREDIT_CENTS - folded) / (self.ZERO_CREDIT_CENTS - self.FULL_CREDIT_CENTS),
+            0.0, 1.0
+        )
+        voiced = np.isfinite(sung) & (confidence >= self.MIN_CONFIDENCE)
+        return np.where(voiced, credit, 0.0)
+
+    def process(self, times, pitches, confidences):
+        """
+        Обрабатывает пачку кадров, отсортированных по времени.
+
+        :param times: Время кадров в секундах песни.
+        :param pitches: MIDI-высота кадров (NaN для тишины).
+        :param confidences: Уверенность трекера для каждого кадра.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        if len(times) == 0 or len(self.chart) == 0:
+            return
+        pitches = np.asarray(pitches, dtype=np.float64)
+        confidences = np.asarray(confidences, dtype=np.float64)
+
+        lo, hi = self.chart.index.bounds(float(times[0]), float(times[-1]))
+        if hi > lo:
+            starts = self.chart.starts[lo:hi]
+            ends = self.chart.ends[lo:hi]
+            candidate = np.searchsorted(starts, times, side='right') - 1
+            inside = candidate >= 0
+            candidate = np.maximum(candidate, 0)
+            inside &= times < ends[candidate]
+
+            local = candidate[inside]
+            credit = self.frame_credit(
+                pitches[inside],
+                self.chart.pitches[lo:hi][local].astype(np.float64),
+                confidences[inside]
+            )
+            span = hi - lo
+            self.note_credit[lo:hi] += np.bincount(local, weights=credit, minlength=span)
+            self.note_frames[lo:hi] += np.bincount(local, minlength=span)
+            self.credit_sum += float(credit.sum())
+            self.frames_in_notes += int(len(local))
+
+        # Все ноты левее первой с max_end >= t гарантированно закончились
+        done = bisect.bisect_left(self.chart.index.max_ends, float(times[-1]))
+        self._finalize(done)
+
+    def _finalize(self, upto):
+        """Подводит итог по закончившимся нотам [finalized, upto)."""
+        start = self.finalized
+        if upto <= start:
+            return
+        frames = self.note_frames[start:upto]
+        ratio = self.note_credit[start:upto] / np.maximum(frames, 1)
+        hits = (frames > 0) & (ratio >= self.HIT_RATIO)
+        self.note_hit[start:upto] = hits
+        self.earned_time += float((ratio * self.chart.durations[start:upto]).sum())
+        self.finalized = upto
+
+        # Комбо по серии засчитанных нот без цикла по нотам
+        misses = np.flatnonzero(~hits)
+        if len(misses) == 0:
+            self.current_combo += len(hits)
+            self.max_combo = max(self.max_combo, self.current_combo)
+            return
+        longest = self.current_combo + int(misses[0])
+        if len(misses) > 1:
+            longest = max(longest, int((np.diff(misses) - 1).max()))
+        self.current_combo = len(hits) - int(misses[-1]) - 1
+        self.max_combo = max(self.max_combo, longest, self.current_combo)
+
+    def finish(self):
+        """
+        Завершает подсчёт: все оставшиеся ноты считаются закончившимися.
+
+        :return: Словарь с итоговыми score, accuracy и max_combo.
+        """
+        self._finalize(len(self.chart))
+        stats = self.get_stats()
+        self.logger.info(f"Итоговый результат: {stats}")
+        return stats
+
+    def get_stats(self):
+        """Возвращает текущие результаты."""
+        return {
+            'score': self.score,
+            'accuracy': round(self.accuracy, 2),
+            'max_combo': int(self.max_combo),
+            'notes_hit': int(self.note_hit[:self.finalized].sum()),
+            'notes_total': len(self.chart),
+        }
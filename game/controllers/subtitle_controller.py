@@ -1,64 +1,129 @@
 # game/controllers/subtitle_controller.py
 
-import threading
-import time
+import bisect
+import itertools
 import logging
 from models.subtitle import SubtitleParser
 
 class SubtitleController:
     """
     Контроллер для управления субтитрами во время воспроизведения песни.
+
+    Текущие субтитры запрашиваются из основного потока по времени аудио:
+    начала и концы субтитров заранее собраны в отсортированные массивы,
+    при обычном воспроизведении курсор сдвигается вперёд, после перемотки
+    используется бинарный поиск. Субтитры могут перекрываться: по накопленному
+    максимуму концов (как в NoteIndex) находятся и начавшиеся раньше субтитры,
+    которые ещё на экране.
     """
 
-    def __init__(self, subtitle_file):
+    # Сколько шагов курсор делает линейно, прежде чем перейти на бинарный поиск
+    SCAN_LIMIT = 4
+
+    def __init__(self, subtitle_file, subtitles=None):
+        """
+        :param subtitle_file: Путь к файлу субтитров.
+        :param subtitles: Уже загруженные субтитры (например, из скомпилированной карты);
+                          если заданы, файл не разбирается.
+        """
         self.logger = logging.getLogger(self.__class__.__name__)
         self.subtitle_file = subtitle_file
         self.subtitles = []
+        self.starts = []
+        self.ends = []
+        self.max_ends = []
         self.current_subtitle = None
+        self.current_index = -1
+        self.current_indices = []
+        self.cursor = -1
         self.running = False
-        self.thread = None
-        self.start_time = 0.0
-        self.load_subtitles()
+        if subtitles is None:
+            self.load_subtitles()
+        else:
+            self.set_subtitles(subtitles)
 
     def load_subtitles(self):
         """Загружает субтитры из файла."""
         try:
             parser = SubtitleParser(self.subtitle_file)
-            self.subtitles = parser.parse()
+            self.subtitles = sorted(parser.parse(), key=lambda subtitle: subtitle.start_time)
             self.logger.info("Субтитры успешно загружены.")
         except Exception as e:
             self.logger.exception("Ошибка при загрузке субтитров.")
+        self.set_subtitles(self.subtitles)
+
+    def set_subtitles(self, subtitles):
+        """Устанавливает субтитры, отсортированные по времени начала."""
+        self.subtitles = list(subtitles)
+        self.starts = [subtitle.start_time for subtitle in self.subtitles]
+        self.ends = [subtitle.end_time for subtitle in self.subtitles]
+        self.max_ends = list(itertools.accumulate(self.ends, max))
 
     def start(self):
-        """Запускает поток обновления субтитров."""
+        """Начинает показ субтитров с начала песни."""
         self.running = True
-        self.start_time = time.time()
-        self.thread = threading.Thread(target=self.update_subtitles)
-        self.thread.start()
+        self.cursor = -1
+        self.current_index = -1
+        self.current_indices = []
+        self.current_subtitle = None
 
     def stop(self):
-        """Останавливает поток обновления субтитров."""
+        """Останавливает показ субтитров."""
         self.running = False
-        if self.thread:
-            self.thread.join()
-
-    def update_subtitles(self):
-        """Обновляет текущий субтитр в соответствии с временем."""
-        idx = 0
-        while self.running and idx < len(self.subtitles):
-            current_time = time.time() - self.start_time
-            subtitle = self.subtitles[idx]
-            if current_time >= subtitle.start_time:
-                if current_time <= subtitle.end_time:
-                    self.current_subtitle = subtitle
-                else:
-                    idx += 1
-                    self.current_subtitle = None
-            else:
-                self.current_subtitle = None
-            time.sleep(0.1)
+        self.current_index = -1
+        self.current_indices = []
         self.current_subtitle = None
 
+    def index_at(self, t):
+        """
+        Возвращает индекс последнего субтитра, начавшегося не позже t (или -1).
+        """
+        starts = self.starts
+        cursor = self.cursor
+        if cursor >= 0 and starts[cursor] > t:
+            # Перемотка назад
+            cursor = bisect.bisect_right(starts, t) - 1
+        else:
+            steps = 0
+            while cursor + 1 < len(starts) and starts[cursor + 1] <= t:
+                cursor += 1
+                steps += 1
+                if steps == self.SCAN_LIMIT:
+                    cursor = bisect.bisect_right(starts, t, cursor) - 1
+                    break
+        self.cursor = cursor
+        return cursor
+
+    def indices_at(self, t):
+        """
+        Возвращает индексы всех субтитров на экране в момент t (start <= t <= end)
+        в порядке начала.
+
+        :param t: Время песни в секундах (по часам аудио).
+        """
+        last = self.index_at(t)
+        if last < 0:
+            return []
+        # Все субтитры левее first закончились до t
+        first = bisect.bisect_left(self.max_ends, t, 0, last + 1)
+        ends = self.ends
+        return [index for index in range(first, last + 1) if ends[index] >= t]
+
+    def subtitle_at(self, t):
+        """
+        Находит субтитры, которые должны быть на экране в момент t (см. current_indices),
+        и возвращает последний начавшийся из них или None.
+
+        :param t: Время песни в секундах (по часам аудио).
+        """
+        if not self.running:
+            return None
+        indices = self.indices_at(t)
+        self.current_indices = indices
+        self.current_index = indices[-1] if indices else -1
+        self.current_subtitle = self.subtitles[self.current_index] if indices else None
+        return self.current_subtitle
+
     def get_current_subtitle(self):
-        """Возвращает текущий субтитр."""
+        """Возвращает последний начавшийся субтитр, найденный вызовом subtitle_at."""
         return self.current_subtitle
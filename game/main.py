@@ -6,6 +6,7 @@ pyglet.options['search_local_libs'] = True
 from pyglet.math import Mat4
 import logging
 import sys
+import argparse
 import ctypes
 from models.settings import Settings
 from utils.resource_loader import ResourceLoader
@@ -16,6 +17,12 @@ from states.state_manager import StateManager
 from utils.score_manager import ScoreManager
 from utils.notification_handler import NotificationHandler
 from utils.song_manager import SongManager
+from utils.thumbnail_cache import ThumbnailCache
+from ui.cover_atlas import CoverAtlas
+from utils.image_loader import ImageLoader
+from utils.replay import ReplayReader
+from utils import song_package
+from models.song import Song
 from pyglet.gl import glClear, GL_STENCIL_BUFFER_BIT
 ctypes.windll.user32.SetProcessDPIAware()
 pyglet.options['audio'] = ('silent',) 
@@ -44,7 +51,8 @@ class KOE:
         self.window = self._create_window()
 
         # Загрузка ресурсов
-        self.resource_loader = ResourceLoader()
+        self.image_loader = ImageLoader()
+        self.resource_loader = ResourceLoader(image_loader=self.image_loader)
 
         # Инициализация менеджеров
         self.ui_manager = UIManager()
@@ -52,6 +60,13 @@ class KOE:
         self.state_manager = StateManager(self)
         self.score_manager = ScoreManager()
         self.song_manager = SongManager(songs_directory='assets/songs')  # Добавлен менеджер песен
+        self.thumbnail_cache = ThumbnailCache()
+        self.cover_atlas = CoverAtlas()
+
+        # Текущая игра; replay - ReplayReader, если игра идёт в режиме просмотра реплея
+        self.selected_song = None
+        self.replay = None
+        self.last_replay_path = None  # Реплей последней сыгранной игры
 
         # Настройка обработчика уведомлений для логирования
         notification_handler = NotificationHandler(self.notification_manager)
@@ -324,10 +339,29 @@ class KOE:
         self.selected_song = song
         self.track_volumes = track_volumes
         self.mods = mods
+        self.replay = None
         # Преобразуем громкости в диапазон 0.0 - 1.0
         self.normalized_track_volumes = {track: volume / 100 for track, volume in track_volumes.items()}
         self.state_manager.change_state('game')
 
+    def start_replay(self, replay_path):
+        """
+        Starts the game in replay mode: recorded pitch frames are scored instead of the microphone.
+        """
+        try:
+            reader = ReplayReader(replay_path)
+            song = Song(reader.metadata['song_dir'])
+        except Exception as e:
+            self.logger.exception(f"Ошибка при загрузке реплея {replay_path}")
+            return
+        self.logger.info(f"Starting replay {replay_path}.")
+        self.selected_song = song
+        self.track_volumes = reader.metadata.get('track_volumes', {})
+        self.mods = reader.metadata.get('mods', [])
+        self.replay = reader
+        self.normalized_track_volumes = {track: volume / 100 for track, volume in self.track_volumes.items()}
+        self.state_manager.change_state('game')
+
     def run(self):
         """Запуск игрового цикла."""
         self.logger.info("Запуск игрового цикла.")
@@ -341,6 +375,10 @@ class KOE:
 
     def update(self, dt):
         """Обновление текущего состояния игры."""
+        changes = self.song_manager.apply_changes()
+        if changes:
+            self.state_manager.on_library_changed(changes)
+        self.image_loader.update()
         self.state_manager.update(dt)
         self.notification_manager.update(dt)
 
@@ -355,12 +393,21 @@ class KOE:
         """Очистка ресурсов перед выходом."""
         self.logger.info("Очистка ресурсов перед выходом.")
         try:
+            self.song_manager.stop()
+            self.thumbnail_cache.shutdown()
+            self.image_loader.shutdown()
             self.state_manager.cleanup()
+            song_package.close_packages()
             self.window.close()
         except Exception as e:
             self.logger.exception("Ошибка при очистке ресурсов.")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="KOE")
+    parser.add_argument('--replay', help="Открыть реплей (.koerep) вместо главного меню")
+    args = parser.parse_args()
     game = KOE()
+    if args.replay:
+        game.start_replay(args.replay)
     game.run()
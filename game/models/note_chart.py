@@ -0,0 +1,197 @@
+# game/models/note_chart.py
+
+import os
+import bisect
+import itertools
+import logging
+import numpy as np
+from models.note import Note
+from utils import song_package
+
+
+class NoteIndex:
+    """
+    Интервальный индекс по нотам для запросов "какие ноты пересекают [t0, t1]".
+
+    Строится по отсортированным началам нот и накопленному максимуму их концов:
+    все ноты левее первого индекса, где max_end >= t0, гарантированно закончились.
+    После перемотки запрос стоит O(log n + k), при обычном воспроизведении вперёд
+    курсоры только сдвигаются, что даёт амортизированное O(1).
+    """
+
+    # Сколько шагов курсор делает линейно, прежде чем перейти на бинарный поиск
+    SCAN_LIMIT = 8
+
+    def __init__(self, starts, ends):
+        """
+        :param starts: Начала нот в секундах, отсортированные по возрастанию.
+        :param ends: Концы нот в секундах в том же порядке.
+        """
+        self.starts = [float(t) for t in starts]
+        self.ends = [float(t) for t in ends]
+        self.max_ends = list(itertools.accumulate(self.ends, max))
+        self.reset()
+
+    def __len__(self):
+        return len(self.starts)
+
+    def reset(self):
+        """Сбрасывает курсоры (например, после перемотки назад)."""
+        self._lo = 0
+        self._hi = 0
+        self._last_t0 = float('-inf')
+        self._last_t1 = float('-inf')
+
+    def _advance_lo(self, t0):
+        """Сдвигает нижний курсор к первой ноте, у которой max_end >= t0."""
+        lo, max_ends, n = self._lo, self.max_ends, len(self.max_ends)
+        for _ in range(self.SCAN_LIMIT):
+            if lo >= n or max_ends[lo] >= t0:
+                return lo
+            lo += 1
+        # Большой прыжок вперёд - дальше ищем бинарно от текущей позиции
+        return bisect.bisect_left(max_ends, t0, lo)
+
+    def _advance_hi(self, t1):
+        """Сдвигает верхний курсор к первой ноте, начинающейся после t1."""
+        hi, starts, n = self._hi, self.starts, len(self.starts)
+        for _ in range(self.SCAN_LIMIT):
+            if hi >= n or starts[hi] > t1:
+                return hi
+            hi += 1
+        return bisect.bisect_right(starts, t1, hi)
+
+    def bounds(self, t0, t1):
+        """
+        Возвращает полуинтервал индексов [lo, hi), внутри которого лежат
+        все ноты, пересекающие [t0, t1]. Ноты внутри диапазона могут
+        закончиться раньше t0, если они перекрываются с более длинными.
+
+        :param t0: Начало окна в секундах.
+        :param t1: Конец окна в секундах.
+        :return: Кортеж (lo, hi).
+        """
+        if t0 >= self._last_t0 and t1 >= self._last_t1:
+            lo = self._advance_lo(t0)
+            hi = self._advance_hi(t1)
+        else:
+            lo = bisect.bisect_left(self.max_ends, t0)
+            hi = bisect.bisect_right(self.starts, t1)
+
+        self._lo, self._hi = lo, hi
+        self._last_t0, self._last_t1 = t0, t1
+        return lo, max(lo, hi)
+
+    def query(self, t0, t1):
+        """
+        Возвращает индексы нот, пересекающих [t0, t1].
+
+        :param t0: Начало окна в секундах.
+        :param t1: Конец окна в секундах.
+        :return: Список индексов в порядке начала нот.
+        """
+        lo, hi = self.bounds(t0, t1)
+        ends = self.ends
+        return [i for i in range(lo, hi) if ends[i] >= t0]
+
+
+class NoteChart:
+    """
+    Нотная карта песни в виде столбцов numpy, отсортированных по началу нот.
+    """
+
+    CACHE_FILE = 'notes_cache.npz'
+    CACHE_VERSION = 1
+
+    def __init__(self, starts, durations, pitches):
+        order = np.argsort(np.asarray(starts, dtype=np.float64), kind='stable')
+        self.starts = np.asarray(starts, dtype=np.float64)[order]
+        self.durations = np.asarray(durations, dtype=np.float64)[order]
+        self.pitches = np.asarray(pitches, dtype=np.float32)[order]
+        self.ends = self.starts + self.durations
+        self.index = NoteIndex(self.starts, self.ends)
+
+    @classmethod
+    def from_notes(cls, notes):
+        """Создаёт карту из списка объектов Note."""
+        return cls(
+            [note.start_time for note in notes],
+            [note.duration for note in notes],
+            [note.pitch for note in notes]
+        )
+
+    @classmethod
+    def empty(cls):
+        return cls([], [], [])
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def total_duration(self):
+        """Суммарная длительность всех нот в секундах."""
+        return float(self.durations.sum())
+
+    def notes_between(self, t0, t1):
+        """Возвращает объекты Note, пересекающие окно [t0, t1]."""
+        return [
+            Note(self.starts[i], self.durations[i], self.pitches[i])
+            for i in self.index.query(t0, t1)
+        ]
+
+    def save(self, path):
+        """Сохраняет карту в кэш-файл .npz."""
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                version=np.array(self.CACHE_VERSION),
+                starts=self.starts,
+                durations=self.durations,
+                pitches=self.pitches
+            )
+
+    @classmethod
+    def load(cls, path):
+        """Загружает карту из кэш-файла .npz."""
+        with song_package.open_binary(path) as f, np.load(f) as data:
+            if int(data['version']) != cls.CACHE_VERSION:
+                raise ValueError(f"Unsupported note chart cache version in {path}")
+            return cls(data['starts'], data['durations'], data['pitches'])
+
+    @classmethod
+    def load_for_song(cls, song):
+        """
+        Загружает нотную карту песни.
+        Используется кэш в папке песни (для пакета - кэш в пакете или в кэше
+        пакетов), если он новее MIDI-файла; иначе MIDI разбирается заново
+        и кэш перезаписывается.
+
+        :param song: Экземпляр Song.
+        :return: Экземпляр NoteChart (пустой, если нот нет).
+        """
+        logger = logging.getLogger(cls.__name__)
+        cache_path = os.path.join(song.song_dir, cls.CACHE_FILE)
+        save_path = song_package.writable_path(cache_path, song.id)
+        midi_file = song.midi_file if song.midi_file and song_package.isfile(song.midi_file) else None
+
+        for candidate in dict.fromkeys((cache_path, save_path)):
+            if not song_package.isfile(candidate):
+                continue
+            if midi_file is None or song_package.getmtime(candidate) >= song_package.getmtime(midi_file):
+                try:
+                    return cls.load(candidate)
+                except Exception:
+                    logger.exception(f"Ошибка при чтении кэша нот: {candidate}")
+
+        if midi_file is None:
+            logger.warning(f"Нотная карта для песни '{song.name}' не найдена.")
+            return cls.empty()
+
+        from utils.midi_parser import read_midi_notes
+        chart = cls.from_notes(read_midi_notes(midi_file))
+        try:
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            chart.save(save_path)
+        except OSError:
+            logger.exception(f"Не удалось сохранить кэш нот: {save_path}")
+        return chart
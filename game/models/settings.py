@@ -20,6 +20,8 @@ class Settings:
         'input_device': None,
         'output_device': None,
         'blur_background': True,
+        'player_name': 'Player',
+        'calibration_offset': 0.0,  # Задержка микрофона в секундах
     }
 
     def __init__(self):
@@ -93,6 +95,30 @@ class Settings:
         else:
             self.logger.error("Громкость должна быть в диапазоне от 0 до 100.")
 
+    @property
+    def player_name(self):
+        return self._settings.get('player_name', self.DEFAULTS['player_name'])
+
+    @player_name.setter
+    def player_name(self, value):
+        if isinstance(value, str) and value.strip():
+            self._settings['player_name'] = value.strip()
+            self._notify_change()
+        else:
+            self.logger.error("Некорректное имя игрока.")
+
+    @property
+    def calibration_offset(self):
+        return self._settings.get('calibration_offset', self.DEFAULTS['calibration_offset'])
+
+    @calibration_offset.setter
+    def calibration_offset(self, value):
+        if isinstance(value, (int, float)) and -1.0 <= value <= 1.0:
+            self._settings['calibration_offset'] = float(value)
+            self._notify_change()
+        else:
+            self.logger.error("Калибровка должна быть в диапазоне от -1 до 1 секунды.")
+
     @property
     def input_device(self):
         return self._settings.get('input_device')
@@ -2,91 +2,217 @@
 
 import os
 import json
-import uuid
+import hashlib
 import wave
 import contextlib
 import mutagen  # Добавьте: pip install mutagen
+from utils import song_package
+
+DEFAULT_COVER = 'assets/images/default_cover.png'
+DEFAULT_BACKGROUND = 'assets/images/default_background.png'
+
+
+def _path_property(index, doc):
+    """Свойство пути к файлу песни, которое разрешается при первом обращении."""
+    def getter(self):
+        if self._paths is None:
+            self.resolve_paths()
+        return self._paths[index]
+    return property(getter, doc=doc)
+
 
 class Song:
     """
     Class representing a song and its properties.
+
+    При создании из info.json сохраняются только поля, нужные списку песен
+    (название, исполнитель, альбом, год, жанр, сложность, BPM). Пути к файлам,
+    исходный словарь info и длительность вычисляются при первом обращении,
+    поэтому память и время загрузки библиотеки растут с тем, что реально
+    просматривается, а не с числом песен.
     """
 
-    def __init__(self, song_dir):
+    __slots__ = (
+        'song_dir', 'id', 'name', 'artist', 'album', 'year', 'genre', 'difficulty', 'bpm',
+        '_info', '_paths', '_duration'
+    )
+
+    # Поля путей в порядке хранения в _paths
+    PATH_FIELDS = ('cover_image', 'background', 'audio_files', 'midi_file', 'subtitle_file', 'video_file')
+
+    # Поля, которые сохраняются в индексе библиотеки
+    CACHED_FIELDS = ('id', 'name', 'artist', 'album', 'year', 'genre', 'difficulty', 'bpm', 'duration') + PATH_FIELDS
+
+    cover_image = _path_property(0, "Обложка песни или обложка по умолчанию.")
+    background = _path_property(1, "Фон песни или фон по умолчанию.")
+    audio_files = _path_property(2, "Существующие аудиодорожки песни.")
+    midi_file = _path_property(3, "Путь к MIDI-файлу (может не существовать).")
+    subtitle_file = _path_property(4, "Путь к файлу субтитров (может не существовать).")
+    video_file = _path_property(5, "Путь к видео (может не существовать).")
+
+    def __init__(self, song_dir, load_duration=False):
         self.song_dir = song_dir
-        self.info = {}
-        self.id = str(uuid.uuid4())
+        self.id = ""
         self.name = ""
         self.artist = ""
         self.album = ""
         self.year = ""
         self.genre = ""
-        self.cover_image = ""
-        self.background = ""
-        self.audio_files = []
-        self.midi_file = ""
-        self.subtitle_file = ""
-        self.video_file = ""
         self.difficulty = ""
         self.bpm = ""
-        self.duration = 0
-        self.load_info()
+        self._info = None
+        self._paths = None
+        self._duration = None
+        self.load_info(load_duration)
+
+    @classmethod
+    def from_dict(cls, song_dir, data):
+        """Восстанавливает песню из индекса библиотеки без чтения файлов."""
+        song = cls.__new__(cls)
+        song.song_dir = song_dir
+        for field in ('id', 'name', 'artist', 'album', 'year', 'genre', 'difficulty', 'bpm'):
+            setattr(song, field, data[field])
+        song._info = None
+        song._paths = tuple(data[field] for field in cls.PATH_FIELDS)
+        song._duration = data['duration']
+        return song
+
+    def to_dict(self):
+        """Возвращает поля песни для сохранения в индексе библиотеки."""
+        return {field: getattr(self, field) for field in self.CACHED_FIELDS}
+
+    def read_info(self):
+        """
+        Reads the info.json file.
 
-    def load_info(self):
-        """Loads song information from the info.json file."""
+        :return: (содержимое файла в байтах, разобранный словарь).
+        """
         info_path = os.path.join(self.song_dir, 'info.json')
-        if os.path.exists(info_path):
-            with open(info_path, 'r', encoding='utf-8') as f:
-                self.info = json.load(f)
-            self.name = self.info.get('name', 'Unknown')
-            self.artist = self.info.get('artist', 'Unknown')
-            self.album = self.info.get('album', '')
-            self.year = self.info.get('year', '')
-            self.genre = self.info.get('genre', '')
-            
-            # Проверка существования файлов обложки и фона
-            cover_path = os.path.join(self.song_dir, self.info.get('cover_image', ''))
-            background_path = os.path.join(self.song_dir, self.info.get('background', ''))
-            
-            self.cover_image = cover_path if os.path.exists(cover_path) else 'assets/images/default_cover.png'
-            self.background = background_path if os.path.exists(background_path) else 'assets/images/default_background.png'
-            
-            self.midi_file = os.path.join(self.song_dir, self.info.get('midi_file', ''))
-            self.subtitle_file = os.path.join(self.song_dir, self.info.get('subtitle_file', ''))
-            self.video_file = os.path.join(self.song_dir, self.info.get('video_file', ''))
-            self.audio_files = []
-            if len(self.info.get('audio_files', [])) > 0:
-                for audio_file in self.info.get('audio_files', []):
-                    full_path = os.path.join(self.song_dir, audio_file)
-                    if os.path.exists(full_path):
-                        self.audio_files.append(full_path)
-            self.difficulty = self.info.get('difficulty', 'Normal')
-            self.bpm = self.info.get('bpm', 'Unknown')
-
-            # Calculate duration if not provided
-            self.duration = self.info.get('duration', 0)
-            if self.duration == 0 and self.audio_files:
-                total_duration = 0
-                for audio_file in self.audio_files:
-                    try:
-                        # Сначала пробуем mutagen для быстрого получения метаданных
-                        audio = mutagen.File(audio_file)
-                        if audio is not None:
-                            total_duration = max(total_duration, audio.info.length)
-                            continue
-                        
-                        # Для WAV файлов используем wave
-                        if audio_file.lower().endswith('.wav'):
-                            with contextlib.closing(wave.open(audio_file, 'r')) as f:
-                                frames = f.getnframes()
-                                rate = f.getframerate()
-                                duration = frames / float(rate)
-                                total_duration = max(total_duration, duration)
-                    except Exception:
-                        # Если не удалось определить длительность, установим значение по умолчанию
-                        total_duration = max(total_duration, 180)  # 3 минуты по умолчанию
-                    
-                self.duration = total_duration
-
-        else:
+        if not song_package.exists(info_path):
             raise FileNotFoundError(f"info.json file not found in directory {self.song_dir}")
+        info_bytes = song_package.read_bytes(info_path)
+        return info_bytes, json.loads(info_bytes.decode('utf-8-sig'))
+
+    def load_info(self, load_duration=False):
+        """
+        Loads song information from the info.json file.
+
+        :param load_duration: If True, a duration missing from info.json is computed
+                              right away instead of on first access.
+        """
+        info_bytes, info = self.read_info()
+        self.name = info.get('name', 'Unknown')
+        self.artist = info.get('artist', 'Unknown')
+        self.album = info.get('album', '')
+        self.year = info.get('year', '')
+        self.genre = info.get('genre', '')
+        self.difficulty = info.get('difficulty', 'Normal')
+        self.bpm = info.get('bpm', 'Unknown')
+        # None - длительность не указана и будет вычислена по аудио при обращении
+        self._duration = info.get('duration', 0) or None
+        self.id = self.compute_id(info_bytes, info)
+        if load_duration:
+            self.load_duration()
+
+    @property
+    def info(self):
+        """Исходный словарь info.json; читается с диска при первом обращении."""
+        if self._info is None:
+            self._info = self.read_info()[1]
+        return self._info
+
+    def resolve_paths(self):
+        """Разрешает пути к файлам песни по info.json."""
+        info = self._info if self._info is not None else self.read_info()[1]
+
+        # Проверка существования файлов обложки и фона
+        cover_path = os.path.join(self.song_dir, info.get('cover_image', ''))
+        background_path = os.path.join(self.song_dir, info.get('background', ''))
+
+        audio_files = []
+        for audio_file in info.get('audio_files', []):
+            full_path = os.path.join(self.song_dir, audio_file)
+            if song_package.exists(full_path):
+                audio_files.append(full_path)
+
+        self._paths = (
+            cover_path if song_package.isfile(cover_path) else DEFAULT_COVER,
+            background_path if song_package.isfile(background_path) else DEFAULT_BACKGROUND,
+            audio_files,
+            os.path.join(self.song_dir, info.get('midi_file', '')),
+            os.path.join(self.song_dir, info.get('subtitle_file', '')),
+            os.path.join(self.song_dir, info.get('video_file', '')),
+        )
+
+    @property
+    def duration(self):
+        """Длительность в секундах; если её нет в info.json, вычисляется по аудио при первом обращении."""
+        if self._duration is None:
+            self.load_duration()
+        return self._duration
+
+    def get_duration(self, default=0):
+        """Длительность без обращения к аудиофайлам: default, если она ещё не известна."""
+        return self._duration if self._duration is not None else default
+
+    def needs_duration(self):
+        """Проверяет, что длительность ещё не известна."""
+        return self._duration is None
+
+    def load_duration(self):
+        """Вычисляет длительность по аудиодорожкам, если она не указана в info.json."""
+        if self.needs_duration():
+            self._duration = self.measure_duration()
+
+    def with_duration(self, duration):
+        """Копия песни с известной длительностью; сама песня не меняется."""
+        song = Song.__new__(Song)
+        for field in self.__slots__:
+            setattr(song, field, getattr(self, field))
+        song._duration = duration
+        return song
+
+    def measure_duration(self):
+        """Длительность по аудиодорожкам в секундах (песня не изменяется)."""
+        total_duration = 0
+        for audio_file in self.audio_files:
+            try:
+                # Сначала пробуем mutagen для быстрого получения метаданных
+                with song_package.open_binary(audio_file) as f:
+                    audio = mutagen.File(f)
+                if audio is not None:
+                    total_duration = max(total_duration, audio.info.length)
+                    continue
+
+                # Для WAV файлов используем wave
+                if audio_file.lower().endswith('.wav'):
+                    with song_package.open_binary(audio_file) as source, \
+                            contextlib.closing(wave.open(source, 'r')) as f:
+                        frames = f.getnframes()
+                        rate = f.getframerate()
+                        duration = frames / float(rate)
+                        total_duration = max(total_duration, duration)
+            except Exception:
+                # Если не удалось определить длительность, установим значение по умолчанию
+                total_duration = max(total_duration, 180)  # 3 минуты по умолчанию
+
+        return total_duration
+
+    def compute_id(self, info_bytes, info):
+        """
+        Вычисляет постоянный идентификатор песни.
+
+        Если в info.json задано поле 'id', используется оно. Иначе идентификатор -
+        хэш содержимого info.json и имён и размеров аудиодорожек, поэтому он
+        не меняется между запусками и при переносе папки песни.
+        """
+        if info.get('id'):
+            return str(info['id'])
+        digest = hashlib.blake2b(info_bytes, digest_size=16)
+        for path in sorted(os.path.join(self.song_dir, audio_file) for audio_file in info.get('audio_files', [])):
+            try:
+                size = song_package.getsize(path)
+            except OSError:
+                continue  # Отсутствующие дорожки не учитываются
+            digest.update(f'\0{os.path.basename(path)}\0{size}'.encode('utf-8'))
+        return digest.hexdigest()
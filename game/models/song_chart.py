@@ -0,0 +1,254 @@
+# game/models/song_chart.py
+
+import os
+import json
+import mmap
+import struct
+import logging
+import numpy as np
+from models.note_chart import NoteChart
+from models.subtitle import Subtitle, SyllableTiming
+from utils import song_package
+
+MAGIC = b'KOEC'
+VERSION = 1
+ALIGNMENT = 16
+
+_HEADER = struct.Struct('<4sHI')  # magic, версия, длина JSON-оглавления
+
+LINE_DTYPE = np.dtype([
+    ('subtitle', '<u4'), ('text_offset', '<u4'), ('text_length', '<u4'), ('color', 'u1', (4,))
+])
+SYLLABLE_DTYPE = np.dtype([
+    ('line', '<u4'), ('start', '<f8'), ('end', '<f8'), ('char_start', '<u4'), ('char_end', '<u4')
+])
+
+
+def _align(value):
+    return (value + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class SongChart:
+    """
+    Скомпилированная карта песни: субтитры с таймингом слогов, ноты,
+    сетка долей, смещение превью и громкость в одном файле.
+
+    Файл состоит из заголовка с JSON-оглавлением (версия, времена изменения
+    исходных файлов, скалярные поля, смещения секций) и выровненных секций
+    с массивами фиксированной ширины, которые читаются прямо из mmap.
+    """
+
+    CHART_FILE = 'chart.koec'
+
+    def __init__(self, note_chart, subtitles, beats, preview_offset=0.0, loudness=None, sources=None):
+        self.note_chart = note_chart
+        self.subtitles = subtitles
+        self.beats = np.asarray(beats, dtype=np.float64)
+        self.preview_offset = preview_offset
+        self.loudness = loudness
+        self.sources = sources or {}
+
+    @staticmethod
+    def source_files(song):
+        """Возвращает существующие исходные файлы, из которых собирается карта."""
+        candidates = [
+            os.path.join(song.song_dir, 'info.json'),
+            song.subtitle_file,
+            song.midi_file,
+            os.path.join(song.song_dir, NoteChart.CACHE_FILE),
+        ] + list(song.audio_files)
+        return [path for path in candidates if path and song_package.isfile(path)]
+
+    @classmethod
+    def source_mtimes(cls, song):
+        """Времена изменения исходных файлов относительно папки песни."""
+        return {
+            os.path.relpath(path, song.song_dir).replace(os.sep, '/'): song_package.getmtime(path)
+            for path in cls.source_files(song)
+        }
+
+    def build_sections(self):
+        """Собирает массивы секций файла."""
+        lines = []
+        syllables = []
+        text = bytearray()
+        for subtitle_index, subtitle in enumerate(self.subtitles):
+            for line_number, line in enumerate(subtitle.lines):
+                encoded = line.encode('utf-8')
+                line_index = len(lines)
+                lines.append((subtitle_index, len(text), len(encoded), subtitle.line_colors[line_number]))
+                text += encoded
+                timing = subtitle.timings[line_number] if line_number < len(subtitle.timings) else None
+                if timing:
+                    for start, end, char_start, char_end in zip(timing.starts, timing.ends,
+                                                                timing.char_starts, timing.char_ends):
+                        syllables.append((line_index, start, end, char_start, char_end))
+
+        return {
+            'note_starts': self.note_chart.starts.astype('<f8'),
+            'note_durations': self.note_chart.durations.astype('<f8'),
+            'note_pitches': self.note_chart.pitches.astype('<f4'),
+            'beats': self.beats.astype('<f8'),
+            'subtitle_times': np.array(
+                [(s.start_time, s.end_time) for s in self.subtitles], dtype='<f8'
+            ).reshape(-1, 2),
+            'lines': np.array(lines, dtype=LINE_DTYPE),
+            'syllables': np.array(syllables, dtype=SYLLABLE_DTYPE),
+            'text': np.frombuffer(bytes(text), dtype=np.uint8),
+        }
+
+    def save(self, path):
+        """Записывает карту в файл (через временный файл, чтобы не оставить битую карту)."""
+        sections = self.build_sections()
+        layout = {}
+        offset = 0
+        for name, array in sections.items():
+            layout[name] = {
+                'offset': offset,
+                'dtype': array.dtype.descr if array.dtype.names else array.dtype.str,
+                'shape': list(array.shape),
+            }
+            offset = _align(offset + array.nbytes)
+
+        header = json.dumps({
+            'sources': self.sources,
+            'preview_offset': self.preview_offset,
+            'loudness': self.loudness,
+            'sections': layout,
+        }, ensure_ascii=False).encode('utf-8')
+        data_start = _align(_HEADER.size + len(header))
+
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(header)))
+            f.write(header)
+            for name, array in sections.items():
+                f.write(b'\0' * (data_start + layout[name]['offset'] - f.tell()))
+                f.write(array.tobytes())
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def read_header(buffer):
+        """Разбирает заголовок; возвращает (оглавление, начало данных)."""
+        magic, version, header_length = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a compiled song chart")
+        if version != VERSION:
+            raise ValueError(f"Unsupported song chart version: {version}")
+        header = json.loads(bytes(buffer[_HEADER.size:_HEADER.size + header_length]).decode('utf-8'))
+        return header, _align(_HEADER.size + header_length)
+
+    @classmethod
+    def from_buffer(cls, buffer, header, data_start):
+        """Собирает карту из секций буфера без разбора текстовых форматов."""
+        def section(name):
+            info = header['sections'][name]
+            descr = info['dtype']
+            dtype = np.dtype([tuple(field) for field in descr] if isinstance(descr, list) else descr)
+            count = int(np.prod(info['shape'])) if info['shape'] else 1
+            array = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + info['offset'])
+            return array.reshape(info['shape'])
+
+        note_chart = NoteChart(section('note_starts'), section('note_durations'), section('note_pitches'))
+
+        times = section('subtitle_times')
+        lines = section('lines')
+        syllables = section('syllables')
+        text = section('text').tobytes()
+
+        # Слоги отсортированы по строкам: границы строк находятся одним searchsorted
+        line_numbers = np.arange(len(lines))
+        syllable_first = np.searchsorted(syllables['line'], line_numbers, side='left')
+        syllable_last = np.searchsorted(syllables['line'], line_numbers, side='right')
+
+        subtitles = []
+        grouped = {}
+        for line_index, line in enumerate(lines):
+            grouped.setdefault(int(line['subtitle']), []).append(line_index)
+        for subtitle_index, (start_time, end_time) in enumerate(times):
+            line_texts, line_colors, timings = [], [], []
+            for line_index in grouped.get(subtitle_index, []):
+                line = lines[line_index]
+                offset, length = int(line['text_offset']), int(line['text_length'])
+                line_texts.append(text[offset:offset + length].decode('utf-8'))
+                line_colors.append(tuple(int(c) for c in line['color']))
+                first, last = syllable_first[line_index], syllable_last[line_index]
+                if last > first:
+                    timing = SyllableTiming()
+                    for syllable in syllables[first:last]:
+                        timing.add(float(syllable['start']), float(syllable['end']),
+                                   int(syllable['char_start']), int(syllable['char_end']))
+                    timings.append(timing)
+                else:
+                    timings.append(None)
+            subtitles.append(Subtitle(
+                float(start_time), float(end_time), '\n'.join(line_texts),
+                timings=timings, line_colors=line_colors
+            ))
+
+        return cls(
+            note_chart, subtitles, section('beats').copy(),
+            preview_offset=header.get('preview_offset', 0.0),
+            loudness=header.get('loudness'),
+            sources=header.get('sources', {})
+        )
+
+    @classmethod
+    def load(cls, path, song=None):
+        """
+        Загружает карту из файла одним открытием через mmap
+        (для песни в пакете .koe - срезом mmap пакета).
+        Карта не ссылается на буфер (массивы нот копирует NoteChart, остальное
+        разбирается в объекты), поэтому mmap закрывается сразу после чтения
+        и не держит файл: на Windows открытый mmap не даёт перезаписать карту.
+
+        :param song: Если указан, карта проверяется на актуальность; для устаревшей возвращается None.
+        """
+        buffer = song_package.map_file(path)
+        try:
+            header, data_start = cls.read_header(buffer)
+            if song is not None and header.get('sources') != cls.source_mtimes(song):
+                return None
+            return cls.from_buffer(buffer, header, data_start)
+        finally:
+            try:
+                if isinstance(buffer, mmap.mmap):
+                    buffer.close()
+                else:
+                    buffer.release()  # Срез mmap пакета; сам mmap принадлежит пакету
+            except BufferError:
+                pass  # На буфер ещё ссылается трассировка исключения; закроет сборщик мусора
+
+    @classmethod
+    def load_for_song(cls, song, audio_data=None):
+        """
+        Загружает скомпилированную карту песни.
+        Если карты нет или исходные файлы изменились, карта компилируется заново.
+
+        :param song: Экземпляр Song.
+        :param audio_data: Уже декодированные дорожки для измерения громкости при компиляции.
+        :return: Экземпляр SongChart.
+        """
+        logger = logging.getLogger(cls.__name__)
+        path = os.path.join(song.song_dir, cls.CHART_FILE)
+        # Пакеты только для чтения: карта песни из пакета сохраняется рядом, в кэше пакетов
+        save_path = song_package.writable_path(path, song.id)
+        for candidate in dict.fromkeys((path, save_path)):
+            if not song_package.isfile(candidate):
+                continue
+            try:
+                chart = cls.load(candidate, song)
+                if chart is not None:
+                    return chart
+                logger.info(f"Карта песни '{song.name}' устарела: {candidate}")
+            except Exception:
+                logger.exception(f"Ошибка при чтении карты песни: {candidate}")
+
+        from utils.chart_compiler import compile_song_chart
+        chart = compile_song_chart(song, audio_data)
+        try:
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            chart.save(save_path)
+        except OSError:
+            logger.exception(f"Не удалось сохранить карту песни: {save_path}")
+        return chart
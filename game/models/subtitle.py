@@ -1,25 +1,70 @@
 # game/models/subtitle.py
 
+import os
 import re
 import logging
+from utils import song_package
+
+DEFAULT_COLOR = (255, 255, 255, 255)
+
+
+def hex_to_rgba(hex_color, alpha=255):
+    """Преобразует цвет вида 'RRGGBB' в кортеж RGBA."""
+    return tuple(int(hex_color[j:j+2], 16) for j in (0, 2, 4)) + (alpha,)
+
+
+class SyllableTiming:
+    """
+    Тайминг слогов одной строки караоке.
+    Для каждого слога хранятся время начала и конца (в секундах песни)
+    и границы его символов в тексте строки.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.char_starts = []
+        self.char_ends = []
+
+    def add(self, start, end, char_start, char_end):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.char_starts.append(char_start)
+        self.char_ends.append(char_end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __repr__(self):
+        return f"SyllableTiming({len(self)} syllables)"
+
 
 class Subtitle:
     """
     Класс для представления одного субтитра.
+    Строки и их цвета разбираются один раз при создании.
     """
 
-    def __init__(self, start_time, end_time, text, colors=None):
+    def __init__(self, start_time, end_time, text, colors=None, timings=None, line_colors=None):
         self.start_time = start_time
         self.end_time = end_time
         self.text = text
         self.colors = colors or []
+        self.timings = timings or []  # SyllableTiming или None для каждой строки
+        self.lines = text.split('\n')
+        self.line_colors = line_colors or [
+            hex_to_rgba(self.colors[i]) if i < len(self.colors) else DEFAULT_COLOR
+            for i in range(len(self.lines))
+        ]
 
     def __repr__(self):
         return f"Subtitle({self.start_time}, {self.end_time}, {self.text}, {self.colors})"
 
 class SubtitleParser:
     """
-    Класс для парсинга субтитров из файла в формате SRT с поддержкой тегов <font color="#HEX">.
+    Класс для парсинга субтитров из файла в формате SRT с поддержкой тегов <font color="#HEX">
+    и караоке-тегов {\\k} (длительность слога в сотых долях секунды),
+    а также файлов LRC с пословными метками <mm:ss.xx>.
     """
 
     TIMESTAMP_PATTERN = re.compile(
@@ -27,6 +72,10 @@ class SubtitleParser:
         r"(\d{2}):(\d{2}):(\d{2}),(\d{3})"
     )
     FONT_TAG_PATTERN = re.compile(r'<font color="#([0-9A-Fa-f]{6})">(.*?)</font>', re.DOTALL)
+    KARAOKE_TAG_PATTERN = re.compile(r'\{\\[kK][fo]?(\d+)\}')
+    LRC_LINE_PATTERN = re.compile(r'^\[(\d+):(\d{2})(?:[.:](\d{1,3}))?\](.*)$')
+    LRC_WORD_PATTERN = re.compile(r'<(\d+):(\d{2})(?:[.:](\d{1,3}))?>')
+    LRC_LAST_LINE_DURATION = 5.0
 
     def __init__(self, subtitle_file):
         self.subtitle_file = subtitle_file
@@ -41,11 +90,80 @@ class SubtitleParser:
             int(milliseconds) / 1000.0
         )
 
+    def parse_lrc_time(self, minutes, seconds, fraction):
+        """Преобразует метку LRC вида mm:ss.xx в секунды."""
+        fraction = fraction or '0'
+        return int(minutes) * 60 + int(seconds) + int(fraction) / (10 ** len(fraction))
+
+    def parse_karaoke_line(self, line, time_cursor):
+        """
+        Убирает теги {\\k} из строки и собирает тайминг слогов.
+
+        :param line: Строка с тегами.
+        :param time_cursor: Время начала первого слога.
+        :return: Кортеж (чистый текст, SyllableTiming или None, время конца последнего слога).
+        """
+        parts = self.KARAOKE_TAG_PATTERN.split(line)
+        if len(parts) == 1:
+            return line, None, time_cursor
+        text = parts[0]
+        timing = SyllableTiming()
+        # parts: [текст до первого тега, длительность, слог, длительность, слог, ...]
+        for duration, syllable in zip(parts[1::2], parts[2::2]):
+            end = time_cursor + int(duration) / 100.0
+            timing.add(time_cursor, end, len(text), len(text) + len(syllable))
+            text += syllable
+            time_cursor = end
+        return text, timing, time_cursor
+
+    def parse_lrc_words(self, body, start_time, end_time):
+        """
+        Убирает пословные метки LRC из строки и собирает тайминг слов.
+
+        :return: Кортеж (чистый текст, SyllableTiming или None).
+        """
+        parts = self.LRC_WORD_PATTERN.split(body)
+        if len(parts) == 1:
+            return body, None
+        text = parts[0]
+        words = []
+        # parts: [текст, минуты, секунды, доли, слово, минуты, секунды, доли, слово, ...]
+        for i in range(1, len(parts), 4):
+            words.append((self.parse_lrc_time(*parts[i:i + 3]), parts[i + 3]))
+        timing = SyllableTiming()
+        for index, (word_start, word) in enumerate(words):
+            word_end = words[index + 1][0] if index + 1 < len(words) else end_time
+            if word:
+                timing.add(word_start, word_end, len(text), len(text) + len(word))
+            text += word
+        return text, timing
+
+    def parse_lrc(self, content):
+        """Парсит содержимое файла LRC."""
+        entries = []
+        for raw_line in content.splitlines():
+            match = self.LRC_LINE_PATTERN.match(raw_line.strip())
+            if match:
+                minutes, seconds, fraction, body = match.groups()
+                entries.append((self.parse_lrc_time(minutes, seconds, fraction), body.strip()))
+        entries.sort(key=lambda entry: entry[0])
+
+        subtitles = []
+        for index, (start_time, body) in enumerate(entries):
+            if index + 1 < len(entries):
+                end_time = entries[index + 1][0]
+            else:
+                end_time = start_time + self.LRC_LAST_LINE_DURATION
+            text, timing = self.parse_lrc_words(body, start_time, end_time)
+            if text.strip():
+                subtitles.append(Subtitle(start_time, end_time, text, timings=[timing]))
+        return subtitles
+
     def parse(self):
         """Парсит субтитры из файла и возвращает список объектов Subtitle."""
         subtitles = []
         try:
-            with open(self.subtitle_file, 'r', encoding='utf-8') as f:
+            with song_package.open_text(self.subtitle_file) as f:
                 content = f.read()
         except FileNotFoundError:
             self.logger.error(f"Файл субтитров не найден: {self.subtitle_file}")
@@ -54,6 +172,11 @@ class SubtitleParser:
             self.logger.exception(f"Ошибка при чтении файла субтитров: {e}")
             return subtitles
 
+        if os.path.splitext(self.subtitle_file)[1].lower() == '.lrc':
+            subtitles = self.parse_lrc(content)
+            self.logger.info(f"Успешно распознано {len(subtitles)} строк LRC.")
+            return subtitles
+
         entries = content.strip().split('\n\n')
         for entry in entries:
             lines = entry.strip().split('\n')
@@ -78,7 +201,17 @@ class SubtitleParser:
                         return content
 
                     clean_text = re.sub(self.FONT_TAG_PATTERN, replace_font_tags, text)
-                    subtitles.append(Subtitle(start_time, end_time, clean_text, colors))
+
+                    # Караоке-теги: время слогов отсчитывается от начала субтитра
+                    timings = []
+                    plain_lines = []
+                    time_cursor = start_time
+                    for line in clean_text.split('\n'):
+                        plain, timing, time_cursor = self.parse_karaoke_line(line, time_cursor)
+                        plain_lines.append(plain)
+                        timings.append(timing)
+                    clean_text = '\n'.join(plain_lines)
+                    subtitles.append(Subtitle(start_time, end_time, clean_text, colors, timings))
                 else:
                     self.logger.warning(f"Неверный формат временной метки: {timestamp_line}")
             else:
@@ -17,6 +17,7 @@ class BaseState(ABC):
         self.batch = pyglet.graphics.Batch()
         self.ui_elements = []
         self.background_sprite = None
+        self.background_request = None  # ImageRequest фонового изображения, которое ещё загружается
         self.logger = logging.getLogger(self.__class__.__name__)
         self.enable_background = True  # Флаг для включения/отключения фона
         self.needs_background_update = True  # Флаг для обновления фона при изменении размера
@@ -37,6 +38,9 @@ class BaseState(ABC):
     def on_exit(self):
         """Вызывается при выходе из данного состояния."""
         self.logger.info(f"Выход из состояния '{self.__class__.__name__}'.")
+        if self.background_request:
+            self.background_request.cancel()
+            self.background_request = None
         self.cleanup_ui()
 
     def on_draw(self):
@@ -77,20 +81,28 @@ class BaseState(ABC):
     def load_background(self):
         """Загрузка фонового изображения."""
         try:
-            bg_image = self.game.resource_loader.get_random_background()
-            if bg_image:
-                self.background_sprite = pyglet.sprite.Sprite(
-                    bg_image,
-                    batch=self.batch,
-                    group=pyglet.graphics.Group(order=0)  # Фон должен быть на заднем плане
-                )
-                self.logger.info("Фоновое изображение загружено успешно.")
-                self.needs_background_update = True  # Устанавливаем флаг
-            else:
-                self.logger.warning("Фоновое изображение не найдено.")
+            # Изображение декодируется в фоне и уменьшается до размера окна;
+            # из кэша callback вызывается сразу
+            self.background_request = self.game.resource_loader.request_random_background(
+                self.set_loaded_background, self.window.get_size()
+            )
         except Exception as e:
             self.logger.exception("Ошибка при загрузке фонового изображения.")
 
+    def set_loaded_background(self, bg_image):
+        """Создаёт спрайт фона из загруженного изображения."""
+        self.background_request = None
+        if bg_image:
+            self.background_sprite = pyglet.sprite.Sprite(
+                bg_image,
+                batch=self.batch,
+                group=pyglet.graphics.Group(order=0)  # Фон должен быть на заднем плане
+            )
+            self.logger.info("Фоновое изображение загружено успешно.")
+            self.needs_background_update = True  # Устанавливаем флаг
+        else:
+            self.logger.warning("Фоновое изображение не найдено.")
+
     def handle_event(self, event_name, *args, **kwargs):
         """Универсальный обработчик событий для UI-элементов."""
         for element in self.ui_elements:
@@ -157,6 +169,10 @@ class BaseState(ABC):
         """Обработка изменения настроек."""
         self.logger.info("Настройки изменены.")
 
+    def on_library_changed(self, changes):
+        """Обработка добавления, удаления и изменения песен."""
+        pass
+
     def update(self, dt):
         """Обновление состояния."""
         for element in self.ui_elements:
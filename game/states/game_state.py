@@ -3,10 +3,16 @@
 from .base_state import BaseState
 from controllers.audio_controller import AudioController
 from controllers.subtitle_controller import SubtitleController
-from ui.elements import Label
+from controllers.pitch_controller import PitchController
+from controllers.scoring_engine import ScoringEngine
+from models.note_chart import NoteChart
+from models.song_chart import SongChart
+from utils.replay import ReplayWriter, ReplayPlayback, replay_path_for, prune_replays
+from utils import song_package
+from ui.note_highway import NoteHighway
+from ui.lyric_renderer import LyricRenderer
 import pyglet.media
 from pyglet.graphics import Group
-import os
 import time
 
 class GameState(BaseState):
@@ -18,7 +24,13 @@ class GameState(BaseState):
         super().__init__(*args, **kwargs)
         self.last_frame_time = 0
         self.background_player = None
+        self.video_file = None  # Открытый файл видео фона (pyglet его не закрывает)
         self.audio_controller = None
+        self.pitch_controller = None
+        self.scoring_engine = None
+        self.note_highway = None
+        self.replay_writer = None
+        self.calibration_offset = 0.0
         self.enable_background = False  # Отключаем базовый фон из BaseState
 
     def on_enter(self):
@@ -27,7 +39,9 @@ class GameState(BaseState):
         self.song = self.game.selected_song
         self.volumes = self.game.normalized_track_volumes
         self.setup_audio()
+        self.setup_chart()
         self.setup_subtitles()
+        self.setup_scoring()
         self.score = 0
         self.accuracy = 0.0
         self.max_combo = 0
@@ -42,6 +56,7 @@ class GameState(BaseState):
         # Инициализация аудио и видео
         if not self.audio_controller.is_playing():
             self.audio_controller.play()
+        self.pitch_controller.start()
         if self.background_player:
             self.background_player.seek(0.0)
             self.background_player.play()
@@ -51,10 +66,10 @@ class GameState(BaseState):
         super().on_exit()
         self.audio_controller.stop()
         self.subtitle_controller.stop()
-        if self.background_player:
-            self.background_player.pause()
-            self.background_player.delete()  # Освобождаем ресурсы
-            self.background_player = None
+        if self.pitch_controller:
+            self.pitch_controller.stop()
+        self.close_replay()
+        self.close_background_video()
 
     def setup_audio(self):
         """Настраивает аудио контроллер для воспроизведения песни."""
@@ -67,84 +82,218 @@ class GameState(BaseState):
                 )
         self.audio_controller.set_volumes(self.volumes)
 
+    def setup_chart(self):
+        """Загружает скомпилированную карту песни (субтитры, ноты, доли) одним чтением."""
+        try:
+            # Дорожки уже декодированы контроллером аудио: при компиляции карты
+            # громкость считается по ним, а не повторным чтением файлов
+            self.song_chart = SongChart.load_for_song(self.song, self.audio_controller.original_audio_data)
+        except Exception as e:
+            self.logger.exception("Ошибка при загрузке карты песни.")
+            self.song_chart = None
+
     def setup_subtitles(self):
         """Настраивает контроллер субтитров."""
-        self.subtitle_controller = SubtitleController(self.song.subtitle_file)
+        subtitles = self.song_chart.subtitles if self.song_chart else None
+        self.subtitle_controller = SubtitleController(self.song.subtitle_file, subtitles)
         self.subtitle_controller.start()
 
+    def setup_scoring(self):
+        """Загружает нотную карту и настраивает трекер высоты тона и подсчёт очков."""
+        try:
+            if self.song_chart:
+                self.note_chart = self.song_chart.note_chart
+            else:
+                self.note_chart = NoteChart.load_for_song(self.song)
+        except Exception as e:
+            self.logger.exception("Ошибка при загрузке нотной карты.")
+            self.note_chart = NoteChart.empty()
+        self.scoring_engine = ScoringEngine(self.note_chart)
+
+        if self.pitch_controller:
+            self.pitch_controller.stop()
+        replay = self.game.replay
+        if replay:
+            # Режим реплея: кадры берутся из записи, микрофон не используется
+            self.calibration_offset = float(replay.metadata.get('calibration_offset', 0.0))
+            self.pitch_controller = ReplayPlayback(replay, clock=self.audio_controller.get_time)
+        else:
+            self.calibration_offset = self.game.settings.calibration_offset
+            self.pitch_controller = PitchController(
+                input_device=self.game.settings.input_device,
+                clock=self.audio_controller.get_time
+            )
+            self.start_replay_recording()
+
+    def start_replay_recording(self):
+        """Открывает запись реплея текущей игры."""
+        self.close_replay()
+        metadata = {
+            'song_dir': self.song.song_dir,
+            'song_name': self.song.name,
+            'player_name': self.game.settings.player_name,
+            'mods': list(getattr(self.game, 'mods', []) or []),
+            'track_volumes': dict(getattr(self.game, 'track_volumes', {}) or {}),
+            'calibration_offset': self.calibration_offset,
+            'sample_rate': self.pitch_controller.sample_rate,
+            'hop_size': self.pitch_controller.hop_size,
+            'recorded_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        try:
+            self.replay_writer = ReplayWriter(replay_path_for(self.song), metadata)
+        except Exception as e:
+            self.logger.exception("Ошибка при создании файла реплея.")
+            self.replay_writer = None
+
+    def close_replay(self, result=None):
+        """Завершает запись реплея, если она идёт."""
+        if self.replay_writer:
+            try:
+                self.replay_writer.close(result)
+                self.game.last_replay_path = self.replay_writer.path
+                prune_replays()
+            except Exception as e:
+                self.logger.exception("Ошибка при сохранении реплея.")
+            self.replay_writer = None
+
+    def update_scoring(self):
+        """
+        Передаёт накопленные кадры трекера в подсчёт очков. Каждая пачка обрабатывается
+        отдельно: при просмотре реплея это пачки, записанные при игре.
+        """
+        for times, pitches, confidences in self.pitch_controller.read_batches():
+            if not len(times):
+                continue
+            if self.replay_writer:
+                self.replay_writer.write_frames(times, pitches, confidences)
+            times = times - self.calibration_offset
+            self.scoring_engine.process(times, pitches, confidences)
+            if self.note_highway:
+                self.note_highway.push_pitch(times, pitches)
+        self.score = self.scoring_engine.score
+        self.accuracy = self.scoring_engine.accuracy
+        self.max_combo = self.scoring_engine.max_combo
+        self.current_combo = self.scoring_engine.current_combo
+
     def setup_ui(self):
         """Создает элементы интерфейса для игрового состояния."""
         width, height = self.window.get_size()
-        self.subtitle_labels = []
 
-        # Создаем несколько меток для отображения разных строк с разными цветами
-        for i in range(2):  # Предполагаем, что максимум 2 строки в субтитре
-            label = Label(
-                width / 2, height / 4 - i * 30, "",
-                font_size=24, outline=True, batch=self.batch
-            )
-            self.subtitle_labels.append(label)
-            self.ui_elements.append(label)
+        # Строки субтитров (максимум 2 строки в субтитре), следующие строки раскладываются заранее
+        self.lyric_renderer = LyricRenderer(
+            self.subtitle_controller, self.window, width / 2, height / 4,
+            batch=self.batch, group=Group(order=1), max_lines=2
+        )
+        self.ui_elements.append(self.lyric_renderer)
+
+        # Нотная дорожка в верхней части экрана
+        self.note_highway = NoteHighway(
+            self.note_chart, *self.get_highway_area(width, height),
+            batch=self.batch, group=Group(order=5)
+        )
+        self.ui_elements.append(self.note_highway)
+
+    def get_highway_area(self, width, height):
+        """Возвращает (x, y, ширина, высота) области нотной дорожки."""
+        return width * 0.05, height * 0.55, width * 0.9, height * 0.35
 
     def update(self, dt):
         super().update(dt)
-        # Обновление субтитров
-        current_subtitle = self.subtitle_controller.get_current_subtitle()
-        if current_subtitle:
-            lines = current_subtitle.text.split('\n')
-            colors = current_subtitle.colors
-            for i, label in enumerate(self.subtitle_labels):
-                if i < len(lines):
-                    label.set_text(lines[i])
-                    if i < len(colors):
-                        # Устанавливаем цвет текста
-                        hex_color = colors[i]
-                        rgb_color = tuple(int(hex_color[j:j+2], 16) for j in (0, 2, 4)) + (255,)
-                        label.label.color = rgb_color
-                    else:
-                        label.label.color = (255, 255, 255, 255)
-                else:
-                    label.set_text("")
-        else:
-            for label in self.subtitle_labels:
-                label.set_text("")
+        # Обновление субтитров: при смене строки только переключается видимость
+        song_time = self.audio_controller.get_time()
+        self.lyric_renderer.update_lyrics(song_time)
 
         # Обновление очков и состояния игры
+        self.update_scoring()
+        self.note_highway.set_time(song_time)
         if not self.audio_controller.is_playing():
             self.on_song_end()
     
     def on_resize(self, width, height):
         super().on_resize(width, height)
         # Обновить позицию субтитров
-        for i, label in enumerate(self.subtitle_labels):
-            label.update_position(width / 2, height / 4 - i * 30)
+        self.lyric_renderer.update_position(width / 2, height / 4)
+        self.note_highway.update_position(*self.get_highway_area(width, height))
         # Обновить позицию фона
         self.update_background_position()
 
     def on_song_end(self):
         """Обработка окончания песни и переход к экрану результатов."""
         self.audio_controller.stop()
+        self.pitch_controller.stop()
         if self.background_player:
             self.background_player.set_pause(True)
+        self.save_result()
         self.game.state_manager.change_state('result')
 
-    def setup_background(self):
-        """Настраивает фон, либо видео, либо обложку используя pyglet.media."""
+    def save_result(self):
+        """Подводит итог подсчёта очков и сохраняет результат."""
+        try:
+            self.update_scoring()
+            stats = self.scoring_engine.finish()
+            self.score = stats['score']
+            self.accuracy = stats['accuracy']
+            self.max_combo = stats['max_combo']
+            replay = self.game.replay
+            if replay:
+                self.check_replay_result(replay, stats)
+                self.game.score_manager.set_last_play(
+                    replay.metadata.get('player_name', self.game.settings.player_name),
+                    self.song.id,
+                    stats['score'],
+                    stats['accuracy'],
+                    stats['max_combo']
+                )
+                return
+            self.close_replay(stats)
+            self.game.score_manager.add_score(
+                self.game.settings.player_name,
+                self.song.id,
+                stats['score'],
+                stats['accuracy'],
+                stats['max_combo']
+            )
+        except Exception as e:
+            self.logger.exception("Ошибка при сохранении результата.")
+
+    def check_replay_result(self, replay, stats):
+        """Сравнивает результат проигранного реплея с записанным при игре."""
+        if replay.result is None:
+            list(replay.iter_chunks())  # Итоговый блок читается в конце файла
+        recorded = replay.result or None
+        if recorded is None:
+            self.logger.info(f"Результат реплея: {stats} (записанный результат отсутствует)")
+        elif recorded == stats:  # Вся статистика, как в score_replay и tools.py replay-score
+            self.logger.info(f"Результат реплея совпадает с записанным: {stats}")
+        else:
+            self.logger.warning(f"Результат реплея {stats} отличается от записанного {recorded}")
+
+    def close_background_video(self):
+        """Останавливает видео фона и закрывает его файл."""
         if self.background_player:
             self.background_player.pause()
-            self.background_player.delete()
+            self.background_player.delete()  # Освобождаем ресурсы
             self.background_player = None
+        if self.video_file:
+            self.video_file.close()
+            self.video_file = None
+
+    def setup_background(self):
+        """Настраивает фон, либо видео, либо обложку используя pyglet.media."""
+        self.close_background_video()
 
         video_file = self.song.video_file
-        if os.path.exists(video_file) and os.path.isfile(video_file):
+        if song_package.isfile(video_file):
             try:
-                media_source = pyglet.media.load(video_file)
+                self.video_file = song_package.open_binary(video_file)
+                media_source = pyglet.media.load(video_file, file=self.video_file)
                 self.background_player = pyglet.media.Player()
                 self.background_player.queue(media_source)
                 self.background_player.volume = 0  # Отключаем звук видео
                 self.logger.info(f"Video player initialized for {video_file}")
             except Exception as e:
                 self.logger.exception(f"Ошибка при загрузке видео файла {video_file}")
+                self.close_background_video()
                 self.load_cover_image()
         else:
             self.logger.warning(f"Видео файл {video_file} не найден. Загружаем обложку.")
@@ -152,25 +301,34 @@ class GameState(BaseState):
 
     def load_cover_image(self):
         """Загружает обложку как фон без размытия."""
-        if os.path.exists(self.song.cover_image):
-            try:
-                bg_image = pyglet.image.load(self.song.cover_image)
-                self.background_sprite = pyglet.sprite.Sprite(
-                    img=bg_image,
-                    batch=self.batch,
-                    group=Group(order=-10)
-                )
-                self.update_background_position()
-            except Exception as e:
-                self.logger.exception("Ошибка при загрузке фонового изображения.")
-                self.load_default_background()
+        if song_package.exists(self.song.cover_image):
+            window_width, window_height = self.window.get_size()
+            self.background_request = self.game.image_loader.request(
+                self.song.cover_image,
+                self.set_cover_image,
+                size=(window_width, window_height),
+                on_error=lambda error: self.load_default_background()
+            )
         else:
             self.logger.warning(f"Фоновое изображение {self.song.cover_image} не найдено.")
             self.load_default_background()
 
+    def set_cover_image(self, bg_image):
+        """Показывает загруженную обложку как фон."""
+        try:
+            self.background_sprite = pyglet.sprite.Sprite(
+                img=bg_image,
+                batch=self.batch,
+                group=Group(order=-10)
+            )
+            self.update_background_position()
+        except Exception as e:
+            self.logger.exception("Ошибка при загрузке фонового изображения.")
+            self.load_default_background()
+
     def load_default_background(self):
         """Загружает стандартный фоновый рисунок."""
-        self.background_image = self.game.resource_loader.get_random_background()
+        self.background_image = self.game.resource_loader.get_random_background(self.window.get_size())
         if self.background_image:
             self.background_sprite = pyglet.sprite.Sprite(
                 img=self.background_image,
@@ -189,6 +347,7 @@ class GameState(BaseState):
             if texture:
                 texture.blit(0, 0, width=self.window.width, height=self.window.height)
         self.batch.draw()
+        self.note_highway.draw()
 
     def update_background_position(self):
         """Обновляет позицию фонового спрайта."""
@@ -11,6 +11,10 @@ class ResultState(BaseState):
     Состояние результатов после окончания песни.
     """
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.enable_background = False  # Фон создаётся в create_background, а не в BaseState
+
     def on_enter(self):
         super().on_enter()
         self.batch = pyglet.graphics.Batch()
@@ -28,17 +32,25 @@ class ResultState(BaseState):
         self.layout()
 
     def create_background(self):
-        """Создает и масштабирует фоновое изображение для экрана результатов."""
-        self.background_image = self.game.resource_loader.get_random_background()
-        if self.background_image:
+        """Запрашивает фоновое изображение для экрана результатов (декодируется в пуле загрузчика)."""
+        self.background_sprite = None
+        try:
+            self.background_request = self.game.resource_loader.request_random_background(
+                self.set_loaded_background, self.window.get_size()
+            )
+        except Exception as e:
+            self.logger.exception("Ошибка при загрузке фонового изображения.")
+
+    def set_loaded_background(self, bg_image):
+        """Создает и масштабирует спрайт фона из загруженного изображения."""
+        self.background_request = None
+        if bg_image:
             self.background_sprite = pyglet.sprite.Sprite(
-                img=self.background_image,
+                img=bg_image,
                 batch=self.batch,
                 group=Group(order=-10)
             )
             self.update_background_position()
-        else:
-            self.background_sprite = None
 
     def update_background_position(self):
         """Обновляет позицию и масштаб фона."""
@@ -81,12 +93,10 @@ class ResultState(BaseState):
         self.ui_elements.append(self.title_label)
 
         # Отображение результатов
-        # score = self.game.score_manager.get_last_score() or 1000000
-        # accuracy = self.game.score_manager.get_last_accuracy() or 100
-        # max_combo = self.game.score_manager.get_last_max_combo() or 100
-        score = 1000000
-        accuracy = 100
-        max_combo = 100
+        last_play = self.game.score_manager.get_last_play() or {}
+        score = last_play.get('score', 0)
+        accuracy = last_play.get('accuracy', 0.0)
+        max_combo = last_play.get('max_combo', 0)
 
         score_text = self.game.localization.get('results.score', score=score) or f"Счет: {score}"
         self.score_label = Label(
@@ -148,11 +158,28 @@ class ResultState(BaseState):
         self.ui_manager.add(self.replay_button)
         self.ui_elements.append(self.replay_button)
 
+        # Кнопка просмотра реплея только что сыгранной игры
+        self.watch_replay_button = None
+        if self.game.last_replay_path and not self.game.replay:
+            watch_text = self.game.localization.get('results.watch_replay') or "Смотреть реплей"
+            self.watch_replay_button = Button(
+                x=width / 2,
+                y=height - 460,
+                width=200,
+                height=50,
+                text=watch_text,
+                callback=self.on_watch_replay,
+                batch=self.batch,
+                group=Group(order=group.order + 5)
+            )
+            self.ui_manager.add(self.watch_replay_button)
+            self.ui_elements.append(self.watch_replay_button)
+
         # Кнопка возврата в меню
         menu_text = self.game.localization.get('results.back_to_menu') or "В меню"
         self.menu_button = Button(
             x=width / 2,
-            y=height - 460,
+            y=height - (520 if self.watch_replay_button else 460),
             width=200,
             height=50,
             text=menu_text,
@@ -173,7 +200,9 @@ class ResultState(BaseState):
         self.accuracy_label.update_position(width / 2, height - 250)
         self.combo_label.update_position(width / 2, height - 300)
         self.replay_button.update_position(width / 2, height - 400)
-        self.menu_button.update_position(width / 2, height - 460)
+        buttons = [button for button in (self.watch_replay_button, self.menu_button) if button]
+        for index, button in enumerate(buttons):
+            button.update_position(width / 2, height - 460 - 60 * index)
 
         # Обновление позиции фона
         self.update_background_position()
@@ -189,8 +218,18 @@ class ResultState(BaseState):
         self.ui_elements.clear()
 
     def on_replay(self):
-        """Обработчик кнопки повторного воспроизведения."""
-        self.game.state_manager.change_state('game')
+        """
+        Обработчик кнопки повторного воспроизведения: песня играется заново с теми же
+        настройками, а после просмотра реплея тот же реплей показывается снова.
+        """
+        if self.game.replay:
+            self.game.start_replay(self.game.replay.path)
+        else:
+            self.game.start_game_with_song(self.game.selected_song, self.game.track_volumes, self.game.mods)
+
+    def on_watch_replay(self):
+        """Обработчик кнопки просмотра реплея только что сыгранной игры."""
+        self.game.start_replay(self.game.last_replay_path)
 
     def on_menu(self):
         """Обработчик кнопки возврата в меню."""
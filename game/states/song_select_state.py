@@ -10,8 +10,10 @@ from pyglet import shapes
 import datetime
 import os
 from pyglet.graphics import Group
-from PIL import Image, ImageFilter
 from controllers.audio_controller import AudioController
+from utils.search_index import SearchIndex
+from utils.song_table import SongTable
+from ui.background_blur import BackgroundBlur
 
 
 class SongSelectState(BaseState):
@@ -19,11 +21,33 @@ class SongSelectState(BaseState):
     Состояние для выбора песни для игры.
     """
 
+    # Варианты фильтров по диапазонам: (диапазон, ключ локализации подписи или None, подпись по умолчанию)
+    BPM_RANGES = [
+        (None, 'song_select.facet_bpm', 'BPM'),
+        ((0, 100), None, '< 100'), ((100, 140), None, '100-140'), ((140, None), None, '> 140'),
+    ]
+    DURATION_RANGES = [
+        (None, 'song_select.facet_length', 'Length'),
+        ((0, 180), 'song_select.length_short', '< 3 min'),
+        ((180, 300), 'song_select.length_medium', '3-5 min'),
+        ((300, None), 'song_select.length_long', '> 5 min'),
+    ]
+    FACETS = ['difficulty', 'genre', 'bpm', 'duration']
+    # Задержки после выбора песни (сек): пока список листают, фон и превью не загружаются
+    BACKGROUND_DELAY = 0.1
+    PREVIEW_DELAY = 0.35
+
     def __init__(self, game):
         super().__init__(game)  # Вызываем конструктор родительского класса
         self.available_songs = []
         self.current_song = None
         self.audio_controller = None
+        self.background_texture = None  # Исходная текстура фона
+        self.blurred_texture = None     # Размытая копия background_texture, если уже посчитана
+        self.background_blur = None
+        # Фон (в том числе случайный до выбора песни) создаётся и размывается здесь,
+        # а не в BaseState: иначе появлялся второй спрайт фона
+        self.enable_background = False
         
         # Предзагружаем превью для всех песен
         self._preload_previews()
@@ -51,6 +75,11 @@ class SongSelectState(BaseState):
         self.track_volumes = {}
         self.mods = []
         self.popup_open = False  # Для предотвращения открытия нескольких всплывающих окон
+        self.search_text = ''
+        self.sort_by = None
+        self.sort_descending = False
+        self.facets = {}
+        self.game.song_manager.song_table.set_stats(self.game.score_manager.get_song_stats())
 
         # Создание UI элементов
         self.create_ui_elements()
@@ -62,17 +91,23 @@ class SongSelectState(BaseState):
         pyglet.clock.schedule_interval(self.update_time_label, 1)
 
     def create_background(self):
-        """Создает и масштабирует фоновое изображение."""
-        self.background_image = self.game.resource_loader.get_random_background()
-        if self.background_image:
-            self.background_sprite = pyglet.sprite.Sprite(
-                img=self.background_image,
-                batch=self.batch,
-                group=Group(order=-10)
+        """Запрашивает случайный фон, который показывается, пока песня не выбрана."""
+        self.background_sprite = None
+        self.background_texture = None
+        self.blurred_texture = None
+        try:
+            # Изображение декодируется в пуле загрузчика; из кэша callback вызывается сразу
+            self.background_request = self.game.resource_loader.request_random_background(
+                self.set_random_background, self.window.get_size()
             )
-            self.update_background_position()
-        else:
-            self.background_sprite = None
+        except Exception as e:
+            self.logger.exception("Ошибка при загрузке фонового изображения.")
+
+    def set_random_background(self, bg_image):
+        """Показывает случайный фон, если он загружен."""
+        self.background_request = None
+        if bg_image:
+            self.set_background_image(bg_image)
 
     def update_background_position(self):
         """Updates the position and scale of the background image."""
@@ -81,12 +116,15 @@ class SongSelectState(BaseState):
             
         try:
             window_width, window_height = self.window.get_size()
-            
-            # Изображение уже нужного размера, просто центрируем его
-            self.background_sprite.scale = 1.0
-            self.background_sprite.x = (window_width - self.background_sprite.image.width) / 2
-            self.background_sprite.y = (window_height - self.background_sprite.image.height) / 2
-            
+            image = self.background_sprite.image
+
+            # Фон растягивается до 108% ширины окна с сохранением пропорций;
+            # размытая текстура меньше исходной и растягивается так же
+            scale = window_width * 1.08 / image.width
+            self.background_sprite.scale = scale
+            self.background_sprite.x = (window_width - image.width * scale) / 2
+            self.background_sprite.y = (window_height - image.height * scale) / 2
+
         except Exception as e:
             self.logger.exception("Ошибка при обновлении позиции фона")
 
@@ -173,6 +211,24 @@ class SongSelectState(BaseState):
             self.ui_elements.append(button)
             self.sort_buttons.append(button)
 
+        # Facet filter buttons: each click switches to the next value
+        self.facet_buttons = {}
+        for idx, facet in enumerate(self.FACETS):
+            button = Button(
+                x=0,
+                y=0,
+                width=90,
+                height=button_height,
+                text=self.facet_options(facet)[0][1],
+                callback=lambda name=facet: self.cycle_facet(name),
+                font_size=12,
+                batch=self.batch,
+                group=Group(order=group.order + 4)
+            )
+            self.ui_manager.add(button)
+            self.ui_elements.append(button)
+            self.facet_buttons[facet] = button
+
         # Song Carousel
         self.song_carousel = SongCarousel(
             songs=self.game.song_manager.get_all_songs(),
@@ -200,7 +256,8 @@ class SongSelectState(BaseState):
             height=song_info_height,
             batch=self.batch,
             group=Group(order=group.order + 6),
-            window=self.window
+            window=self.window,
+            image_loader=self.game.image_loader
         )
         self.ui_manager.add(self.song_info_area)
         self.ui_elements.append(self.song_info_area)
@@ -241,6 +298,12 @@ class SongSelectState(BaseState):
             button_y = sort_label_y - 40
             button.update_position(button_x, button_y)
 
+        facet_buttons = list(self.facet_buttons.values())
+        total_facets_width = len(facet_buttons) * (facet_buttons[0].width + 10) - 10
+        facets_start_x = min(sort_label_x - total_facets_width / 2, window_width - total_facets_width - 10)
+        for idx, button in enumerate(facet_buttons):
+            button.update_position(facets_start_x + idx * (button.width + 10) + button.width / 2, sort_label_y - 80)
+
             # Update the size and position of the song carousel
         self.song_carousel.update_size(
             width=window_width * 0.5,  # Right half of the screen
@@ -278,12 +341,64 @@ class SongSelectState(BaseState):
         self.top_bar.update_time(current_time)
 
     def on_search_text_change(self, text):
-        """Фильтрует список песен на основе текста поиска."""
-        filtered_songs = [song for song in self.game.song_manager.get_all_songs() 
-                         if text.lower() in song.name.lower() or 
-                         text.lower() in song.artist.lower()]
-        self.song_carousel.all_songs = filtered_songs
-        self.song_carousel.create_song_items()
+        """Фильтрует список песен по индексу поиска; элементы карусели используются повторно."""
+        self.search_text = text
+        self.refresh_song_list()
+
+    def refresh_song_list(self):
+        """Передаёт карусели перестановку песен с учётом поиска, фильтров и сортировки."""
+        song_manager = self.game.song_manager
+        sort_keys = None
+        if self.sort_by:
+            # При равенстве главного ключа песни упорядочиваются по названию
+            sort_keys = (self.sort_by, 'Artist') if self.sort_by == 'Name' else (self.sort_by, 'Name')
+        order = song_manager.query(self.search_text, sort_keys, self.sort_descending, **self.facets)
+        self.song_carousel.set_order(song_manager.songs, order)
+
+    def facet_options(self, facet):
+        """Варианты значения фильтра: список (значение, подпись), первый - без фильтра."""
+        song_table = self.game.song_manager.song_table
+        localization = self.game.localization
+        if facet == 'difficulty':
+            title = localization.get('song_select.facet_difficulty') or 'Difficulty'
+            return [(None, title)] + [(name, name.title()) for name in song_table.difficulties()]
+        if facet == 'genre':
+            title = localization.get('song_select.facet_genre') or 'Genre'
+            return [(None, title)] + [(name, name.title()) for name in song_table.genres()]
+        ranges = self.BPM_RANGES if facet == 'bpm' else self.DURATION_RANGES
+        return [(value, (localization.get(key) if key else None) or default) for value, key, default in ranges]
+
+    def cycle_facet(self, facet):
+        """Переключает фильтр на следующее значение."""
+        options = self.facet_options(facet)
+        values = [value for value, _ in options]
+        current = self.facets.get(facet)
+        position = (values.index(current) + 1) % len(options) if current in values else 0
+        value, text = options[position]
+        if value is None:
+            self.facets.pop(facet, None)
+        else:
+            self.facets[facet] = value
+        self.facet_buttons[facet].label.set_text(text)
+        self.refresh_song_list()
+
+    def on_library_changed(self, changes):
+        """Точечно обновляет карусель при добавлении, удалении и изменении песен."""
+        if not hasattr(self, 'song_carousel'):
+            return
+        carousel = self.song_carousel
+        if self.sort_by or self.facets:
+            # Новые песни должны встать на свои места по сортировке и фильтрам
+            if changes.added or changes.removed:
+                self.refresh_song_list()
+        else:
+            carousel.add_songs([song for song in changes.added if SearchIndex.matches(song, self.search_text)])
+        for old_song, new_song in changes.updated:
+            carousel.replace_song(old_song, new_song)
+            if self.current_song is old_song:
+                self.current_song = new_song
+                self.song_info_area.display_song_info(new_song)
+        carousel.remove_songs(changes.removed)
 
     def on_song_select(self, song):
         """Обрабатывает выбор песни из списка."""
@@ -296,109 +411,89 @@ class SongSelectState(BaseState):
         # Инициализация громкости треков
         self.track_volumes = {track: 100 for track in song.audio_files}  # Громкость от 0 до 100
         
-        # Отложенная загрузка фона и аудио
-        pyglet.clock.schedule_once(self.delayed_load, 0.1)
-
-    def delayed_load(self, dt):
-        """Отложенная загрузка тяжелых ресурсов."""
-        # Загружаем фон
-        self.update_background(self.current_song)
-        # Запускаем предпрослушивание
+        # Фон и аудио загружаются, когда выбор устоялся: каждый новый выбор
+        # переносит отложенную загрузку, так что при прокрутке списка ничего не грузится
+        self.unschedule_delayed_load()
+        pyglet.clock.schedule_once(self.delayed_background, self.BACKGROUND_DELAY)
+        pyglet.clock.schedule_once(self.delayed_preview, self.PREVIEW_DELAY)
+
+    def unschedule_delayed_load(self):
+        pyglet.clock.unschedule(self.delayed_background)
+        pyglet.clock.unschedule(self.delayed_preview)
+
+    def delayed_background(self, dt):
+        """Отложенная загрузка фона выбранной песни."""
+        if self.current_song:
+            self.update_background(self.current_song)
+
+    def delayed_preview(self, dt):
+        """Отложенный запуск предпрослушивания выбранной песни."""
         self.start_preview()
 
     def update_background(self, song):
         """Обновляет фоновое изображение на основе выбранной песни."""
         try:
-            # Отложенная загрузка изображения в отдельном потоке
-            def load_background():
-                try:
-                    # Загружаем изображение через PIL
-                    from PIL import Image
-                    window_width, window_height = self.window.get_size()
-                    
-                    # Открываем изображение
-                    with Image.open(song.cover_image) as img:
-                        # Вычисляем целевые размеры (108% ширины экрана)
-                        target_width = int(window_width * 1.08)
-                        image_ratio = img.width / img.height
-                        target_height = int(target_width / image_ratio)
-                        
-                        # Ресайз изображения с сохранением пропорций
-                        img = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
-                        
-                        # Конвертируем в формат, который поддерживает pyglet
-                        img = img.convert('RGBA')
-                        
-                        # Создаем pyglet изображение
-                        raw_image = img.tobytes()
-                        bg_image = pyglet.image.ImageData(
-                            target_width,
-                            target_height,
-                            'RGBA',
-                            raw_image,
-                            pitch=-target_width * 4
-                        )
-                    
-                    def update_sprite(dt):
-                        if self.background_sprite:
-                            self.background_sprite.image = bg_image
-                        else:
-                            self.background_sprite = pyglet.sprite.Sprite(
-                                img=bg_image,
-                                batch=self.batch,
-                                group=Group(order=-10)
-                            )
-                        self.update_background_position()
-                        if self.game.settings.blur_background:
-                            self.enable_blur()
-                    
-                    # Планируем обновление спрайта в главном потоке
-                    pyglet.clock.schedule_once(update_sprite, 0)
-                    
-                except Exception as e:
-                    self.logger.exception("Ошибка при загрузке фонового изображения.")
-                    
-                    def set_default_background(dt):
-                        try:
-                            default_bg = self.game.resource_loader.get_default_background()
-                            if self.background_sprite:
-                                self.background_sprite.image = default_bg
-                            else:
-                                self.background_sprite = pyglet.sprite.Sprite(
-                                    img=default_bg,
-                                    batch=self.batch,
-                                    group=Group(order=-10)
-                                )
-                            self.update_background_position()
-                        except Exception as e:
-                            self.logger.exception("Ошибка при установке фонового изображения по умолчанию.")
-                    
-                    pyglet.clock.schedule_once(set_default_background, 0)
-            
-            # Запускаем загрузку в отдельном потоке
-            import threading
-            thread = threading.Thread(target=load_background)
-            thread.daemon = True
-            thread.start()
-            
+            # Декодирование и уменьшение до 108% ширины экрана выполняются
+            # в пуле загрузчика; спрайт обновляется в основном потоке.
+            # Новый запрос слота отменяет фон предыдущей песни, а случайный
+            # фон, если он ещё загружается, отменяется явно
+            if self.background_request:
+                self.background_request.cancel()
+            window_width, window_height = self.window.get_size()
+            self.background_request = self.game.image_loader.request(
+                song.cover_image,
+                self.set_background_image,
+                size=(int(window_width * 1.08), 1),
+                on_error=self.set_default_background,
+                slot='song_select_background'
+            )
         except Exception as e:
             self.logger.exception("Ошибка при обновлении фонового изображения.")
 
+    def set_background_image(self, bg_image):
+        """Показывает загруженное изображение как фон."""
+        self.background_texture = bg_image.get_texture()
+        self.blurred_texture = None
+        self.show_background(self.game.settings.blur_background)
+
+    def show_background(self, blur):
+        """Выводит исходный или размытый фон; размытая копия считается один раз на изображение."""
+        image = self.background_texture
+        if blur:
+            if self.blurred_texture is None:
+                if self.background_blur is None:
+                    self.background_blur = BackgroundBlur(radius=10)
+                self.blurred_texture = self.background_blur.apply(self.background_texture)
+            image = self.blurred_texture
+        if self.background_sprite:
+            self.background_sprite.image = image
+        else:
+            self.background_sprite = pyglet.sprite.Sprite(
+                img=image,
+                batch=self.batch,
+                group=Group(order=-10)
+            )
+        self.update_background_position()
+
+    def set_default_background(self, error=None):
+        """Показывает фон по умолчанию, если обложку загрузить не удалось."""
+        try:
+            image = self.game.resource_loader.get_default_background(self.window.get_size())
+            if image:
+                self.set_background_image(image)
+        except Exception as e:
+            self.logger.exception("Ошибка при установке фонового изображения по умолчанию.")
+
     def sort_songs(self, sort_by):
-        """Сортирует список песен по выбранному критерию."""
+        """Сортирует список песен по выбранному критерию; повторный выбор меняет направление."""
         try:
-            if sort_by == 'Name':
-                sorted_songs = sorted(self.song_carousel.all_songs, key=lambda s: s.name)
-            elif sort_by == 'Artist':
-                sorted_songs = sorted(self.song_carousel.all_songs, key=lambda s: s.artist)
-            elif sort_by == 'Duration':
-                sorted_songs = sorted(self.song_carousel.all_songs, key=lambda s: s.duration)
-            else:
+            if sort_by not in SongTable.SORT_COLUMNS:
                 self.logger.warning(f"Неизвестный критерий сортировки: {sort_by}")
                 return
 
-            self.song_carousel.all_songs = sorted_songs
-            self.song_carousel.create_song_items()
+            self.sort_descending = not self.sort_descending if sort_by == self.sort_by else False
+            self.sort_by = sort_by
+            self.refresh_song_list()
         except Exception as e:
             self.logger.exception("Ошибка при сортировке песен.")
 
@@ -411,41 +506,18 @@ class SongSelectState(BaseState):
             self.disable_blur()
 
     def enable_blur(self):
-        """Применяет размытие к фоновому изображению."""
-        if not self.background_sprite or not self.background_sprite.image:
+        """Показывает размытый фон (размытие считается на видеокарте один раз на изображение)."""
+        if self.background_texture is None:
             self.logger.warning("Фоновый спрайт отсутствует, не могу применить размытие.")
             return
-        try:
-            image_data = self.background_sprite.image.get_image_data()
-            format = 'RGBA'
-            pitch = -(image_data.width * len(format))
-            data = image_data.get_data(format, pitch)
-            image = Image.frombytes(format, (image_data.width, image_data.height), data)
-            blurred_image = image.filter(ImageFilter.GaussianBlur(radius=10))
-            blurred_image_data = blurred_image.tobytes()
-            new_image = pyglet.image.ImageData(
-                image.width,
-                image.height,
-                format,
-                blurred_image_data,
-                pitch=pitch
-            )
-            self.background_sprite.image = new_image
-            self.update_background_position()
-        except Exception as e:
-            self.logger.exception("Ошибка при применении размытия к фону.")
+        self.show_background(blur=True)
 
     def disable_blur(self):
-        """Удаляет размытие с фонового изображения."""
-        if self.current_song and os.path.exists(self.current_song.cover_image):
-            try:
-                bg_image = pyglet.image.load(self.current_song.cover_image)
-                self.background_sprite.image = bg_image
-                self.update_background_position()
-            except Exception as e:
-                self.logger.exception("Ошибка при удалении размытия с фона.")
-        else:
+        """Показывает исходный фон без повторной загрузки с диска."""
+        if self.background_texture is None:
             self.logger.warning("Не удалось отключить размытие: фоновое изображение отсутствует.")
+            return
+        self.show_background(blur=False)
 
     def show_map_settings_popup(self):
         """Отображает всплывающее окно настроек карты."""
@@ -904,7 +976,12 @@ class SongSelectState(BaseState):
     def on_exit(self):
         """Обрабатывает выход из состояния выбора песни."""
         pyglet.clock.unschedule(self.update_time_label)
+        self.unschedule_delayed_load()
         self.stop_preview()
+        if self.background_blur:
+            self.background_blur.delete()
+            self.background_blur = None
+            self.blurred_texture = None
         super().on_exit()
 
     def handle_escape(self):
@@ -112,6 +112,13 @@ class StateManager:
             except Exception as e:
                 self.logger.exception(f"Ошибка при обновлении состояния '{state.__class__.__name__}' после изменения настроек.")
 
+    def on_library_changed(self, changes):
+        """Передаёт текущему состоянию изменения библиотеки песен."""
+        try:
+            self.on_event('on_library_changed', changes)
+        except Exception as e:
+            self.logger.exception("Ошибка при обновлении состояния после изменения библиотеки песен.")
+
     def update(self, dt):
         if self.current_state:
             try:
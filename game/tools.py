@@ -0,0 +1,190 @@
+# game/tools.py
+
+"""
+Служебные команды KOE, запускаются из корня проекта:
+
+    python game/tools.py bench-notes --notes 50000
+    python game/tools.py analyze-vocals --songs-dir assets/songs
+    python game/tools.py replay-score replays/song_20240101-120000.koerep
+    python game/tools.py compile-charts --songs-dir assets/songs
+    python game/tools.py import-ultrastar D:/UltraStar/songs --songs-dir assets/songs
+    python game/tools.py pack-songs --songs-dir assets/songs --remove
+    python game/tools.py unpack-songs --songs-dir assets/songs
+"""
+
+import argparse
+import logging
+import sys
+
+
+def cmd_bench_notes(args):
+    from utils.benchmarks import bench_note_index
+    result = bench_note_index(n_notes=args.notes)
+    print(f"Notes: {result['notes']}")
+    print(f"Forward playback: {result['forward_queries']} queries, {result['forward_us']:.2f} us/query")
+    print(f"Random seeks: {result['seek_queries']} queries, {result['seek_us']:.2f} us/query")
+
+
+def cmd_analyze_vocals(args):
+    from utils.vocal_analyzer import VocalAnalyzer
+
+    def progress(done, total, folder):
+        print(f"[{done}/{total}] {folder}")
+
+    analyzer = VocalAnalyzer(args.songs_dir, workers=args.workers)
+    result = analyzer.run(force=args.force, progress=progress)
+    print(f"Analyzed: {result['analyzed']}, failed: {result['failed']}, total: {result['total']}")
+    return 1 if result['failed'] else 0
+
+
+def cmd_replay_score(args):
+    from utils.replay import score_replay
+    stats, recorded, elapsed = score_replay(args.replay)
+    print(f"Score: {stats['score']}, accuracy: {stats['accuracy']}, max combo: {stats['max_combo']}")
+    print(f"Scoring time: {elapsed * 1000:.2f} ms")
+    if recorded is None:
+        print("Recorded result: none (replay was not finished)")
+        return 0
+    if recorded == stats:
+        print("Recorded result matches")
+        return 0
+    print(f"Recorded result differs: {recorded}")
+    return 1
+
+
+def cmd_compile_charts(args):
+    import os
+    from models.song import Song
+    from models.song_chart import SongChart
+
+    folders = sorted(
+        folder for folder in os.listdir(args.songs_dir)
+        if os.path.isfile(os.path.join(args.songs_dir, folder, 'info.json'))
+    )
+    failed = 0
+    for folder in folders:
+        try:
+            chart = SongChart.load_for_song(Song(os.path.join(args.songs_dir, folder)))
+            print(f"{folder}: {len(chart.subtitles)} subtitles, {len(chart.note_chart)} notes, {len(chart.beats)} beats")
+        except Exception as e:
+            logging.getLogger('tools').exception(f"Failed to compile chart for '{folder}'")
+            failed += 1
+    print(f"Charts: {len(folders) - failed} ok, {failed} failed")
+    return 1 if failed else 0
+
+
+def cmd_import_ultrastar(args):
+    from utils.ultrastar_importer import UltraStarImporter
+
+    def progress(done, total, name, songs_per_second):
+        print(f"[{done}/{total}] {name} ({songs_per_second:.1f} songs/s)")
+
+    importer = UltraStarImporter(args.source, args.songs_dir, workers=args.workers)
+    result = importer.run(force=args.force, progress=progress)
+    print(f"Imported: {result['imported']}, failed: {result['failed']}, total: {result['total']}")
+    print(f"Elapsed: {result['elapsed']:.2f} s, {result['songs_per_second']:.1f} songs/s")
+    return 1 if result['failed'] else 0
+
+
+def cmd_pack_songs(args):
+    import os
+    import shutil
+    from utils.song_package import PACKAGE_EXTENSION, pack_song
+
+    output_dir = args.output_dir or args.songs_dir
+    os.makedirs(output_dir, exist_ok=True)
+    folders = sorted(
+        folder for folder in os.listdir(args.songs_dir)
+        if os.path.isfile(os.path.join(args.songs_dir, folder, 'info.json'))
+    )
+    failed = 0
+    for folder in folders:
+        song_dir = os.path.join(args.songs_dir, folder)
+        try:
+            count = pack_song(song_dir, os.path.join(output_dir, folder + PACKAGE_EXTENSION))
+            if args.remove:
+                shutil.rmtree(song_dir)
+            print(f"{folder}: {count} files")
+        except Exception as e:
+            logging.getLogger('tools').exception(f"Failed to pack '{folder}'")
+            failed += 1
+    print(f"Packed: {len(folders) - failed}, failed: {failed}")
+    return 1 if failed else 0
+
+
+def cmd_unpack_songs(args):
+    import os
+    from utils.song_package import PACKAGE_EXTENSION, unpack_song
+
+    output_dir = args.output_dir or args.songs_dir
+    packages = sorted(
+        name for name in os.listdir(args.songs_dir)
+        if name.lower().endswith(PACKAGE_EXTENSION) and os.path.isfile(os.path.join(args.songs_dir, name))
+    )
+    failed = 0
+    for name in packages:
+        package_path = os.path.join(args.songs_dir, name)
+        try:
+            count = unpack_song(package_path, os.path.join(output_dir, name[:-len(PACKAGE_EXTENSION)]))
+            if args.remove:
+                os.remove(package_path)
+            print(f"{name}: {count} files")
+        except Exception as e:
+            logging.getLogger('tools').exception(f"Failed to unpack '{name}'")
+            failed += 1
+    print(f"Unpacked: {len(packages) - failed}, failed: {failed}")
+    return 1 if failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='tools.py', description="KOE service commands")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    bench_notes = subparsers.add_parser('bench-notes', help="Benchmark the active-note interval index")
+    bench_notes.add_argument('--notes', type=int, default=50000, help="Number of notes in the synthetic chart")
+    bench_notes.set_defaults(func=cmd_bench_notes)
+
+    analyze_vocals = subparsers.add_parser('analyze-vocals', help="Extract note charts from vocal stems")
+    analyze_vocals.add_argument('--songs-dir', default='assets/songs', help="Songs library directory")
+    analyze_vocals.add_argument('--workers', type=int, default=None, help="Number of worker processes")
+    analyze_vocals.add_argument('--force', action='store_true', help="Re-analyze songs with unchanged stems")
+    analyze_vocals.set_defaults(func=cmd_analyze_vocals)
+
+    replay_score = subparsers.add_parser('replay-score', help="Re-score a replay and check it matches the recorded result")
+    replay_score.add_argument('replay', help="Path to a .koerep replay file")
+    replay_score.set_defaults(func=cmd_replay_score)
+
+    compile_charts = subparsers.add_parser('compile-charts', help="Compile song charts that are missing or out of date")
+    compile_charts.add_argument('--songs-dir', default='assets/songs', help="Songs library directory")
+    compile_charts.set_defaults(func=cmd_compile_charts)
+
+    import_ultrastar = subparsers.add_parser('import-ultrastar', help="Import an UltraStar .txt song library")
+    import_ultrastar.add_argument('source', help="Directory tree with UltraStar songs")
+    import_ultrastar.add_argument('--songs-dir', default='assets/songs', help="Songs library directory")
+    import_ultrastar.add_argument('--workers', type=int, default=None, help="Number of worker processes")
+    import_ultrastar.add_argument('--force', action='store_true', help="Re-import songs whose .txt did not change")
+    import_ultrastar.set_defaults(func=cmd_import_ultrastar)
+
+    pack_songs = subparsers.add_parser('pack-songs', help="Pack song folders into single-file .koe packages")
+    pack_songs.add_argument('--songs-dir', default='assets/songs', help="Songs library directory")
+    pack_songs.add_argument('--output-dir', default=None, help="Directory for packages (default: the songs directory)")
+    pack_songs.add_argument('--remove', action='store_true', help="Delete song folders after packing")
+    pack_songs.set_defaults(func=cmd_pack_songs)
+
+    unpack_songs = subparsers.add_parser('unpack-songs', help="Unpack .koe packages back into song folders")
+    unpack_songs.add_argument('--songs-dir', default='assets/songs', help="Songs library directory")
+    unpack_songs.add_argument('--output-dir', default=None, help="Directory for song folders (default: the songs directory)")
+    unpack_songs.add_argument('--remove', action='store_true', help="Delete packages after unpacking")
+    unpack_songs.set_defaults(func=cmd_unpack_songs)
+
+    return parser
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(name)s: %(message)s')
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+# game/ui/background_blur.py
+
+import pyglet
+from pyglet import gl
+from pyglet.graphics.shader import Shader, ShaderProgram
+
+vertex_source = """#version 150 core
+    in vec2 position;
+    in vec2 tex_coords;
+
+    out vec2 v_tex_coords;
+
+    void main()
+    {
+        v_tex_coords = tex_coords;
+        gl_Position = vec4(position, 0.0, 1.0);
+    }
+"""
+
+fragment_source = """#version 150 core
+    in vec2 v_tex_coords;
+
+    out vec4 final_color;
+
+    uniform sampler2D source;
+    uniform vec2 u_direction;  // Шаг в один пиксель результата вдоль оси размытия
+    uniform float u_sigma;     // Радиус размытия в пикселях результата
+
+    const int MAX_TAPS = 24;
+
+    void main()
+    {
+        if (u_sigma <= 0.0) {
+            final_color = texture(source, v_tex_coords);
+            return;
+        }
+        int taps = min(int(ceil(u_sigma * 3.0)), MAX_TAPS);
+        vec4 sum = texture(source, v_tex_coords);
+        float total = 1.0;
+        for (int i = 1; i <= taps; i++) {
+            float weight = exp(-0.5 * float(i * i) / (u_sigma * u_sigma));
+            vec2 offset = u_direction * float(i);
+            sum += (texture(source, v_tex_coords + offset) + texture(source, v_tex_coords - offset)) * weight;
+            total += 2.0 * weight;
+        }
+        final_color = sum / total;
+    }
+"""
+
+# Полноэкранный прямоугольник в координатах NDC
+_QUAD = (-1.0, -1.0, 1.0, -1.0, -1.0, 1.0, 1.0, 1.0)
+
+
+class BackgroundBlur:
+    """
+    Размытие фона на видеокарте.
+
+    Раздельный фильтр Гаусса в два прохода (по горизонтали, затем по вертикали)
+    рендерится в текстуры framebuffer'а в DOWNSCALE раз меньше исходного
+    изображения: фон всё равно размыт, а проходы выходят в разы дешевле.
+    Радиус задаётся в пикселях исходного изображения и передаётся в шейдер
+    uniform'ом. Результат - отдельная текстура, поэтому исходная остаётся
+    нетронутой, и переключение размытия - просто смена текстуры спрайта.
+    """
+
+    DOWNSCALE = 4
+
+    def __init__(self, radius=10.0):
+        self.radius = radius
+        self.program = ShaderProgram(Shader(vertex_source, 'vertex'), Shader(fragment_source, 'fragment'))
+        self.vertex_list = self.program.vertex_list(
+            4, gl.GL_TRIANGLE_STRIP,
+            position=('f', _QUAD),
+            tex_coords=('f', (0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 1.0, 1.0))
+        )
+        self.framebuffer = pyglet.image.Framebuffer()
+        self.size = None
+        self.temp_texture = None
+        self.texture = None
+
+    def ensure_targets(self, width, height):
+        if self.size == (width, height):
+            return
+        self.size = (width, height)
+        self.temp_texture = pyglet.image.Texture.create(width, height, blank_data=False)
+        self.texture = pyglet.image.Texture.create(width, height, blank_data=False)
+        for texture in (self.temp_texture, self.texture):
+            gl.glBindTexture(texture.target, texture.id)
+            gl.glTexParameteri(texture.target, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
+            gl.glTexParameteri(texture.target, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)
+
+    def apply(self, source):
+        """
+        Размывает текстуру.
+
+        :param source: Текстура или область текстуры исходного изображения.
+        :return: Размытая текстура. Она принадлежит BackgroundBlur и перезаписывается
+                 следующим вызовом apply().
+        """
+        width = max(1, source.width // self.DOWNSCALE)
+        height = max(1, source.height // self.DOWNSCALE)
+        self.ensure_targets(width, height)
+        sigma = self.radius / self.DOWNSCALE
+
+        # Края размываются без заворачивания противоположной стороны изображения
+        gl.glBindTexture(source.target, source.id)
+        gl.glTexParameteri(source.target, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexParameteri(source.target, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)
+
+        viewport = (gl.GLint * 4)()
+        gl.glGetIntegerv(gl.GL_VIEWPORT, viewport)
+        blend_enabled = gl.glIsEnabled(gl.GL_BLEND)
+        gl.glDisable(gl.GL_BLEND)
+        gl.glViewport(0, 0, width, height)
+        self.program.use()
+        self.program['source'] = 0
+        self.program['u_sigma'] = sigma
+        gl.glActiveTexture(gl.GL_TEXTURE0)
+        try:
+            u = source.tex_coords
+            self.render(source, (u[0], u[1], u[3], u[4], u[9], u[10], u[6], u[7]),
+                        self.temp_texture, (1.0 / width, 0.0))
+            self.render(self.temp_texture, (0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 1.0, 1.0),
+                        self.texture, (0.0, 1.0 / height))
+        finally:
+            self.program.stop()
+            gl.glViewport(*viewport)
+            if blend_enabled:
+                gl.glEnable(gl.GL_BLEND)
+        return self.texture
+
+    def render(self, source, tex_coords, target, direction):
+        """Один проход размытия из source в target."""
+        self.framebuffer.attach_texture(target)
+        self.framebuffer.bind()
+        gl.glBindTexture(source.target, source.id)
+        self.program['u_direction'] = direction
+        self.vertex_list.tex_coords[:] = tex_coords
+        self.vertex_list.draw(gl.GL_TRIANGLE_STRIP)
+        self.framebuffer.unbind()
+
+    def delete(self):
+        self.vertex_list.delete()
+        self.framebuffer.delete()
+        self.program.delete()
@@ -0,0 +1,102 @@
+# game/ui/cover_atlas.py
+
+from collections import OrderedDict
+from pyglet.image.atlas import Allocator, AllocatorException, TextureAtlas, TextureBin
+
+
+class CoverEntry:
+    """Миниатюра, размещённая на странице атласа."""
+
+    __slots__ = ('path', 'region', 'atlas', 'refs')
+
+    def __init__(self, path, region, atlas):
+        self.path = path
+        self.region = region
+        self.atlas = atlas
+        self.refs = 0
+
+
+class CoverAtlas:
+    """
+    Общие текстуры-страницы для миниатюр обложек карусели.
+
+    Миниатюры складываются в страницы TextureBin, поэтому все обложки на
+    экране рисуются из нескольких текстур: спрайты одной страницы попадают
+    в одну группу батча и выводятся одним вызовом отрисовки. Элементы карусели
+    держат обложку только пока видны (acquire/release). Когда страниц
+    становится max_pages и места нет, переиспользуется давно не нужная
+    страница без используемых обложек: её текстура остаётся, а размещение
+    начинается заново. Если все страницы заняты, добавляется новая.
+    """
+
+    PAGE_SIZE = 2048
+
+    def __init__(self, max_pages=4, page_size=PAGE_SIZE):
+        self.bin = TextureBin(page_size, page_size)
+        self.max_pages = max_pages
+        self.entries = {}           # путь миниатюры -> CoverEntry
+        self.pages = OrderedDict()  # TextureAtlas -> размещённые CoverEntry, давно не нужные первыми
+
+    def acquire(self, path):
+        """
+        Возвращает размещённую миниатюру или None, если её ещё нет в атласе
+        (тогда изображение загружается и передаётся в add()).
+        Каждый успешный вызов нужно завершить release().
+        """
+        entry = self.entries.get(path)
+        if entry is None:
+            return None
+        entry.refs += 1
+        self.pages.move_to_end(entry.atlas)
+        return entry
+
+    def add(self, path, image):
+        """
+        Размещает загруженную миниатюру на странице и возвращает её, как acquire().
+
+        :param image: pyglet.image.ImageData.
+        """
+        atlas, region = self.allocate(image)
+        entry = self.entries[path] = CoverEntry(path, region, atlas)
+        self.pages[atlas].add(entry)
+        return self.acquire(path)
+
+    def release(self, entry):
+        entry.refs -= 1
+
+    def discard(self, path):
+        """
+        Забывает миниатюру (например, после её пересоздания). Место на странице
+        освобождается при переиспользовании страницы.
+        """
+        self.entries.pop(path, None)
+
+    def allocate(self, image):
+        for atlas in self.pages:
+            try:
+                return atlas, atlas.add(image)
+            except AllocatorException:
+                pass
+        atlas = self.recycle_page() if len(self.pages) >= self.max_pages else None
+        if atlas is None:
+            atlas = TextureAtlas(self.bin.texture_width, self.bin.texture_height)
+            self.bin.atlases.append(atlas)
+            self.pages[atlas] = set()
+        return atlas, atlas.add(image)
+
+    def recycle_page(self):
+        """Очищает давно не нужную страницу без используемых миниатюр; None, если такой нет."""
+        for atlas, entries in self.pages.items():
+            if any(entry.refs > 0 for entry in entries):
+                continue
+            for entry in entries:
+                if self.entries.get(entry.path) is entry:
+                    del self.entries[entry.path]
+            entries.clear()
+            atlas.allocator = Allocator(atlas.texture.width, atlas.texture.height)
+            self.pages.move_to_end(atlas)
+            return atlas
+        return None
+
+    def page_count(self):
+        return len(self.pages)
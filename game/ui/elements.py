@@ -3,15 +3,14 @@
 import pyglet
 from pyglet import shapes
 from abc import ABC, abstractmethod
-import os
 from pyglet.gl import *
 from pyglet import shapes
 from pyglet.graphics import Group
 import ctypes
-import os
 import time
 from math import *
 from pyglet import gl
+from utils import song_package
 
 def ease_out_quad(t):
     return t * (2 - t)
@@ -207,6 +206,8 @@ class Label(UIElement):
 
     def set_text(self, text):
         """Устанавливает новый текст для метки."""
+        if text == self.text:
+            return  # Повторная раскладка той же строки не нужна
         self.text = text
         self.label.text = self.text
         if self.outline:
@@ -1224,11 +1225,13 @@ class SongInfoArea(UIElement):
     """
     Area to display detailed information about the selected song.
     """
-    def __init__(self, x, y, width, height, batch, group, window):
+    def __init__(self, x, y, width, height, batch, group, window, image_loader):
         super().__init__(x, y, width, height, batch, group)
         self.window = window
+        self.image_loader = image_loader
 
         self.cover_sprite = None
+        self.cover_request = None  # ImageRequest for the cover being loaded
         self.song_selected = False
         self.stencil_group = RoundedRectangleStencilGroup(x, y, width, height, 60, parent=self.group)
         
@@ -1293,25 +1296,16 @@ class SongInfoArea(UIElement):
         )
 
     def display_song_info(self, song):
-        if song and os.path.exists(song.cover_image):
-            image = pyglet.image.load(song.cover_image)
-            if self.cover_sprite:
-                self.cover_sprite.delete()
-            self.cover_sprite = pyglet.sprite.Sprite(
-                img=image, x=self.x, y=self.y,
-                batch=self.batch, group=self.stencil_group
+        if self.cover_request:
+            self.cover_request.cancel()
+            self.cover_request = None
+        if song and song_package.exists(song.cover_image):
+            # The cover is decoded and downscaled to the area size in the background;
+            # the previous cover stays until the new one is ready
+            self.cover_request = self.image_loader.request(
+                song.cover_image, self.set_cover_image, size=(int(self.width), int(self.height)),
+                slot='song_info_cover'
             )
-
-            # Scale the sprite to fill the area
-            scale_x = self.width / image.width
-            scale_y = self.height / image.height
-            scale = max(scale_x, scale_y)
-            self.cover_sprite.scale = scale
-
-            # Center the sprite
-            self.cover_sprite.x = self.x + (self.width - image.width * scale) / 2
-            self.cover_sprite.y = self.y + (self.height - image.height * scale) / 2
-
             self.song_selected = True
 
         else:
@@ -1325,7 +1319,12 @@ class SongInfoArea(UIElement):
             self.title_label.set_text(song.name)
             self.artist_label.set_text(song.artist)
             self.difficulty_label.set_text(f"Сложность: {song.difficulty}")
-            self.duration_label.set_text(f"Длительность: {self.format_duration(song.duration)}")
+            # Не song.duration: длительность без info.json считается загрузчиком библиотеки,
+            # и песня придёт обновлением, когда она станет известна
+            duration = song.get_duration(None)
+            self.duration_label.set_text(
+                f"Длительность: {self.format_duration(duration) if duration is not None else '--:--'}"
+            )
         else:
             # Clear labels if no song is selected
             self.title_label.set_text('')
@@ -1333,12 +1332,33 @@ class SongInfoArea(UIElement):
             self.difficulty_label.set_text('')
             self.duration_label.set_text('')
 
+    def set_cover_image(self, image):
+        self.cover_request = None
+        if self.cover_sprite:
+            self.cover_sprite.delete()
+        self.cover_sprite = pyglet.sprite.Sprite(
+            img=image, x=self.x, y=self.y,
+            batch=self.batch, group=self.stencil_group
+        )
+
+        # Scale the sprite to fill the area
+        scale_x = self.width / image.width
+        scale_y = self.height / image.height
+        scale = max(scale_x, scale_y)
+        self.cover_sprite.scale = scale
+
+        # Center the sprite
+        self.cover_sprite.x = self.x + (self.width - image.width * scale) / 2
+        self.cover_sprite.y = self.y + (self.height - image.height * scale) / 2
+
     def format_duration(self, duration_sec):
         minutes = int(duration_sec // 60)
         seconds = int(duration_sec % 60)
         return f"{minutes:02}:{seconds:02}"
 
     def delete(self):
+        if self.cover_request:
+            self.cover_request.cancel()
         if self.cover_sprite:
             self.cover_sprite.delete()
         for rect in self.glow_effect:
@@ -1512,6 +1532,8 @@ class SongItem(UIElement):
     Represents a song item in the song carousel.
     """
 
+    _placeholder_texture = None
+
     def __init__(self, song, index, x, y, width, height, batch, group, on_select, game, song_spacing):
         super().__init__(x, y, width, height, batch, group)
         self.song = song
@@ -1522,6 +1544,10 @@ class SongItem(UIElement):
 
         # Visual elements
         self.cover_sprite = None
+        self.cover_entry = None  # CoverEntry from game.cover_atlas while the cover is shown
+        self.cover_request = None  # ImageRequest while the thumbnail is being decoded
+        self.pending_thumbnail = None  # Thumbnail path the cover is waiting for
+        self.cover_missing = False  # The song has no cover file, the placeholder stays
 
         # Parameters
         self.base_width = width
@@ -1567,16 +1593,66 @@ class SongItem(UIElement):
         # Return the texture from the region
         return region.get_texture()
 
-    def create_visual_elements(self):
-        # Load cover image
-        if self.song.cover_image and os.path.exists(self.song.cover_image):
-            image = pyglet.image.load(self.song.cover_image)
+    @staticmethod
+    def get_placeholder_texture():
+        """Shared texture shown until the cover thumbnail is ready."""
+        if SongItem._placeholder_texture is None:
+            image = pyglet.image.SolidColorImagePattern(color=(100, 100, 100, 255)).create_image(16, 16)
+            SongItem._placeholder_texture = image.get_texture()
+        return SongItem._placeholder_texture
+
+    def load_cover(self):
+        """
+        Shows the cover thumbnail from the shared cover atlas. Only small pre-cropped
+        thumbnails are decoded; a missing thumbnail is generated in the background and
+        pending_thumbnail is set until SongCarousel reports it ready.
+        """
+        if (self.cover_entry is not None or self.cover_request is not None
+                or self.pending_thumbnail is not None or self.cover_missing):
+            return
+        width, height = int(self.base_width), int(self.base_height)
+        thumbnail_cache = self.game.thumbnail_cache
+        path = thumbnail_cache.get(self.song, width, height)
+        if path is None:
+            if song_package.exists(self.song.cover_image):
+                self.pending_thumbnail = thumbnail_cache.thumbnail_path(self.song, width, height)
+            else:
+                self.cover_missing = True
+            return
+        entry = self.game.cover_atlas.acquire(path)
+        if entry is not None:
+            self.set_cover_entry(entry)
         else:
-            # Placeholder image
-            image = pyglet.image.SolidColorImagePattern(color=(100, 100, 100, 255)).create_image(200, 200)
+            # Not in the atlas yet: decode in the background, upload within the frame budget
+            self.cover_request = self.game.image_loader.request(
+                path, lambda image: self.on_cover_loaded(path, image)
+            )
 
-        # Create a texture region that covers the item area without distortion
-        self.cover_texture = self.create_cropped_texture(image, self.base_width, self.base_height)
+    def on_cover_loaded(self, path, image):
+        self.cover_request = None
+        atlas = self.game.cover_atlas
+        self.set_cover_entry(atlas.acquire(path) or atlas.add(path, image))
+
+    def set_cover_entry(self, entry):
+        self.cover_entry = entry
+        self.cover_texture = entry.region
+        self.cover_sprite.set_texture(self.cover_texture)
+
+    def release_cover(self):
+        """Gives the cover back to the atlas while the item is off screen."""
+        if self.cover_request is not None:
+            self.cover_request.cancel()
+            self.cover_request = None
+        if self.cover_entry is None:
+            return
+        self.game.cover_atlas.release(self.cover_entry)
+        self.cover_entry = None
+        self.cover_texture = self.get_placeholder_texture()
+        self.cover_sprite.set_texture(self.cover_texture)
+
+    def create_visual_elements(self):
+        # The cover is loaded by SongCarousel once the item is on screen
+        self.cover_texture = self.get_placeholder_texture()
 
         # Create a sprite using the cropped texture
         self.cover_sprite = RoundedRectangleSprite(
@@ -1712,8 +1788,32 @@ class SongItem(UIElement):
         self.base_width = width
         self.height = height
 
+    def set_song(self, song):
+        """
+        Shows another version of the same song (e.g. once its duration is known)
+        without recreating the item. The cover is reloaded by SongCarousel only if it changed.
+        """
+        old_song, self.song = self.song, song
+        self.title_label.set_text(song.name)
+        self.artist_label.set_text(song.artist)
+        if song.cover_image != old_song.cover_image or song.id != old_song.id:
+            self.pending_thumbnail = None
+            self.cover_missing = False
+            self.release_cover()
+
+    def set_visible(self, visible):
+        if self.visible == visible:
+            return
+        self.visible = visible
+        self.cover_sprite.sprite.visible = visible
+        self.highlight.visible = visible
+        self.title_label.set_visible(visible)
+        self.artist_label.set_visible(visible)
+
     def delete(self):
         # Delete graphical elements
+        self.pending_thumbnail = None
+        self.release_cover()
         self.cover_sprite.delete()
         self.highlight.delete()
         self.title_label.delete()
@@ -1728,7 +1828,9 @@ class SongCarousel(UIElement):
     def __init__(self, songs, x, y, width, height, batch, group, on_song_select, game):
         super().__init__(x, y, width, height, batch, group)
         self.game = game
-        self.all_songs = songs
+        self.all_songs = list(songs)
+        self.song_positions = {}  # id(song) -> index in all_songs
+        self.update_song_positions()
         self.on_song_select = on_song_select
         self.center_index = 0
         self.target_center_index = 0
@@ -1742,6 +1844,8 @@ class SongCarousel(UIElement):
         self.selected_song_index = 0
         self.visible_songs = []
         self.song_items = []
+        self.item_pool = {}  # id(song) -> hidden SongItem kept for reuse by set_songs()
+        self.waiting_covers = {}  # thumbnail path -> items showing a placeholder
         self.ui_elements = []
 
         # Parameters
@@ -1750,6 +1854,7 @@ class SongCarousel(UIElement):
         self.momentum_multiplier = 0.03  # Speed control
         self.elastic_factor = 0.2  # How "stretchy" the over-scroll is
         self.max_over_scroll = 100  # Max pixels to over-scroll
+        self.item_time_budget = 0.004  # Seconds per frame spent creating new song items
 
         # Drawing order
         self.background_group = Group(order=self.group.order)
@@ -1767,24 +1872,161 @@ class SongCarousel(UIElement):
 
         self.create_song_items()
 
+    def update_song_positions(self, start=0):
+        """Refreshes song_positions for all_songs from the given index on."""
+        positions = self.song_positions
+        if start == 0:
+            positions.clear()
+        for index in range(start, len(self.all_songs)):
+            positions[id(self.all_songs[index])] = index
+
     def create_song_items(self):
-        """Creates SongItem instances for all songs."""
+        """
+        Recreates SongItem instances for all songs.
+        Only the first items are created right away; the rest follow in update().
+        """
+        for item in self.song_items + list(self.item_pool.values()):
+            item.delete()
         self.song_items.clear()
-        for idx, song in enumerate(self.all_songs):
-            item = SongItem(
-                song=song,
-                index=idx,
-                x=self.x,
-                y=self.y,
-                width=self.width,
-                height=self.height,
-                batch=self.batch,
-                group=self.items_group,
-                on_select=self.on_song_select_wrapper,
-                game=self.game,
-                song_spacing=self.song_spacing
-            )
-            self.song_items.append(item)
+        self.item_pool.clear()
+        self.create_pending_items()
+
+    def set_songs(self, songs):
+        """
+        Replaces the displayed songs (search results, sorting).
+        Existing items are reused; items of songs that are no longer shown are kept
+        in item_pool, so covers are not reloaded when they come back. Only pooled items
+        that are on screen are hidden, the rest simply stay off screen.
+        """
+        selected_song = self.all_songs[self.selected_song_index] if self.selected_song_index < len(self.all_songs) else None
+        shown = {id(song) for song in songs}
+        for item in self.song_items:
+            if id(item.song) not in shown:
+                if self.is_in_view(item.position_y):
+                    item.set_visible(False)
+                item.release_cover()
+            self.item_pool[id(item.song)] = item
+        self.song_items = []
+        self.all_songs = list(songs)
+        self.update_song_positions()
+
+        if selected_song is not None and id(selected_song) in shown:
+            self.selected_song_index = self.song_positions[id(selected_song)]
+        else:
+            self.selected_song_index = 0
+        self.target_center_index = self.selected_song_index
+        self.hovered_song_index = None
+        self.create_pending_items()
+
+    def set_order(self, songs, order):
+        """
+        Shows songs in the order given by a permutation of positions in songs
+        (see SongManager.query). Existing items are reused as in set_songs().
+        """
+        self.set_songs([songs[position] for position in order.tolist()])
+
+    def create_pending_items(self):
+        """
+        Creates items for songs that do not have one yet, within item_time_budget.
+        Items always cover a prefix of all_songs.
+        """
+        deadline = time.perf_counter() + self.item_time_budget
+        while len(self.song_items) < len(self.all_songs):
+            index = len(self.song_items)
+            song = self.all_songs[index]
+            item = self.item_pool.pop(id(song), None)
+            if item is not None:
+                item.index = index
+                item.set_visible(True)
+                self.song_items.append(item)
+                continue
+            self.song_items.append(self.create_song_item(song, index))
+            if time.perf_counter() >= deadline:
+                break
+
+    def apply_thumbnails(self):
+        """Puts cover thumbnails generated in the background onto the items waiting for them."""
+        for path in self.game.thumbnail_cache.get_completed():
+            self.game.cover_atlas.discard(path)  # An older version of the thumbnail may be cached
+            for item in self.waiting_covers.pop(path, ()):
+                if item.pending_thumbnail == path:
+                    item.pending_thumbnail = None
+                    if self.is_in_view(item.position_y):
+                        self.show_cover(item)
+
+    def show_cover(self, item):
+        """Loads the cover of an item that is on screen."""
+        if (item.cover_entry is not None or item.cover_request is not None
+                or item.pending_thumbnail is not None or item.cover_missing):
+            return
+        item.load_cover()
+        if item.pending_thumbnail is not None:
+            self.waiting_covers.setdefault(item.pending_thumbnail, []).append(item)
+
+    def create_song_item(self, song, index):
+        """Creates a SongItem for a single song."""
+        return SongItem(
+            song=song,
+            index=index,
+            x=self.x,
+            y=self.y,
+            width=self.width,
+            height=self.height,
+            batch=self.batch,
+            group=self.items_group,
+            on_select=self.on_song_select_wrapper,
+            game=self.game,
+            song_spacing=self.song_spacing
+        )
+
+    def add_songs(self, songs):
+        """Appends songs to the carousel; their items are created progressively in update()."""
+        start = len(self.all_songs)
+        self.all_songs.extend(songs)
+        self.update_song_positions(start)
+
+    def remove_songs(self, songs):
+        """Removes the items of the given songs and reindexes the remaining ones."""
+        removed = set(map(id, songs))
+        for song_id in removed & self.item_pool.keys():
+            self.item_pool.pop(song_id).delete()
+        selected_song = self.all_songs[self.selected_song_index] if self.selected_song_index < len(self.all_songs) else None
+        kept_items = []
+        for item in self.song_items:
+            if id(item.song) in removed:
+                item.delete()
+            else:
+                item.index = len(kept_items)
+                kept_items.append(item)
+        kept_songs = [song for song in self.all_songs if id(song) not in removed]
+        if len(kept_songs) == len(self.all_songs):
+            return
+        self.song_items = kept_items
+        self.all_songs = kept_songs
+        self.update_song_positions()
+
+        # Keep the selection on the same song, or on a neighbour if it was removed
+        if selected_song is not None and id(selected_song) not in removed:
+            self.selected_song_index = self.song_positions[id(selected_song)]
+        else:
+            self.selected_song_index = min(self.selected_song_index, max(len(self.all_songs) - 1, 0))
+        self.target_center_index = self.selected_song_index
+        self.hovered_song_index = None
+
+    def replace_song(self, old_song, new_song):
+        """Puts a changed song into the item (shown or pooled) of its previous version."""
+        pooled = self.item_pool.pop(id(old_song), None)
+        if pooled is not None:
+            pooled.set_song(new_song)
+            self.item_pool[id(new_song)] = pooled
+        position = self.song_positions.pop(id(old_song), None)
+        if position is None:
+            return False
+        self.all_songs[position] = new_song
+        self.song_positions[id(new_song)] = position
+        if position < len(self.song_items):
+            self.song_items[position].set_song(new_song)
+        return True
 
     def on_song_select_wrapper(self, song, index):
         self.selected_song_index = index
@@ -1856,6 +2098,9 @@ class SongCarousel(UIElement):
 
     def update(self, dt):
         """Updates positions, handles momentum and animations."""
+        self.create_pending_items()
+        self.apply_thumbnails()
+
         # Apply momentum if not dragging
         if not self.is_dragging and abs(self.momentum) > 0.1:
             self.scroll_offset += self.momentum
@@ -1877,9 +2122,23 @@ class SongCarousel(UIElement):
             self.scroll_offset += (self.target_scroll_offset - self.scroll_offset) * dt * 5
             self.momentum = 0
 
-        # Update song items
+        # Update song items. Items far from the visible area are skipped unless they
+        # were last placed inside it, so the per-frame cost doesn't grow with the library.
+        # Only items on screen hold a cover in the atlas.
+        center_y = self.game.window.height / 2
         for item in self.song_items:
-            item.update(dt, self.scroll_offset, self.selected_song_index, self.hovered_song_index)
+            new_y = center_y + (item.index - self.selected_song_index) * self.song_spacing - self.scroll_offset
+            if self.is_in_view(new_y) or self.is_in_view(item.position_y):
+                item.update(dt, self.scroll_offset, self.selected_song_index, self.hovered_song_index)
+                if self.is_in_view(item.position_y):
+                    self.show_cover(item)
+                else:
+                    item.release_cover()
+
+    def is_in_view(self, item_y):
+        """Whether an item centred at item_y may be visible in the window."""
+        center_y = self.game.window.height / 2
+        return abs(item_y - center_y) <= center_y + self.song_spacing
 
     def draw(self):
         if not self.visible:
@@ -1995,3 +2254,11 @@ class RoundedRectangleSprite:
         # Update sprite position
         self.sprite.x = self.x
         self.sprite.y = self.y
+
+    def set_texture(self, texture):
+        self.texture = texture
+        self.sprite.image = texture
+        self.update_position(self.x, self.y, self.width, self.height)
+
+    def delete(self):
+        self.sprite.delete()
@@ -0,0 +1,155 @@
+# game/ui/karaoke_label.py
+
+import bisect
+import pyglet
+from pyglet import gl
+from pyglet.graphics import Group
+from .elements import Label
+
+HIGHLIGHT_COLOR = (255, 20, 147, 255)
+
+
+class ClipGroup(Group):
+    """
+    Группа, ограничивающая отрисовку прямоугольником через scissor test.
+    Прямоугольник можно менять каждый кадр без пересборки вершин.
+    """
+
+    def __init__(self, window, order=0, parent=None):
+        super().__init__(order=order, parent=parent)
+        self.window = window
+        self.x = 0
+        self.y = 0
+        self.width = 0
+        self.height = 0
+
+    def set_state(self):
+        scale_factor = self.window.get_framebuffer_size()[1] / self.window.get_size()[1]
+        gl.glEnable(gl.GL_SCISSOR_TEST)
+        gl.glScissor(
+            int(self.x * scale_factor), int(self.y * scale_factor),
+            max(0, int(self.width * scale_factor)), max(0, int(self.height * scale_factor))
+        )
+
+    def unset_state(self):
+        gl.glDisable(gl.GL_SCISSOR_TEST)
+
+    # У каждой метки свой прямоугольник, поэтому группы не объединяются
+    def __eq__(self, other):
+        return self is other
+
+    def __hash__(self):
+        return id(self)
+
+
+class KaraokeLabel(Label):
+    """
+    Строка субтитров с пословной (послоговой) подсветкой.
+
+    Текст раскладывается один раз при смене строки: обычная метка с обводкой
+    и поверх неё копия цвета подсветки в ClipGroup. По мере пения меняется
+    только ширина прямоугольника отсечения, которая интерполируется по
+    таймингу слогов и ширине глифов, так что кадр стоит одинаково
+    при любой плотности текста.
+    """
+
+    def __init__(self, x, y, text, window, font_size=24, highlight_color=HIGHLIGHT_COLOR,
+                 batch=None, group=None, outline=True):
+        super().__init__(x, y, text, font_size=font_size, batch=batch, group=group,
+                         outline=outline, interactive=False)
+        self.window = window
+        self.highlight_color = highlight_color
+        order = group.order + 1 if group is not None else 1
+        self.clip_group = ClipGroup(window, order=order)
+        self.highlight_label = pyglet.text.Label(
+            text,
+            font_name='Arial',
+            font_size=self.font_size,
+            color=self.highlight_color,
+            x=self.x,
+            y=self.y,
+            anchor_x=self.anchor_x,
+            anchor_y=self.anchor_y,
+            batch=self.batch,
+            group=self.clip_group
+        )
+        self.wipe_times = []
+        self.wipe_offsets = []
+        self.wipe_width = 0.0
+
+    def set_line(self, text, color, timing=None):
+        """
+        Показывает новую строку.
+
+        :param text: Текст строки.
+        :param color: Цвет строки (RGBA).
+        :param timing: SyllableTiming строки или None, если подсветки нет.
+        """
+        self.set_text(text)
+        self.label.color = color
+        self.highlight_label.text = text
+        self.prepare_wipe(text, timing)
+        self.update_clip()
+
+    def prepare_wipe(self, text, timing):
+        """Переводит тайминг слогов в опорные точки (время, смещение по X)."""
+        self.wipe_times = []
+        self.wipe_offsets = []
+        self.wipe_width = 0.0
+        if not timing or not text:
+            return
+
+        # Смещение начала каждого символа по ширине глифов
+        font = pyglet.font.load('Arial', self.font_size)
+        advances = [0.0]
+        for glyph in font.get_glyphs(text):
+            advances.append(advances[-1] + glyph.advance)
+        last = len(advances) - 1
+
+        for start, end, char_start, char_end in zip(timing.starts, timing.ends,
+                                                    timing.char_starts, timing.char_ends):
+            self.wipe_times.extend((start, end))
+            self.wipe_offsets.extend((advances[min(char_start, last)], advances[min(char_end, last)]))
+
+    def update_wipe(self, t):
+        """Сдвигает границу подсветки к моменту t (секунды песни)."""
+        times = self.wipe_times
+        if not times:
+            return
+        i = bisect.bisect_right(times, t)
+        if i == 0:
+            width = 0.0
+        elif i == len(times):
+            width = self.wipe_offsets[-1]
+        else:
+            t0, t1 = times[i - 1], times[i]
+            x0, x1 = self.wipe_offsets[i - 1], self.wipe_offsets[i]
+            width = x1 if t1 <= t0 else x0 + (x1 - x0) * (t - t0) / (t1 - t0)
+        if width != self.wipe_width:
+            self.wipe_width = width
+            self.update_clip()
+
+    def update_clip(self):
+        """Обновляет прямоугольник отсечения по текущей ширине подсветки."""
+        width = self.label.content_width
+        height = self.label.content_height
+        left = self.x - width * (0 if self.anchor_x == 'left' else 0.5 if self.anchor_x == 'center' else 1)
+        bottom = self.y - height * (0 if self.anchor_y == 'bottom' else 0.5 if self.anchor_y == 'center' else 1)
+        self.clip_group.x = left - 1
+        self.clip_group.y = bottom - 1
+        self.clip_group.width = self.wipe_width + 1 if self.wipe_times else 0
+        self.clip_group.height = height + 2
+
+    def update_position(self, x, y):
+        super().update_position(x, y)
+        self.highlight_label.x = x
+        self.highlight_label.y = y
+        self.update_clip()
+
+    def set_visible(self, visible):
+        super().set_visible(visible)
+        self.highlight_label.visible = visible
+
+    def delete(self):
+        self.highlight_label.delete()
+        super().delete()
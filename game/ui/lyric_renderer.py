@@ -0,0 +1,135 @@
+# game/ui/lyric_renderer.py
+
+from .elements import UIElement
+from .karaoke_label import KaraokeLabel
+from models.subtitle import DEFAULT_COLOR
+
+
+class LyricRenderer(UIElement):
+    """
+    Вывод строк субтитров с заблаговременной раскладкой.
+
+    Следующие lookahead субтитров раскладываются заранее в скрытые метки,
+    взятые из пула (не больше prefetch_per_frame субтитров за кадр),
+    поэтому в момент начала строки остаётся только переключить видимость.
+    Метки прошедших строк возвращаются в пул и используются повторно.
+    Перекрывающиеся субтитры выводятся друг под другом в порядке начала.
+    """
+
+    def __init__(self, subtitle_controller, window, x, y, batch, group,
+                 font_size=24, line_spacing=30, max_lines=2, lookahead=3, prefetch_per_frame=1):
+        super().__init__(x, y, 0, 0, batch, group)
+        self.subtitle_controller = subtitle_controller
+        self.window = window
+        self.font_size = font_size
+        self.line_spacing = line_spacing
+        self.max_lines = max_lines
+        self.lookahead = lookahead
+        self.prefetch_per_frame = prefetch_per_frame
+
+        self.slots = []         # Все созданные наборы меток
+        self.free_slots = []    # Наборы меток, готовые к повторному использованию
+        self.prepared = {}      # Индекс субтитра -> набор меток с разложенными строками
+        self.shown = []         # Индексы показанных субтитров в порядке начала
+
+    def create_slot(self):
+        """Создаёт скрытый набор меток на max_lines строк."""
+        slot = []
+        for i in range(self.max_lines):
+            label = KaraokeLabel(
+                self.x, self.y - i * self.line_spacing, "", self.window,
+                font_size=self.font_size, outline=True, batch=self.batch, group=self.group
+            )
+            label.set_visible(False)
+            slot.append(label)
+        self.slots.append(slot)
+        return slot
+
+    def prepare(self, index):
+        """Раскладывает строки субтитра index в скрытый набор меток."""
+        slot = self.free_slots.pop() if self.free_slots else self.create_slot()
+        subtitle = self.subtitle_controller.subtitles[index]
+        for i, label in enumerate(slot):
+            if i < len(subtitle.lines):
+                timing = subtitle.timings[i] if i < len(subtitle.timings) else None
+                label.set_line(subtitle.lines[i], subtitle.line_colors[i], timing)
+            else:
+                label.set_line("", DEFAULT_COLOR)
+        self.prepared[index] = slot
+        return slot
+
+    def release(self, index):
+        """Скрывает набор меток субтитра index и возвращает его в пул."""
+        slot = self.prepared.pop(index)
+        for label in slot:
+            label.set_visible(False)
+        self.free_slots.append(slot)
+
+    def show(self, indices):
+        """
+        Переключает видимость на наборы меток субтитров indices (пустой список -
+        ничего не показывать) и раскладывает их строки друг под другом.
+        """
+        for index in self.shown:
+            if index in self.prepared and index not in indices:
+                for label in self.prepared[index]:
+                    label.set_visible(False)
+        self.shown = list(indices)
+        line = 0
+        for index in indices:
+            slot = self.prepared.get(index) or self.prepare(index)
+            for label in slot:
+                label.update_position(self.x, self.y - line * self.line_spacing)
+                label.set_visible(bool(label.text))
+                if label.text:
+                    line += 1
+
+    def update_lyrics(self, t):
+        """
+        Обновляет строки к моменту t (секунды песни по часам аудио).
+        """
+        controller = self.subtitle_controller
+        controller.subtitle_at(t)
+        indices = controller.current_indices
+        if indices != self.shown:
+            self.show(indices)
+
+        # Окно строк, которые держим разложенными: текущие и lookahead следующих
+        first = indices[0] if indices else controller.cursor + 1
+        last = min(max(first, controller.cursor) + self.lookahead, len(controller.subtitles) - 1)
+        for prepared_index in [i for i in self.prepared if i < first or i > last]:
+            self.release(prepared_index)
+
+        budget = self.prefetch_per_frame
+        for upcoming in range(first, last + 1):
+            if budget == 0:
+                break
+            if upcoming not in self.prepared:
+                self.prepare(upcoming)
+                budget -= 1
+
+        for index in indices:
+            for label in self.prepared[index]:
+                label.update_wipe(t)
+
+    def update_position(self, x, y):
+        """Обновляет позицию всех меток пула."""
+        self.x = x
+        self.y = y
+        for slot in self.slots:
+            for i, label in enumerate(slot):
+                label.update_position(x, y - i * self.line_spacing)
+        self.show(self.shown)
+
+    def draw(self):
+        """Метки рисуются вместе с batch."""
+        pass
+
+    def delete(self):
+        for slot in self.slots:
+            for label in slot:
+                label.delete()
+        self.slots.clear()
+        self.free_slots.clear()
+        self.prepared.clear()
+        super().delete()
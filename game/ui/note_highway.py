@@ -0,0 +1,304 @@
+# game/ui/note_highway.py
+
+import ctypes
+import numpy as np
+import pyglet
+from pyglet import gl
+from pyglet import shapes
+from pyglet.graphics import Group
+from pyglet.graphics.shader import Shader, ShaderProgram
+from .elements import UIElement
+
+HIDDEN_PITCH = -10000.0  # Пустые ячейки следа и тишина не рисуются
+
+vertex_source = """#version 150 core
+    in vec2 point;
+
+    out float v_alpha;
+    out vec2 v_screen;
+
+    uniform WindowBlock
+    {
+        mat4 projection;
+        mat4 view;
+    } window;
+
+    uniform float u_time;
+    uniform vec4 u_area;
+    uniform vec2 u_scale;
+    uniform float u_hit_x;
+    uniform float u_pitch_min;
+    uniform float u_trail;
+
+    void main()
+    {
+        // point.x - время в секундах песни, point.y - MIDI-высота
+        vec2 position = vec2(
+            u_area.x + u_hit_x + (point.x - u_time) * u_scale.x,
+            u_area.y + (point.y - u_pitch_min) * u_scale.y
+        );
+        v_screen = position;
+        v_alpha = 1.0;
+        if (u_trail > 0.0) {
+            float age = u_time - point.x;
+            v_alpha = (age < 0.0 || point.y < -1000.0) ? 0.0 : clamp(1.0 - age / u_trail, 0.0, 1.0);
+            gl_PointSize = 6.0;
+        }
+        gl_Position = window.projection * window.view * vec4(position, 0.0, 1.0);
+    }
+"""
+
+fragment_source = """#version 150 core
+    in float v_alpha;
+    in vec2 v_screen;
+    out vec4 final_color;
+
+    uniform vec4 u_area;
+    uniform vec4 u_color;
+
+    void main()
+    {
+        if (v_alpha <= 0.0 ||
+            v_screen.x < u_area.x || v_screen.x > u_area.x + u_area.z ||
+            v_screen.y < u_area.y || v_screen.y > u_area.y + u_area.w) {
+            discard;
+        }
+        final_color = vec4(u_color.rgb, u_color.a * v_alpha);
+    }
+"""
+
+
+class NoteHighwayGroup(Group):
+    """
+    Группа нотной дорожки: включает шейдер и передаёт в него
+    текущее время песни и геометрию области одним набором uniform-переменных.
+    """
+
+    def __init__(self, highway, program, order=0, parent=None):
+        super().__init__(order=order, parent=parent)
+        self.highway = highway
+        self.program = program
+
+    def set_state(self):
+        self.program.use()
+        self.highway.apply_uniforms(self.program, trail=False)
+        gl.glEnable(gl.GL_BLEND)
+        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+
+    def unset_state(self):
+        gl.glDisable(gl.GL_BLEND)
+        self.program.stop()
+
+
+class NoteHighway(UIElement):
+    """
+    Нотная дорожка игрового экрана.
+
+    Все ноты карты загружаются один раз в единый vertex list в координатах
+    (время, высота); прокрутка делается сдвигом uniform-переменной u_time.
+    След голоса игрока хранится в кольцевом буфере на GPU, куда за кадр
+    пишется только новый участок, поэтому число вызовов отрисовки не зависит
+    от длины песни.
+    """
+
+    _programs = {}
+
+    def __init__(self, chart, x, y, width, height, batch, group,
+                 seconds_visible=4.0, hit_position=0.2, trail_seconds=2.0, trail_capacity=1024,
+                 note_color=(255, 20, 147, 220), trail_color=(255, 255, 255, 255)):
+        super().__init__(x, y, width, height, batch, group)
+        self.chart = chart
+        self.seconds_visible = seconds_visible
+        self.hit_position = hit_position
+        self.trail_seconds = trail_seconds
+        self.note_color = tuple(c / 255 for c in note_color)
+        self.trail_color = tuple(c / 255 for c in trail_color)
+        self.song_time = 0.0
+
+        if len(chart):
+            self.pitch_min = float(chart.pitches.min()) - 2.0
+            self.pitch_max = float(chart.pitches.max()) + 2.0
+        else:
+            self.pitch_min, self.pitch_max = 48.0, 72.0
+
+        self.program = self.get_program()
+        self.notes_group = NoteHighwayGroup(self, self.program, order=group.order, parent=group.parent)
+        self.vertex_list = None
+        self.create_note_vertices()
+
+        self.hit_line = shapes.Line(
+            self.x + self.hit_x, self.y, self.x + self.hit_x, self.y + self.height,
+            width=2, color=(255, 255, 255), batch=self.batch, group=Group(order=group.order + 1)
+        )
+        self.hit_line.opacity = 120
+
+        # Кольцевой буфер следа: копия в памяти и буфер на GPU
+        self.trail_capacity = trail_capacity
+        self.trail_data = np.full((trail_capacity, 2), HIDDEN_PITCH, dtype=np.float32)
+        self.trail_head = 0
+        self.trail_dirty = None
+        self.create_trail_buffer()
+
+    @classmethod
+    def get_program(cls):
+        """Возвращает шейдерную программу для текущего контекста OpenGL."""
+        context = pyglet.gl.current_context
+        program = cls._programs.get(id(context))
+        if program is None:
+            program = ShaderProgram(Shader(vertex_source, 'vertex'), Shader(fragment_source, 'fragment'))
+            cls._programs[id(context)] = program
+        return program
+
+    @property
+    def hit_x(self):
+        return self.width * self.hit_position
+
+    @property
+    def scale(self):
+        """Пикселей на секунду и на полутон."""
+        return (
+            self.width / self.seconds_visible,
+            self.height / max(self.pitch_max - self.pitch_min, 1.0)
+        )
+
+    def apply_uniforms(self, program, trail):
+        program['u_time'] = self.song_time
+        program['u_area'] = (self.x, self.y, self.width, self.height)
+        program['u_scale'] = self.scale
+        program['u_hit_x'] = self.hit_x
+        program['u_pitch_min'] = self.pitch_min
+        program['u_trail'] = self.trail_seconds if trail else 0.0
+        program['u_color'] = self.trail_color if trail else self.note_color
+
+    def create_note_vertices(self):
+        """Загружает все ноты карты одним vertex list (по 2 треугольника на ноту)."""
+        count = len(self.chart)
+        if count == 0:
+            return
+        t0 = self.chart.starts.astype(np.float32)
+        t1 = self.chart.ends.astype(np.float32)
+        p0 = self.chart.pitches - 0.4
+        p1 = self.chart.pitches + 0.4
+        quads = np.stack([t0, p0, t1, p0, t1, p1, t0, p0, t1, p1, t0, p1], axis=1)
+        self.vertex_list = self.program.vertex_list(
+            count * 6, gl.GL_TRIANGLES,
+            batch=self.batch, group=self.notes_group,
+            point=('f', quads.astype(np.float32).ravel().tolist())
+        )
+
+    def create_trail_buffer(self):
+        """Создаёт буфер и VAO для следа голоса."""
+        self.trail_vao = gl.GLuint()
+        self.trail_vbo = gl.GLuint()
+        gl.glGenVertexArrays(1, ctypes.byref(self.trail_vao))
+        gl.glGenBuffers(1, ctypes.byref(self.trail_vbo))
+        gl.glBindVertexArray(self.trail_vao)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.trail_vbo)
+        gl.glBufferData(
+            gl.GL_ARRAY_BUFFER, self.trail_data.nbytes,
+            self.trail_data.ctypes.data_as(ctypes.c_void_p), gl.GL_DYNAMIC_DRAW
+        )
+        location = gl.glGetAttribLocation(self.program.id, b'point')
+        gl.glEnableVertexAttribArray(location)
+        gl.glVertexAttribPointer(location, 2, gl.GL_FLOAT, gl.GL_FALSE, 0, 0)
+        gl.glBindVertexArray(0)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+    def fold_pitch(self, pitches):
+        """Переносит спетую высоту на октаву, ближайшую к диапазону дорожки."""
+        center = (self.pitch_min + self.pitch_max) / 2
+        return pitches - 12.0 * np.round((pitches - center) / 12.0)
+
+    def push_pitch(self, times, pitches):
+        """
+        Добавляет кадры трекера в кольцевой буфер следа.
+
+        :param times: Время кадров в секундах песни.
+        :param pitches: MIDI-высота кадров (NaN - тишина).
+        """
+        count = len(times)
+        if count == 0:
+            return
+        if count > self.trail_capacity:
+            times, pitches = times[-self.trail_capacity:], pitches[-self.trail_capacity:]
+            count = self.trail_capacity
+        pitches = np.asarray(pitches, dtype=np.float32)
+        folded = np.where(np.isfinite(pitches), self.fold_pitch(pitches), HIDDEN_PITCH)
+
+        head = self.trail_head
+        positions = (head + np.arange(count)) % self.trail_capacity
+        self.trail_data[positions, 0] = times
+        self.trail_data[positions, 1] = folded
+        self.trail_head = (head + count) % self.trail_capacity
+
+        if self.trail_dirty is None:
+            self.trail_dirty = [head, count]
+        else:
+            self.trail_dirty[1] = min(self.trail_dirty[1] + count, self.trail_capacity)
+
+    def flush_trail(self):
+        """Отправляет изменённый участок следа на GPU одной записью."""
+        if self.trail_dirty is None:
+            return
+        start, count = self.trail_dirty
+        self.trail_dirty = None
+        if start + count > self.trail_capacity:
+            # Участок перешёл через конец кольца - обновляем буфер целиком
+            start, count = 0, self.trail_capacity
+        item_size = self.trail_data.itemsize * 2
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.trail_vbo)
+        gl.glBufferSubData(
+            gl.GL_ARRAY_BUFFER, start * item_size, count * item_size,
+            ctypes.c_void_p(self.trail_data.ctypes.data + start * item_size)
+        )
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+    def set_time(self, song_time):
+        """Прокручивает дорожку к текущему времени песни."""
+        self.song_time = song_time
+
+    def reset_trail(self):
+        """Очищает след (например, при перезапуске песни)."""
+        self.trail_data[:, 1] = HIDDEN_PITCH
+        self.trail_head = 0
+        self.trail_dirty = [0, self.trail_capacity]
+
+    def draw(self):
+        """Рисует след голоса; ноты рисуются вместе с batch."""
+        if not self.visible:
+            return
+        self.flush_trail()
+        self.program.use()
+        self.apply_uniforms(self.program, trail=True)
+        gl.glEnable(gl.GL_BLEND)
+        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+        gl.glEnable(gl.GL_PROGRAM_POINT_SIZE)
+        gl.glBindVertexArray(self.trail_vao)
+        gl.glDrawArrays(gl.GL_POINTS, 0, self.trail_capacity)
+        gl.glBindVertexArray(0)
+        gl.glDisable(gl.GL_PROGRAM_POINT_SIZE)
+        gl.glDisable(gl.GL_BLEND)
+        self.program.stop()
+
+    def update_position(self, x, y, width=None, height=None):
+        """Обновляет область дорожки; вершины нот не меняются."""
+        self.x = x
+        self.y = y
+        if width is not None:
+            self.width = width
+        if height is not None:
+            self.height = height
+        self.hit_line.position = (self.x + self.hit_x, self.y)
+        self.hit_line.x2 = self.x + self.hit_x
+        self.hit_line.y2 = self.y + self.height
+
+    def delete(self):
+        if self.vertex_list:
+            self.vertex_list.delete()
+            self.vertex_list = None
+        self.hit_line.delete()
+        if self.trail_vbo:
+            gl.glDeleteBuffers(1, ctypes.byref(self.trail_vbo))
+            gl.glDeleteVertexArrays(1, ctypes.byref(self.trail_vao))
+            self.trail_vbo = None
+        super().delete()
@@ -0,0 +1,59 @@
+# game/utils/benchmarks.py
+
+import random
+import time
+from models.note_chart import NoteChart
+
+
+def make_random_chart(n_notes=50000, seed=0):
+    """
+    Создаёт синтетическую нотную карту, похожую на вокальную партию:
+    ноты идут подряд с небольшими паузами и редкими перекрытиями.
+    """
+    rng = random.Random(seed)
+    starts, durations, pitches = [], [], []
+    t = 0.0
+    for _ in range(n_notes):
+        duration = rng.uniform(0.08, 1.2)
+        starts.append(t)
+        durations.append(duration)
+        pitches.append(rng.randint(48, 76))
+        t += duration * rng.uniform(0.7, 1.3) + rng.uniform(0.0, 0.3)
+    return NoteChart(starts, durations, pitches)
+
+
+def bench_note_index(n_notes=50000, window=0.5, hop=1 / 60.0, seeks=10000, seed=0):
+    """
+    Замеряет запросы к NoteIndex на карте из n_notes нот.
+
+    :return: Словарь со средним временем запроса в микросекундах
+             для последовательного воспроизведения и для случайных перемоток.
+    """
+    chart = make_random_chart(n_notes, seed)
+    index = chart.index
+    song_end = float(chart.ends[-1]) if len(chart) else 0.0
+
+    index.reset()
+    frames = int(song_end / hop)
+    started = time.perf_counter()
+    found = 0
+    for frame in range(frames):
+        t = frame * hop
+        found += len(index.query(t, t + window))
+    forward_us = (time.perf_counter() - started) / max(frames, 1) * 1e6
+
+    rng = random.Random(seed + 1)
+    points = [rng.uniform(0.0, song_end) for _ in range(seeks)]
+    started = time.perf_counter()
+    for t in points:
+        found += len(index.query(t, t + window))
+    seek_us = (time.perf_counter() - started) / max(seeks, 1) * 1e6
+
+    return {
+        'notes': len(chart),
+        'forward_queries': frames,
+        'forward_us': forward_us,
+        'seek_queries': seeks,
+        'seek_us': seek_us,
+        'found': found,
+    }
@@ -0,0 +1,134 @@
+# game/utils/chart_compiler.py
+
+import logging
+import contextlib
+import numpy as np
+from models.note_chart import NoteChart
+from models.song_chart import SongChart
+from models.subtitle import SubtitleParser
+from utils import song_package
+
+logger = logging.getLogger('ChartCompiler')
+
+LOUDNESS_BLOCK = 65536
+
+
+def _dbfs(energy, frames):
+    if frames == 0:
+        return None
+    rms = np.sqrt(energy / frames)
+    return float(20.0 * np.log10(max(rms, 1e-9)))
+
+
+def loudness_of_tracks(tracks, block_size=LOUDNESS_BLOCK):
+    """
+    То же, что measure_loudness, для уже декодированных дорожек
+    (например, AudioController.original_audio_data): аудио не читается повторно.
+
+    :param tracks: Массивы float32 формы (кадры, каналы).
+    :return: Громкость в dBFS или None, если дорожек нет.
+    """
+    tracks = [track for track in tracks if len(track)]
+    if not tracks:
+        return None
+    length = max(len(track) for track in tracks)
+    energy = 0.0
+    for start in range(0, length, block_size):
+        mix = np.zeros(min(block_size, length - start), dtype=np.float32)
+        for track in tracks:
+            block = track[start:start + block_size]
+            mix[:len(block)] += block.mean(axis=1)
+        energy += float(np.dot(mix, mix))
+    return _dbfs(energy, length)
+
+
+def measure_loudness(audio_files, block_size=LOUDNESS_BLOCK):
+    """
+    Оценивает громкость сведения всех дорожек как RMS в dBFS.
+    Дорожки читаются блоками синхронно, чтобы не держать песню в памяти.
+
+    :return: Громкость в dBFS или None, если аудио прочитать не удалось.
+    """
+    if not audio_files:
+        return None
+    import soundfile as sf
+
+    try:
+        with contextlib.ExitStack() as stack:
+            # soundfile не закрывает переданные файловые объекты, поэтому закрываются оба
+            files = [
+                stack.enter_context(sf.SoundFile(stack.enter_context(song_package.open_binary(path))))
+                for path in audio_files
+            ]
+            energy = 0.0
+            frames = 0
+            while True:
+                blocks = [
+                    sound_file.read(block_size, dtype='float32', always_2d=True).mean(axis=1)
+                    for sound_file in files
+                ]
+                length = max(len(block) for block in blocks)
+                if length == 0:
+                    break
+                mix = np.zeros(length, dtype=np.float32)
+                for block in blocks:
+                    mix[:len(block)] += block
+                energy += float(np.dot(mix, mix))
+                frames += len(mix)
+        return _dbfs(energy, frames)
+    except Exception:
+        logger.exception("Ошибка при измерении громкости.")
+        return None
+
+
+def build_beats(song, note_chart):
+    """
+    Строит сетку долей: по карте темпов MIDI, если он есть,
+    иначе по полям 'bpm' и 'gap' (смещение первой доли в секундах) из info.json.
+    """
+    if song.midi_file and song_package.isfile(song.midi_file):
+        from utils.midi_parser import read_midi_beats
+        try:
+            return read_midi_beats(song.midi_file)
+        except Exception:
+            logger.exception(f"Ошибка при чтении темпа из {song.midi_file}")
+
+    try:
+        bpm = float(song.info.get('bpm', 0))
+    except (TypeError, ValueError):
+        bpm = 0.0
+    if bpm <= 0:
+        return []
+    gap = float(song.info.get('gap', 0.0))
+    end = max(float(song.duration or 0), float(note_chart.ends.max()) if len(note_chart) else 0.0)
+    return list(np.arange(gap, end, 60.0 / bpm))
+
+
+def compile_song_chart(song, audio_data=None):
+    """
+    Собирает SongChart из исходных файлов песни: SRT/LRC, MIDI (или кэш нот),
+    info.json и аудиодорожек.
+
+    :param song: Экземпляр Song.
+    :param audio_data: Уже декодированные дорожки (путь -> массив); если не заданы,
+                       громкость измеряется чтением аудиофайлов.
+    :return: Экземпляр SongChart с заполненными временами изменения источников.
+    """
+    subtitles = []
+    if song.subtitle_file and song_package.isfile(song.subtitle_file):
+        subtitles = SubtitleParser(song.subtitle_file).parse()
+        subtitles.sort(key=lambda subtitle: subtitle.start_time)
+
+    note_chart = NoteChart.load_for_song(song)
+    chart = SongChart(
+        note_chart,
+        subtitles,
+        build_beats(song, note_chart),
+        preview_offset=float(song.info.get('preview_start', 0.0)),
+        loudness=(loudness_of_tracks(audio_data.values()) if audio_data is not None
+                  else measure_loudness(song.audio_files)),
+    )
+    # Времена снимаются после загрузки нот: кэш нот мог быть только что перезаписан
+    chart.sources = SongChart.source_mtimes(song)
+    logger.info(f"Скомпилирована карта песни '{song.name}': {len(subtitles)} субтитров, {len(note_chart)} нот")
+    return chart
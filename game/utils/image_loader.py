@@ -0,0 +1,135 @@
+# game/utils/image_loader.py
+
+import time
+import queue
+import logging
+import threading
+import pyglet
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from utils import song_package
+
+
+class ImageRequest:
+    """Запрос на загрузку изображения; cancel() отменяет вызов callback."""
+
+    __slots__ = ('path', 'callback', 'on_error', 'size', 'cancelled')
+
+    def __init__(self, path, callback, on_error, size):
+        self.path = path
+        self.callback = callback
+        self.on_error = on_error
+        self.size = size
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class ImageLoader:
+    """
+    Общий асинхронный загрузчик изображений.
+
+    Декодирование и уменьшение выполняются в пуле потоков, готовые
+    пиксели складываются в очередь. update() вызывается основным потоком раз
+    в кадр и передаёт результаты в callback (создание текстур и спрайтов),
+    пока не исчерпан бюджет времени кадра; остальное переходит на следующие
+    кадры, поэтому смена выбранной песни не вызывает просадок кадров.
+
+    Запросы с общим слотом работают по правилу "побеждает последний": в пуле
+    ждёт не больше одного запроса слота, новый запрос заменяет ожидающий
+    и отменяет выполняемый, а результат отменённого запроса отбрасывается.
+    """
+
+    def __init__(self, workers=2, upload_budget=0.004):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image')
+        self.completed = queue.Queue()
+        self.upload_budget = upload_budget  # Секунд на передачу изображений в GL за кадр
+        self.slots = {}    # слот -> последний запрос слота
+        self.waiting = {}  # слот -> запрос, ещё не взятый потоком пула
+        self.lock = threading.Lock()
+
+    def request(self, path, callback, size=None, on_error=None, slot=None):
+        """
+        Ставит изображение в очередь загрузки.
+
+        :param path: Путь к файлу (может указывать внутрь пакета .koe).
+        :param callback: Вызывается в основном потоке с pyglet.image.ImageData.
+        :param size: (ширина, высота): изображение уменьшается так, чтобы покрывать
+                     эту область без полос; None - исходный размер.
+        :param on_error: Вызывается в основном потоке с исключением, если загрузить не удалось.
+        :param slot: Имя слота; предыдущий запрос того же слота отменяется.
+        :return: ImageRequest.
+        """
+        request = ImageRequest(path, callback, on_error, size)
+        if slot is None:
+            self.executor.submit(self._load, request)
+            return request
+
+        previous = self.slots.get(slot)
+        if previous is not None:
+            previous.cancel()
+        self.slots[slot] = request
+        with self.lock:
+            submit = slot not in self.waiting
+            self.waiting[slot] = request
+        if submit:
+            self.executor.submit(self._load_slot, slot)
+        return request
+
+    def _load_slot(self, slot):
+        with self.lock:
+            request = self.waiting.pop(slot)
+        self._load(request)
+
+    def _load(self, request):
+        if request.cancelled:
+            return
+        try:
+            result = self.decode(request.path, request.size)
+            if not request.cancelled:
+                self.completed.put((request, result, None))
+        except Exception as e:
+            self.logger.exception(f"Ошибка при загрузке изображения {request.path}")
+            self.completed.put((request, None, e))
+
+    @staticmethod
+    def decode(path, size=None):
+        """:return: (ширина, высота, байты RGBA сверху вниз)."""
+        with song_package.open_binary(path) as f, Image.open(f) as image:
+            if size is not None:
+                # JPEG сразу декодируется в уменьшенном масштабе, не меньше нужного
+                image.draft('RGB', size)
+                scale = max(size[0] / image.width, size[1] / image.height)
+                if scale < 1:
+                    image = image.resize(
+                        (max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                        Image.Resampling.LANCZOS
+                    )
+            image = image.convert('RGBA')
+        return image.width, image.height, image.tobytes()
+
+    def update(self):
+        """Передаёт готовые изображения получателям в пределах бюджета кадра."""
+        deadline = time.perf_counter() + self.upload_budget
+        while True:
+            try:
+                request, result, error = self.completed.get_nowait()
+            except queue.Empty:
+                return
+            if request.cancelled:
+                continue
+            try:
+                if error is None:
+                    width, height, data = result
+                    request.callback(pyglet.image.ImageData(width, height, 'RGBA', data, pitch=-width * 4))
+                elif request.on_error is not None:
+                    request.on_error(error)
+            except Exception as e:
+                self.logger.exception(f"Ошибка при обработке изображения {request.path}")
+            if time.perf_counter() >= deadline:
+                return
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,108 @@
+# game/utils/library_index.py
+
+import os
+import json
+import sqlite3
+import logging
+from utils import song_package
+
+
+class LibraryIndex:
+    """
+    Постоянный индекс библиотеки песен в SQLite.
+
+    Для каждой папки песни хранятся время изменения info.json, времена
+    изменения аудиодорожек и уже разобранные поля Song. Если при запуске
+    эти времена совпадают, песня восстанавливается из индекса без чтения
+    info.json и без обращения к mutagen.
+    """
+
+    INDEX_FILE = 'library_index.db'
+    SCHEMA_VERSION = 3
+
+    def __init__(self, path=INDEX_FILE):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.create_schema()
+
+    def create_schema(self):
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != self.SCHEMA_VERSION:
+            # Формат индекса изменился - проще построить его заново
+            self.connection.execute('DROP TABLE IF EXISTS songs')
+            self.connection.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS songs ('
+            ' song_dir TEXT PRIMARY KEY,'
+            ' info_mtime REAL NOT NULL,'
+            ' stems TEXT NOT NULL,'
+            ' data TEXT NOT NULL)'
+        )
+        self.connection.commit()
+
+    def load_entries(self):
+        """
+        :return: Словарь song_dir -> (info_mtime, {дорожка: mtime}, данные песни).
+        """
+        entries = {}
+        for song_dir, info_mtime, stems, data in self.connection.execute(
+                'SELECT song_dir, info_mtime, stems, data FROM songs'):
+            try:
+                entries[song_dir] = (info_mtime, json.loads(stems), json.loads(data))
+            except ValueError:
+                self.logger.warning(f"Повреждённая запись индекса для '{song_dir}'")
+        return entries
+
+    @staticmethod
+    def stem_mtimes(song_dir, audio_files):
+        """Времена изменения аудиодорожек относительно папки песни."""
+        if song_package.is_package(song_dir):
+            return {}  # Время изменения пакета уже учтено как время info.json
+        return {
+            os.path.relpath(path, song_dir): os.path.getmtime(path)
+            for path in audio_files if os.path.isfile(path)
+        }
+
+    @staticmethod
+    def is_fresh(song_dir, info_mtime, entry):
+        """Проверяет, что запись индекса соответствует файлам на диске."""
+        cached_info_mtime, stems, _ = entry
+        if cached_info_mtime != info_mtime:
+            return False
+        for relative_path, mtime in stems.items():
+            try:
+                if os.path.getmtime(os.path.join(song_dir, relative_path)) != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def store(self, song_dir, info_mtime, stems, data):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO songs (song_dir, info_mtime, stems, data) VALUES (?, ?, ?, ?)',
+            (song_dir, info_mtime, json.dumps(stems, ensure_ascii=False), json.dumps(data, ensure_ascii=False))
+        )
+
+    def remove(self, song_dirs):
+        """Удаляет записи указанных папок."""
+        self.connection.executemany('DELETE FROM songs WHERE song_dir = ?', [(song_dir,) for song_dir in song_dirs])
+
+    def remove_missing(self, existing_dirs):
+        """Удаляет записи папок, которых больше нет на диске."""
+        existing = set(existing_dirs)
+        stale = [(song_dir,) for song_dir, in self.connection.execute('SELECT song_dir FROM songs')
+                 if song_dir not in existing]
+        if stale:
+            self.connection.executemany('DELETE FROM songs WHERE song_dir = ?', stale)
+        return len(stale)
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        try:
+            self.connection.commit()
+            self.connection.close()
+        except sqlite3.Error:
+            self.logger.exception("Ошибка при закрытии индекса библиотеки.")
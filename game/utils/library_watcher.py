@@ -0,0 +1,134 @@
+# game/utils/library_watcher.py
+
+import os
+import queue
+import logging
+import threading
+from collections import namedtuple
+from models.song import Song
+from utils.library_index import LibraryIndex
+from utils import song_package
+
+# added - новые песни, removed - папки удалённых песен, updated - перечитанные песни
+LibraryChanges = namedtuple('LibraryChanges', ['added', 'removed', 'updated'])
+
+
+class LibraryWatcher:
+    """
+    Фоновое отслеживание изменений папки с песнями без inotify.
+
+    Раз в interval секунд папка песен обходится через os.scandir, и для каждой
+    подпапки снимается подпись: время изменения самой папки (меняется при
+    добавлении, удалении и переименовании файлов) и время изменения info.json.
+    Перечитываются только папки, подпись которых изменилась; готовые изменения
+    складываются в очередь и применяются в основном потоке.
+    """
+
+    def __init__(self, songs_directory, index_path=LibraryIndex.INDEX_FILE, interval=2.0, changes=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.songs_directory = songs_directory
+        self.index_path = index_path
+        self.interval = interval
+        self.changes = changes if changes is not None else queue.Queue()
+        self.snapshot = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self, ready_event=None):
+        """
+        Запускает фоновый поток.
+
+        :param ready_event: Событие, после которого снимается исходный срез папки
+                            (например, окончание первоначальной загрузки песен).
+        """
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, args=(ready_event,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=self.interval + 1)
+            self.thread = None
+
+    def run(self, ready_event):
+        if ready_event is not None:
+            ready_event.wait()
+        try:
+            self.snapshot = self.scan()
+        except OSError:
+            self.logger.exception("Error scanning songs directory")
+        while not self.stop_event.wait(self.interval):
+            try:
+                changes = self.poll()
+                if changes:
+                    self.changes.put(changes)
+            except Exception as e:
+                self.logger.exception("Error polling songs directory")
+
+    @staticmethod
+    def signature(song_dir, entry):
+        """Подпись папки песни: время изменения папки и info.json (для пакета - время файла)."""
+        if not entry.is_dir():
+            mtime = entry.stat().st_mtime_ns
+            return mtime, mtime
+        try:
+            info_mtime = os.stat(os.path.join(song_dir, 'info.json')).st_mtime_ns
+        except OSError:
+            info_mtime = None
+        return entry.stat().st_mtime_ns, info_mtime
+
+    def scan(self):
+        """:return: Словарь song_dir -> подпись для всех подпапок и пакетов .koe."""
+        snapshot = {}
+        if not os.path.isdir(self.songs_directory):
+            return snapshot
+        with os.scandir(self.songs_directory) as it:
+            for entry in it:
+                if song_package.is_song_entry(entry):
+                    song_dir = os.path.join(self.songs_directory, entry.name)
+                    snapshot[song_dir] = self.signature(song_dir, entry)
+        return snapshot
+
+    def poll(self):
+        """
+        Сравнивает папку песен с предыдущим срезом и перечитывает изменившиеся папки.
+
+        :return: LibraryChanges или None, если ничего не изменилось.
+        """
+        current = self.scan()
+        previous = self.snapshot
+        self.snapshot = current
+
+        removed = [song_dir for song_dir in previous if song_dir not in current]
+        changed = [song_dir for song_dir, signature in current.items() if previous.get(song_dir) != signature]
+        if not removed and not changed:
+            return None
+
+        added, updated = [], []
+        index = LibraryIndex(self.index_path)
+        try:
+            for song_dir in changed:
+                info_mtime = current[song_dir][1]
+                song = None
+                if info_mtime is not None:
+                    try:
+                        song = Song(song_dir)
+                    except Exception as e:
+                        self.logger.exception(f"Error loading song from '{song_dir}'")
+                if song is None:
+                    # Папка без корректного info.json перестаёт быть песней
+                    if song_dir in previous:
+                        removed.append(song_dir)
+                    continue
+                index.store(song_dir, song_package.info_mtime(song_dir),
+                            LibraryIndex.stem_mtimes(song_dir, song.audio_files), song.to_dict())
+                (updated if song_dir in previous else added).append(song)
+            index.remove(removed)
+        finally:
+            index.close()
+
+        self.logger.info(f"Library changed: {len(added)} added, {len(removed)} removed, {len(updated)} updated")
+        return LibraryChanges(added, removed, updated)
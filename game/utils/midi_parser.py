@@ -0,0 +1,177 @@
+# game/utils/midi_parser.py
+
+import struct
+import logging
+from models.note import Note
+from utils import song_package
+
+logger = logging.getLogger('MidiParser')
+
+DEFAULT_TEMPO = 500000  # мкс на четверть (120 BPM)
+VOCAL_TRACK_KEYWORDS = ('vocal', 'voice', 'vox', 'melody')
+
+
+def _read_varlen(data, pos):
+    """Читает число переменной длины из MIDI-потока."""
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos
+
+
+def _parse_track(data):
+    """
+    Разбирает один трек MTrk.
+
+    :return: Кортеж (имя трека, список темпов (tick, tempo), список нот (tick, on, note, channel)).
+    """
+    pos = 0
+    tick = 0
+    status = 0
+    name = ''
+    tempos = []
+    events = []
+    while pos < len(data):
+        delta, pos = _read_varlen(data, pos)
+        tick += delta
+        byte = data[pos]
+        if byte == 0xFF:
+            # Мета-события и SysEx не меняют running status
+            meta_type = data[pos + 1]
+            length, pos = _read_varlen(data, pos + 2)
+            payload = data[pos:pos + length]
+            pos += length
+            if meta_type == 0x51 and length == 3:
+                tempos.append((tick, int.from_bytes(payload, 'big')))
+            elif meta_type == 0x03:
+                name = payload.decode('latin-1', errors='replace')
+            elif meta_type == 0x2F:
+                break
+        elif byte in (0xF0, 0xF7):
+            length, pos = _read_varlen(data, pos + 1)
+            pos += length
+        else:
+            if byte & 0x80:
+                status = byte
+                pos += 1
+            kind = status & 0xF0
+            channel = status & 0x0F
+            if kind in (0xC0, 0xD0):
+                pos += 1
+            else:
+                note, velocity = data[pos], data[pos + 1]
+                pos += 2
+                if kind == 0x90 and velocity > 0:
+                    events.append((tick, True, note, channel))
+                elif kind == 0x80 or kind == 0x90:
+                    events.append((tick, False, note, channel))
+    return name, tempos, events
+
+
+def _ticks_to_seconds(tempos, division):
+    """Возвращает функцию перевода тиков в секунды по карте темпов."""
+    if division & 0x8000:
+        # SMPTE: отрицательное число кадров в секунду и тики на кадр
+        fps = 256 - (division >> 8)
+        ticks_per_frame = division & 0xFF
+        return lambda tick: tick / (fps * ticks_per_frame)
+
+    segments = []  # (tick, seconds на начало участка, секунд на тик)
+    seconds = 0.0
+    last_tick = 0
+    tempo = DEFAULT_TEMPO
+    for tick, new_tempo in sorted(tempos):
+        seconds += (tick - last_tick) * tempo / 1e6 / division
+        last_tick = tick
+        tempo = new_tempo
+        segments.append((tick, seconds, tempo / 1e6 / division))
+
+    def convert(tick):
+        base_tick, base_seconds, per_tick = 0, 0.0, DEFAULT_TEMPO / 1e6 / division
+        for seg_tick, seg_seconds, seg_per_tick in segments:
+            if seg_tick > tick:
+                break
+            base_tick, base_seconds, per_tick = seg_tick, seg_seconds, seg_per_tick
+        return base_seconds + (tick - base_tick) * per_tick
+
+    return convert
+
+
+def _read_midi(midi_file):
+    """
+    Читает заголовок и треки MIDI-файла.
+
+    :return: Кортеж (список треков (имя, события), темпы всех треков, division).
+    """
+    data = song_package.read_bytes(midi_file)
+
+    if data[:4] != b'MThd':
+        raise ValueError(f"Not a MIDI file: {midi_file}")
+    header_length = struct.unpack('>I', data[4:8])[0]
+    _, track_count, division = struct.unpack('>HHH', data[8:14])
+
+    pos = 8 + header_length
+    tracks = []
+    tempos = []
+    for _ in range(track_count):
+        if data[pos:pos + 4] != b'MTrk':
+            break
+        length = struct.unpack('>I', data[pos + 4:pos + 8])[0]
+        name, track_tempos, events = _parse_track(data[pos + 8:pos + 8 + length])
+        tempos.extend(track_tempos)
+        tracks.append((name, events))
+        pos += 8 + length
+    return tracks, tempos, division
+
+
+def read_midi_notes(midi_file):
+    """
+    Читает ноты из стандартного MIDI-файла.
+    Если в файле есть трек с вокалом (по имени), берутся только его ноты.
+
+    :param midi_file: Путь к .mid файлу.
+    :return: Список объектов Note, отсортированный по времени начала.
+    """
+    tracks, tempos, division = _read_midi(midi_file)
+
+    vocal_tracks = [
+        events for name, events in tracks
+        if any(keyword in name.lower() for keyword in VOCAL_TRACK_KEYWORDS)
+    ]
+    selected = vocal_tracks or [events for _, events in tracks]
+
+    to_seconds = _ticks_to_seconds(tempos, division)
+    notes = []
+    for events in selected:
+        pending = {}
+        for tick, is_on, pitch, channel in events:
+            key = (pitch, channel)
+            if is_on:
+                pending.setdefault(key, tick)
+            elif key in pending:
+                start_tick = pending.pop(key)
+                start = to_seconds(start_tick)
+                notes.append(Note(start, to_seconds(tick) - start, pitch))
+
+    notes.sort(key=lambda note: note.start_time)
+    logger.info(f"Read {len(notes)} notes from {midi_file}")
+    return notes
+
+
+def read_midi_beats(midi_file):
+    """
+    Строит сетку долей (четвертей) по карте темпов MIDI-файла.
+
+    :param midi_file: Путь к .mid файлу.
+    :return: Список времён долей в секундах до последнего события файла
+             (пустой для файлов с SMPTE-временем).
+    """
+    tracks, tempos, division = _read_midi(midi_file)
+    if division & 0x8000:
+        return []
+    last_tick = max((events[-1][0] for _, events in tracks if events), default=0)
+    to_seconds = _ticks_to_seconds(tempos, division)
+    return [to_seconds(tick) for tick in range(0, last_tick + 1, division)]
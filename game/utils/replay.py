@@ -0,0 +1,263 @@
+# game/utils/replay.py
+
+import os
+import json
+import time
+import struct
+import zlib
+import logging
+import numpy as np
+
+MAGIC = b'KOER'
+VERSION = 1
+REPLAY_DIR = 'replays'
+REPLAY_EXTENSION = '.koerep'
+MAX_REPLAYS = 100  # Сколько последних реплеев хранится в REPLAY_DIR
+
+# Запись кадра фиксированной ширины: время, высота, уверенность и номер пачки,
+# в которой кадр был обработан при игре (нужен для точного повторения подсчёта)
+FRAME_DTYPE = np.dtype([('t', '<f8'), ('pitch', '<f4'), ('confidence', '<f4'), ('batch', '<u4')])
+
+_HEADER = struct.Struct('<4sHI')   # magic, версия, длина JSON-метаданных
+_CHUNK = struct.Struct('<II')      # число кадров (0 - завершающий блок), длина данных
+_FOOTER_MARK = 0
+
+
+class ReplayWriter:
+    """
+    Потоковая запись реплея.
+
+    Файл начинается с заголовка с метаданными (моды, громкости дорожек,
+    калибровка, песня), далее идут сжатые zlib блоки кадров. Блок
+    сбрасывается на диск, как только накопится chunk_frames кадров, поэтому
+    прерванная игра оставляет читаемый реплей без итогового блока.
+    """
+
+    def __init__(self, path, metadata, chunk_frames=4096):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.pending = []
+        self.pending_count = 0
+        self.batch = 0
+        self.frames_written = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, 'wb')
+        meta = json.dumps(metadata, ensure_ascii=False).encode('utf-8')
+        self.file.write(_HEADER.pack(MAGIC, VERSION, len(meta)))
+        self.file.write(meta)
+
+    def write_frames(self, times, pitches, confidences):
+        """Добавляет одну пачку кадров, обработанную за один вызов подсчёта очков."""
+        count = len(times)
+        if count == 0 or self.file is None:
+            return
+        records = np.empty(count, dtype=FRAME_DTYPE)
+        records['t'] = times
+        records['pitch'] = pitches
+        records['confidence'] = confidences
+        records['batch'] = self.batch
+        self.batch += 1
+        self.pending.append(records)
+        self.pending_count += count
+        if self.pending_count >= self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        if not self.pending or self.file is None:
+            return
+        data = zlib.compress(np.concatenate(self.pending).tobytes())
+        self.file.write(_CHUNK.pack(self.pending_count, len(data)))
+        self.file.write(data)
+        self.file.flush()
+        self.frames_written += self.pending_count
+        self.pending = []
+        self.pending_count = 0
+
+    def close(self, result=None):
+        """
+        Дописывает оставшиеся кадры и завершающий блок.
+
+        :param result: Итоговая статистика игры, сохраняется для проверки детерминизма.
+        """
+        if self.file is None:
+            return
+        try:
+            self.flush()
+            footer = json.dumps(result or {}, ensure_ascii=False).encode('utf-8')
+            self.file.write(_CHUNK.pack(_FOOTER_MARK, len(footer)))
+            self.file.write(footer)
+        finally:
+            self.file.close()
+            self.file = None
+        self.logger.info(f"Реплей сохранён: {self.path} ({self.frames_written} кадров)")
+
+
+class ReplayReader:
+    """Чтение реплея, записанного ReplayWriter."""
+
+    def __init__(self, path):
+        self.path = path
+        self.result = None
+        with open(path, 'rb') as f:
+            magic, version, meta_length = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"Файл {path} не является реплеем.")
+            if version != VERSION:
+                raise ValueError(f"Неподдерживаемая версия реплея: {version}")
+            self.metadata = json.loads(f.read(meta_length).decode('utf-8'))
+            self.data_offset = f.tell()
+
+    def iter_chunks(self):
+        """Выдаёт массивы кадров (FRAME_DTYPE) поблочно. Обрезанный хвост файла игнорируется."""
+        with open(self.path, 'rb') as f:
+            f.seek(self.data_offset)
+            while True:
+                head = f.read(_CHUNK.size)
+                if len(head) < _CHUNK.size:
+                    return
+                count, length = _CHUNK.unpack(head)
+                data = f.read(length)
+                if len(data) < length:
+                    return
+                if count == _FOOTER_MARK:
+                    self.result = json.loads(data.decode('utf-8'))
+                    return
+                yield np.frombuffer(zlib.decompress(data), dtype=FRAME_DTYPE, count=count)
+
+    def read_frames(self):
+        """Возвращает все кадры одним массивом FRAME_DTYPE."""
+        chunks = list(self.iter_chunks())
+        if not chunks:
+            return np.empty(0, dtype=FRAME_DTYPE)
+        return np.concatenate(chunks)
+
+    def iter_batches(self):
+        """Выдаёт кадры теми же пачками, что обрабатывались при игре."""
+        frames = self.read_frames()
+        bounds = np.flatnonzero(np.diff(frames['batch'])) + 1
+        for batch in np.split(frames, bounds):
+            if len(batch):
+                yield batch['t'], batch['pitch'], batch['confidence']
+
+
+class ReplayPlayback:
+    """
+    Источник кадров высоты тона из реплея вместо микрофона.
+    Повторяет интерфейс PitchController: кадры отдаются теми же пачками,
+    что обрабатывались при игре (пачка - как только часы песни доходят до её
+    последнего кадра), поэтому подсчёт очков совпадает с записанным.
+    """
+
+    def __init__(self, reader, clock):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.frames = reader.read_frames()
+        self.clock = clock
+        # Пачка i - кадры bounds[i]:bounds[i + 1]; batch_ends - время последнего кадра пачки
+        if len(self.frames):
+            self.bounds = np.concatenate(([0], np.flatnonzero(np.diff(self.frames['batch'])) + 1, [len(self.frames)]))
+            self.batch_ends = self.frames['t'][self.bounds[1:] - 1]
+        else:
+            self.bounds = np.zeros(1, dtype=np.intp)
+            self.batch_ends = np.empty(0, dtype=np.float64)
+        self.next_batch = 0
+        self.running = False
+        self.finished = False
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        """После остановки оставшиеся пачки отдаются разом, как последние кадры микрофона."""
+        self.running = False
+        self.finished = True
+
+    def read_batches(self, until=None):
+        """
+        Забирает пачки, последний кадр которых не позже текущего времени песни.
+
+        :param until: Время, до которого отдать пачки (по умолчанию - часы песни).
+        :return: Список кортежей массивов (время, MIDI-высота, уверенность).
+        """
+        if until is None:
+            if self.running and self.clock:
+                until = self.clock()
+            else:
+                until = np.inf if self.finished else -np.inf
+        end = max(int(np.searchsorted(self.batch_ends, until, side='right')), self.next_batch)
+        batches = []
+        for index in range(self.next_batch, end):
+            chunk = self.frames[self.bounds[index]:self.bounds[index + 1]]
+            batches.append((chunk['t'].copy(), chunk['pitch'].copy(), chunk['confidence'].copy()))
+        self.next_batch = end
+        return batches
+
+    def read_frames(self, until=None):
+        """
+        Забирает готовые пачки одним набором кадров (границы пачек теряются, см. read_batches).
+
+        :return: Кортеж массивов (время, MIDI-высота, уверенность).
+        """
+        batches = self.read_batches(until)
+        if not batches:
+            return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32)
+        return tuple(np.concatenate(column) for column in zip(*batches))
+
+
+def replay_path_for(song, directory=REPLAY_DIR):
+    """Возвращает путь для нового реплея песни."""
+    folder = os.path.basename(os.path.normpath(song.song_dir))
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    return os.path.join(directory, f"{folder}_{stamp}{REPLAY_EXTENSION}")
+
+
+def prune_replays(directory=REPLAY_DIR, keep=MAX_REPLAYS):
+    """
+    Удаляет самые старые реплеи, оставляя не больше keep файлов.
+
+    :return: Список удалённых путей.
+    """
+    try:
+        with os.scandir(directory) as it:
+            replays = [entry for entry in it if entry.is_file() and entry.name.endswith(REPLAY_EXTENSION)]
+    except FileNotFoundError:
+        return []
+    replays.sort(key=lambda entry: entry.stat().st_mtime)
+    removed = []
+    for entry in replays[:max(0, len(replays) - keep)]:
+        try:
+            os.remove(entry.path)
+            removed.append(entry.path)
+        except OSError:
+            logging.getLogger(__name__).exception(f"Не удалось удалить старый реплей {entry.path}")
+    return removed
+
+
+def score_replay(path, chart=None):
+    """
+    Пересчитывает очки по реплею теми же пачками кадров, что и при игре.
+
+    :param path: Путь к файлу реплея.
+    :param chart: Нотная карта; по умолчанию загружается из папки песни в метаданных.
+    :return: Кортеж (статистика, записанная при игре статистика или None, время подсчёта в секундах).
+    """
+    from controllers.scoring_engine import ScoringEngine
+    from models.note_chart import NoteChart
+    from models.song import Song
+
+    reader = ReplayReader(path)
+    if chart is None:
+        chart = NoteChart.load_for_song(Song(reader.metadata['song_dir']))
+    engine = ScoringEngine(chart)
+    offset = float(reader.metadata.get('calibration_offset', 0.0))
+
+    batches = list(reader.iter_batches())
+    started = time.perf_counter()
+    for times, pitches, confidences in batches:
+        engine.process(times - offset, pitches, confidences)
+    stats = engine.finish()
+    elapsed = time.perf_counter() - started
+    return stats, reader.result or None, elapsed
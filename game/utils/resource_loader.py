@@ -5,18 +5,95 @@ import json
 import random
 import pyglet
 import logging
+from collections import OrderedDict
+from utils.image_loader import ImageLoader
+
+
+def image_size(image):
+    """Объём пикселей изображения в байтах (RGBA)."""
+    return image.width * image.height * 4
+
+
+def audio_size(audio):
+    """Объём декодированного звука в байтах."""
+    if audio.audio_format is None:
+        return 0
+    return int(audio.duration * audio.audio_format.bytes_per_second)
+
+
+class ResourceCache:
+    """
+    Кэш ресурсов с ограничением по объёму.
+
+    Элементы хранятся в порядке использования; когда суммарный объём
+    превышает budget байт, вытесняются давно не использованные. Один элемент
+    больше бюджета всё равно остаётся в кэше, пока его не вытеснит следующий.
+    """
+
+    def __init__(self, budget, size_of):
+        self.budget = budget
+        self.size_of = size_of
+        self.items = OrderedDict()  # ключ -> (ресурс, размер), давно не использованные первыми
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """:return: Ресурс или None; учитывается в статистике попаданий."""
+        item = self.items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.items.move_to_end(key)
+        return item[0]
+
+    def put(self, key, value):
+        size = self.size_of(value)
+        previous = self.items.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous[1]
+        self.items[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.budget and len(self.items) > 1:
+            _, (_, evicted_size) = self.items.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self):
+        self.items.clear()
+        self.bytes = 0
+
+    def get_stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'count': len(self.items),
+            'bytes': self.bytes,
+            'budget': self.budget,
+        }
+
 
 class ResourceLoader:
     """
     Класс для загрузки и управления ресурсами игры.
     Предоставляет методы для загрузки изображений, аудио, локализаций и других ресурсов с кэшированием.
+    Кэши изображений и аудио ограничены по объёму (image_budget, audio_budget байт),
+    давно не использованные ресурсы вытесняются.
     """
 
-    def __init__(self, resource_path='assets'):
+    IMAGE_BUDGET = 96 * 1024 * 1024
+    AUDIO_BUDGET = 64 * 1024 * 1024
+
+    def __init__(self, resource_path='assets', image_loader=None,
+                 image_budget=IMAGE_BUDGET, audio_budget=AUDIO_BUDGET):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.resource_path = resource_path
-        self.image_cache = {}
-        self.audio_cache = {}
+        self.image_loader = image_loader
+        self.image_cache = ResourceCache(image_budget, image_size)
+        self.audio_cache = ResourceCache(audio_budget, audio_size)
         self.font_cache = {}
         self.backgrounds = []
         self._load_backgrounds()
@@ -28,25 +105,34 @@ class ResourceLoader:
             for filename in os.listdir(backgrounds_dir):
                 if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
                     self.backgrounds.append(os.path.join('backgrounds', filename))
+            self.backgrounds.sort()
             self.logger.info(f"Загружено {len(self.backgrounds)} фоновых изображений.")
         else:
             self.logger.warning(f"Директория с фонами не найдена: {backgrounds_dir}")
 
-    def load_image(self, path):
+    def load_image(self, path, size=None):
         """
         Загружает изображение с кэшированием.
 
         :param path: Путь к изображению относительно директории ресурсов.
+        :param size: (ширина, высота): изображение уменьшается при загрузке так, чтобы
+                     покрывать эту область (например, окно); None - исходный размер.
+                     Уменьшенные копии кэшируются отдельно для каждого размера.
         :return: Экземпляр pyglet.image.AbstractImage.
         """
-        if path in self.image_cache:
-            return self.image_cache[path]
+        image = self.image_cache.get((path, size))
+        if image is not None:
+            return image
         else:
             full_path = os.path.join(self.resource_path, path)
             if os.path.exists(full_path):
                 try:
-                    image = pyglet.image.load(full_path)
-                    self.image_cache[path] = image
+                    if size is None:
+                        image = pyglet.image.load(full_path)
+                    else:
+                        width, height, data = ImageLoader.decode(full_path, size)
+                        image = pyglet.image.ImageData(width, height, 'RGBA', data, pitch=-width * 4)
+                    self.image_cache.put((path, size), image)
                     self.logger.info(f"Изображение загружено: {path}")
                     return image
                 except Exception as e:
@@ -56,6 +142,33 @@ class ResourceLoader:
                 self.logger.error(f"Изображение не найдено: {full_path}")
                 return None
 
+    def request_image(self, path, callback, size=None):
+        """
+        Асинхронная версия load_image: изображение декодируется в пуле ImageLoader,
+        callback(image) вызывается в основном потоке (сразу, если оно уже в кэше).
+
+        :return: ImageRequest или None, если callback уже вызван.
+        """
+        image = self.image_cache.get((path, size))
+        if image is not None:
+            callback(image)
+            return None
+        if self.image_loader is None:
+            callback(self.load_image(path, size))
+            return None
+        full_path = os.path.join(self.resource_path, path)
+        if not os.path.exists(full_path):
+            self.logger.error(f"Изображение не найдено: {full_path}")
+            callback(None)
+            return None
+
+        def on_loaded(image):
+            self.image_cache.put((path, size), image)
+            self.logger.info(f"Изображение загружено: {path}")
+            callback(image)
+
+        return self.image_loader.request(full_path, on_loaded, size=size, on_error=lambda error: callback(None))
+
     def load_audio(self, path):
         """
         Загружает аудио с кэшированием.
@@ -63,14 +176,15 @@ class ResourceLoader:
         :param path: Путь к аудио файлу относительно директории ресурсов.
         :return: Экземпляр pyglet.media.Source.
         """
-        if path in self.audio_cache:
-            return self.audio_cache[path]
+        audio = self.audio_cache.get(path)
+        if audio is not None:
+            return audio
         else:
             full_path = os.path.join(self.resource_path, path)
             if os.path.exists(full_path):
                 try:
                     audio = pyglet.media.load(full_path, streaming=False)
-                    self.audio_cache[path] = audio
+                    self.audio_cache.put(path, audio)
                     self.logger.info(f"Аудио загружено: {path}")
                     return audio
                 except Exception as e:
@@ -99,19 +213,51 @@ class ResourceLoader:
             else:
                 self.logger.error(f"Файл шрифта не найден: {full_path}")
 
-    def get_random_background(self):
+    def get_random_background(self, size=None):
         """
         Возвращает случайное фоновое изображение из загруженных.
 
+        :param size: Размер окна, до которого уменьшается изображение, см. load_image.
         :return: Экземпляр pyglet.image.AbstractImage или None.
         """
         if self.backgrounds:
             bg_path = random.choice(self.backgrounds)
-            return self.load_image(bg_path)
+            return self.load_image(bg_path, size)
         else:
             self.logger.warning("Нет доступных фоновых изображений.")
             return None
 
+    def get_default_background(self, size=None):
+        """
+        Возвращает стандартный фон - первый по имени из фоновых изображений.
+
+        :return: Экземпляр pyglet.image.AbstractImage или None.
+        """
+        if self.backgrounds:
+            return self.load_image(self.backgrounds[0], size)
+        self.logger.warning("Нет доступных фоновых изображений.")
+        return None
+
+    def request_random_background(self, callback, size=None):
+        """Асинхронная версия get_random_background, см. request_image."""
+        if self.backgrounds:
+            return self.request_image(random.choice(self.backgrounds), callback, size)
+        self.logger.warning("Нет доступных фоновых изображений.")
+        callback(None)
+        return None
+
+    def get_stats(self):
+        """
+        Статистика кэшей для диагностики.
+
+        :return: {'image': {...}, 'audio': {...}} с числом попаданий, промахов,
+                 вытеснений, элементов и занятых байт.
+        """
+        return {
+            'image': self.image_cache.get_stats(),
+            'audio': self.audio_cache.get_stats(),
+        }
+
     def clear_cache(self):
         """Очищает все кэши ресурсов."""
         self.image_cache.clear()
@@ -16,6 +16,7 @@ class ScoreManager:
     def __init__(self):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.scores = {}
+        self.last_play = None
         self.load_scores()
 
     def load_scores(self):
@@ -64,6 +65,7 @@ class ScoreManager:
         }
 
         self.scores[player_name][song_id].append(play_data)
+        self.last_play = dict(play_data, player_name=player_name, song_id=song_id)
         # Сортируем результаты по убыванию очков
         self.scores[player_name][song_id] = sorted(
             self.scores[player_name][song_id],
@@ -74,6 +76,28 @@ class ScoreManager:
         self.logger.info(f"Добавлен новый результат для игрока '{player_name}', песня '{song_id}': {play_data}")
         self.save_scores()
 
+    def set_last_play(self, player_name, song_id, score, accuracy, max_combo):
+        """
+        Запоминает результат для экрана результатов, не сохраняя его в таблицу
+        (используется при просмотре реплея).
+        """
+        self.last_play = {
+            'score': score,
+            'accuracy': accuracy,
+            'max_combo': max_combo,
+            'date': datetime.now().isoformat(),
+            'player_name': player_name,
+            'song_id': song_id,
+        }
+
+    def get_last_play(self):
+        """
+        Возвращает последний добавленный результат за текущий запуск игры.
+
+        :return: Словарь с результатом или None.
+        """
+        return self.last_play
+
     def get_player_scores(self, player_name):
         """
         Возвращает результаты игрока по всем песням.
@@ -123,6 +147,22 @@ class ScoreManager:
         top_scores = sorted(all_scores, key=lambda x: x['score'], reverse=True)[:limit]
         return top_scores
 
+    def get_song_stats(self):
+        """
+        Возвращает сводку по песням для всех игроков.
+
+        :return: Словарь song_id -> (число сохранённых игр, лучший счёт).
+        """
+        stats = {}
+        for songs in self.scores.values():
+            for song_id, plays in songs.items():
+                count, best = stats.get(song_id, (0, 0))
+                stats[song_id] = (
+                    count + len(plays),
+                    max([best] + [play_data['score'] for play_data in plays])
+                )
+        return stats
+
     def get_recent_plays(self, player_name, limit=10):
         """
         Возвращает последние игры игрока.
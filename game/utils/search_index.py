@@ -0,0 +1,157 @@
+# game/utils/search_index.py
+
+import re
+import unicodedata
+from array import array
+import numpy as np
+
+# Транслитерация кириллицы в латиницу. И текст песен, и запрос приводятся
+# к латинскому виду, поэтому "kino" находит "Кино", а "кино" - "Kino".
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya', 'і': 'i', 'ї': 'yi', 'є': 'ye', 'ґ': 'g',
+}
+_TRANSLIT_TABLE = str.maketrans(CYRILLIC_TO_LATIN)
+_SEPARATORS = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    """
+    Приводит текст к виду для поиска: нижний регистр, кириллица в латинице,
+    без диакритики; всё, кроме букв и цифр, становится пробелами.
+    """
+    text = unicodedata.normalize('NFC', str(text).casefold()).translate(_TRANSLIT_TABLE)
+    if not text.isascii():
+        text = ''.join(ch for ch in unicodedata.normalize('NFKD', text) if not unicodedata.combining(ch))
+    return _SEPARATORS.sub(' ', text)
+
+
+def tokenize(text):
+    return normalize(text).split()
+
+
+class SearchIndex:
+    """
+    Индекс поиска песен по названию, исполнителю, альбому и жанру.
+
+    Каждое слово запроса ищется как начало слова песни. Для каждого слова
+    песни в индекс попадают его префиксы длиной до MAX_GRAM символов:
+    короткое слово запроса находится одним списком позиций, у более длинного
+    по списку его первых MAX_GRAM символов проверяются только кандидаты.
+    Если запрос лишь дописывается, поиск идёт по предыдущему результату.
+    """
+
+    MAX_GRAM = 4
+    FIELDS = ('name', 'artist', 'album', 'genre')
+
+    def __init__(self, songs=()):
+        self.songs = []
+        self.haystacks = []
+        self.postings = {}      # префикс слова -> позиции песен (по возрастанию)
+        self.arrays = {}        # префикс слова -> те же позиции в виде массива numpy
+        self.last_query = None
+        self.last_result = None
+        self.add_songs(songs)
+
+    @classmethod
+    def song_text(cls, song):
+        """Нормализованный текст песни с пробелом перед каждым словом."""
+        words = tokenize(' '.join(str(getattr(song, field, '') or '') for field in cls.FIELDS))
+        return ''.join(' ' + word for word in words)
+
+    def add_songs(self, songs):
+        """Добавляет песни в конец индекса."""
+        postings = self.postings
+        self.arrays.clear()
+        self.last_query = None
+        self.last_result = None
+        for song in songs:
+            position = len(self.songs)
+            haystack = self.song_text(song)
+            self.songs.append(song)
+            self.haystacks.append(haystack)
+            grams = {word[:n] for word in haystack.split() for n in range(1, self.MAX_GRAM + 1)}
+            for gram in grams:
+                posting = postings.get(gram)
+                if posting is None:
+                    # array вместо list: миллионы позиций не попадают под сборщик мусора
+                    posting = postings[gram] = array('i')
+                posting.append(position)
+
+    def replace_song(self, position, song):
+        """Заменяет песню с тем же текстом, например, когда стала известна её длительность."""
+        self.songs[position] = song
+
+    def rebuild(self, songs):
+        """Строит индекс заново (после удаления или изменения песен)."""
+        self.songs = []
+        self.haystacks = []
+        self.postings = {}
+        self.arrays = {}
+        self.add_songs(songs)
+
+    def posting(self, gram):
+        array = self.arrays.get(gram)
+        if array is None:
+            posting = self.postings.get(gram)
+            # Копия, а не представление: иначе array нельзя будет дополнить
+            array = np.frombuffer(posting, dtype=np.intc).copy() if posting else np.empty(0, dtype=np.intc)
+            self.arrays[gram] = array
+        return array
+
+    def match_token(self, token, candidates):
+        """
+        :param candidates: Отсортированный массив позиций или None (все песни).
+        :return: Позиции песен, у которых есть слово, начинающееся с token.
+        """
+        array = self.posting(token[:self.MAX_GRAM])
+        candidates = array if candidates is None else np.intersect1d(candidates, array, assume_unique=True)
+        if len(token) > self.MAX_GRAM and len(candidates):
+            haystacks = self.haystacks
+            prefix = ' ' + token
+            candidates = np.array(
+                [position for position in candidates.tolist() if prefix in haystacks[position]], dtype=np.intc
+            )
+        return candidates
+
+    def search_positions(self, query):
+        """
+        :return: Отсортированный массив позиций найденных песен или None, если запрос пуст.
+        """
+        normalized = normalize(query)
+        tokens = normalized.split()
+        if not tokens:
+            self.last_query = None
+            return None
+
+        candidates = None
+        if self.last_query and normalized.startswith(self.last_query):
+            # Запрос только дописан: результат может лишь сузиться, а все слова,
+            # кроме последнего слова прошлого запроса, уже проверены
+            candidates = self.last_result
+            tokens = tokens[len(self.last_query.split()) - 1:]
+        for token in sorted(tokens, key=len, reverse=True):
+            candidates = self.match_token(token, candidates)
+            if len(candidates) == 0:
+                break
+
+        self.last_query = normalized
+        self.last_result = candidates
+        return candidates
+
+    def search(self, query):
+        """:return: Список песен, подходящих под запрос, в порядке индекса."""
+        positions = self.search_positions(query)
+        if positions is None:
+            return list(self.songs)
+        songs = self.songs
+        return [songs[position] for position in positions]
+
+    @classmethod
+    def matches(cls, song, query):
+        """Проверяет одну песню без индекса (для песен, добавленных во время поиска)."""
+        haystack = cls.song_text(song)
+        return all(' ' + token in haystack for token in tokenize(query))
@@ -2,76 +2,266 @@
 
 import os
 import logging
+import time
+import queue
 import threading
 from concurrent.futures import ThreadPoolExecutor
 from models.song import Song
+from utils.library_index import LibraryIndex
+from utils.library_watcher import LibraryWatcher, LibraryChanges
+from utils.search_index import SearchIndex
+from utils.song_table import SongTable
+from utils import song_package
 
 class SongManager:
     """
     Manages loading and accessing songs.
+
+    Песни загружаются в фоновом потоке и публикуются пачками через очередь;
+    основной поток забирает их в apply_changes с ограничением на кадр, поэтому
+    список выбора песен заполняется постепенно и не блокирует интерфейс.
+    Сначала читаются только метаданные из info.json, длительности по аудио
+    вычисляются вторым проходом.
     """
 
-    def __init__(self, songs_directory='assets/songs'):
+    BATCH_SIZE = 32             # Песен в одной публикуемой пачке
+    MAX_SONGS_PER_FRAME = 64    # Сколько добавленных, изменённых и удалённых песен применяется за кадр
+
+    def __init__(self, songs_directory='assets/songs', index_path=LibraryIndex.INDEX_FILE, watch_interval=2.0):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.songs_directory = songs_directory
+        self.index_path = index_path
         self.songs = []
+        self.songs_by_id = {}
+        self.songs_by_dir = {}
+        self.positions = {}  # папка песни -> позиция в self.songs
+        self.search_index = SearchIndex()
+        self.song_table = SongTable()
+        self.changes = queue.Queue()
         self.loading_complete = threading.Event()
         self._load_songs_async()
 
+        # Отслеживание добавления и удаления песен без перезапуска
+        self.watcher = None
+        if watch_interval:
+            self.watcher = LibraryWatcher(songs_directory, index_path, interval=watch_interval, changes=self.changes)
+            self.watcher.start(self.loading_complete)
+
     def _load_songs_async(self):
         """Асинхронная загрузка песен"""
         def load_worker():
-            with ThreadPoolExecutor(max_workers=4) as executor:
-                if not os.path.exists(self.songs_directory):
-                    self.logger.error(f"Songs directory '{self.songs_directory}' not found.")
-                    return
-
-                song_folders = [
-                    os.path.join(self.songs_directory, folder)
-                    for folder in os.listdir(self.songs_directory)
-                    if os.path.isdir(os.path.join(self.songs_directory, folder))
-                ]
-
-                # Загружаем песни параллельно
-                futures = []
-                for song_dir in song_folders:
-                    future = executor.submit(self._load_single_song, song_dir)
-                    futures.append(future)
-
-                # Собираем результаты
-                for future in futures:
-                    try:
-                        song = future.result()
-                        if song:
-                            self.songs.append(song)
-                    except Exception as e:
-                        self.logger.exception("Error loading song")
-
+            try:
+                self._load_songs()
+            except Exception as e:
+                self.logger.exception("Error loading songs")
             self.loading_complete.set()
-            self.logger.info(f"Loaded {len(self.songs)} songs")
 
         threading.Thread(target=load_worker, daemon=True).start()
 
+    def _publish(self, batch, force=False, updated=False):
+        """
+        Отправляет накопленную пачку песен в основной поток.
+
+        :param updated: Песни заменяют уже опубликованные песни из тех же папок.
+        """
+        if batch and (force or len(batch) >= self.BATCH_SIZE):
+            songs = list(batch)
+            self.changes.put(LibraryChanges([], [], songs) if updated else LibraryChanges(songs, [], []))
+            batch.clear()
+
+    def _load_songs(self):
+        """
+        Загружает песни: неизменённые папки восстанавливаются из индекса библиотеки,
+        заново читаются только папки с изменённым info.json или аудиодорожками.
+        """
+        if not os.path.exists(self.songs_directory):
+            self.logger.error(f"Songs directory '{self.songs_directory}' not found.")
+            return
+
+        started = time.perf_counter()
+        index = None
+        entries = {}
+        try:
+            index = LibraryIndex(self.index_path)
+            entries = index.load_entries()
+        except Exception as e:
+            self.logger.exception("Error opening library index, rescanning all songs")
+
+        batch = []
+        loaded = 0
+        song_folders = []
+        changed = []
+        with os.scandir(self.songs_directory) as it:
+            for entry in it:
+                if not song_package.is_song_entry(entry):
+                    continue
+                song_dir = os.path.join(self.songs_directory, entry.name)
+                song_folders.append(song_dir)
+                try:
+                    info_mtime = song_package.info_mtime(song_dir)
+                except OSError:
+                    info_mtime = None
+                cached = entries.get(song_dir)
+                if cached and info_mtime is not None and LibraryIndex.is_fresh(song_dir, info_mtime, cached):
+                    batch.append(Song.from_dict(song_dir, cached[2]))
+                    loaded += 1
+                    self._publish(batch)
+                else:
+                    changed.append((song_dir, info_mtime))
+        self._publish(batch, force=True)
+
+        def store(song, info_mtime):
+            if index and info_mtime is not None:
+                index.store(song.song_dir, info_mtime,
+                            LibraryIndex.stem_mtimes(song.song_dir, song.audio_files), song.to_dict())
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            # Первый проход: только метаданные, чтобы песни сразу появились в списке
+            futures = [
+                (info_mtime, executor.submit(self._load_single_song, song_dir))
+                for song_dir, info_mtime in changed
+            ]
+            without_duration = []
+            for info_mtime, future in futures:
+                song = future.result()
+                if not song:
+                    continue
+                batch.append(song)
+                loaded += 1
+                self._publish(batch)
+                if song.needs_duration():
+                    without_duration.append((song, info_mtime))
+                else:
+                    store(song, info_mtime)
+            self._publish(batch, force=True)
+
+            # Второй проход: длительности по аудиодорожкам. Опубликованные песни
+            # уже принадлежат основному потоку, поэтому длительность получают
+            # их копии, которые отправляются как обновления
+            futures = [
+                (song, info_mtime, executor.submit(song.measure_duration))
+                for song, info_mtime in without_duration
+            ]
+            for song, info_mtime, future in futures:
+                try:
+                    song = song.with_duration(future.result())
+                except Exception as e:
+                    self.logger.exception(f"Error reading duration of '{song.song_dir}'")
+                    continue
+                store(song, info_mtime)
+                batch.append(song)
+                self._publish(batch, updated=True)
+            self._publish(batch, force=True, updated=True)
+
+        if index:
+            try:
+                index.remove_missing(song_folders)
+            except Exception as e:
+                self.logger.exception("Error updating library index")
+            index.close()
+
+        self.logger.info(
+            f"Loaded {loaded} songs ({len(changed)} rescanned) "
+            f"in {time.perf_counter() - started:.3f} s"
+        )
+
     def _load_single_song(self, song_dir):
-        """Загрузка одной песни"""
+        """Загрузка одной песни (без вычисления длительности)"""
         try:
-            return Song(song_dir)
+            return Song(song_dir, load_duration=False)
         except Exception as e:
             self.logger.exception(f"Error loading song from '{song_dir}'")
             return None
 
+    def apply_changes(self, max_songs=MAX_SONGS_PER_FRAME):
+        """
+        Применяет к списку песен пачки загрузчика и изменения, найденные наблюдателем.
+        Вызывается из основного потока; пачки забираются, пока в них набралось
+        меньше max_songs добавленных, изменённых и удалённых песен, остальные
+        ждут следующего кадра.
+
+        :return: LibraryChanges с песнями (removed - удалённые экземпляры Song,
+                 updated - пары (старая песня, новая песня)) или None.
+        """
+        added, removed, updated = [], [], []
+        positions = []  # позиции обновлённых песен в self.songs
+        ids_changed = False
+        songs = self.songs
+        while len(added) + len(removed) + len(updated) < max_songs:
+            try:
+                changes = self.changes.get_nowait()
+            except queue.Empty:
+                break
+            for song in changes.added + changes.updated:
+                old_song = self.songs_by_dir.get(song.song_dir)
+                self.songs_by_dir[song.song_dir] = song
+                if old_song is None:
+                    self.positions[song.song_dir] = len(songs)
+                    songs.append(song)
+                    # Одинаковые папки дают одинаковый идентификатор - остаётся первая
+                    self.songs_by_id.setdefault(song.id, song)
+                    added.append(song)
+                else:
+                    position = self.positions[song.song_dir]
+                    songs[position] = song
+                    if song.id != old_song.id:
+                        ids_changed = True
+                    elif self.songs_by_id.get(song.id) is old_song:
+                        self.songs_by_id[song.id] = song
+                    updated.append((old_song, song))
+                    positions.append(position)
+            for song_dir in changes.removed:
+                old_song = self.songs_by_dir.pop(song_dir, None)
+                if old_song is not None:
+                    # Место освобождается, список сжимается один раз после всех пачек
+                    songs[self.positions.pop(song_dir)] = None
+                    removed.append(old_song)
+
+        if not (added or removed or updated):
+            return None
+        if removed:
+            songs[:] = [song for song in songs if song is not None]
+            self.positions = {song.song_dir: position for position, song in enumerate(songs)}
+        if removed or ids_changed:
+            self.songs_by_id = {}
+            for song in songs:
+                self.songs_by_id.setdefault(song.id, song)
+        song_text = SearchIndex.song_text
+        if removed or any(song_text(old_song) != song_text(song) for old_song, song in updated):
+            self.search_index.rebuild(self.songs)
+            self.song_table.rebuild(self.songs)
+        else:
+            # Позиции не сдвигаются и текст песен прежний: строки обновляются на месте
+            self.search_index.add_songs(added)
+            self.song_table.add_songs(added)
+            for position in positions:
+                self.search_index.replace_song(position, self.songs[position])
+                self.song_table.update_song(position, self.songs[position])
+        return LibraryChanges(added, removed, updated)
+
+    def stop(self):
+        """Останавливает наблюдение за папкой песен."""
+        if self.watcher:
+            self.watcher.stop()
+
     def get_all_songs(self):
-        """Returns a list of all loaded songs."""
-        if not self.loading_complete.is_set():
-            self.logger.info("Waiting for songs to load...")
-            self.loading_complete.wait(timeout=5)  # Ждем максимум 5 секунд
+        """Returns the songs loaded so far; the rest arrive through apply_changes."""
         return self.songs
 
+    def search(self, text):
+        """Returns the loaded songs matching a search query (all songs for an empty query)."""
+        return self.search_index.search(text)
+
+    def query(self, text='', sort_by=None, descending=False, **facets):
+        """
+        Returns positions in self.songs for a search query, facet filters and sort keys.
+        See SongTable.query for the parameters.
+        """
+        positions = self.search_index.search_positions(text)
+        return self.song_table.query(positions, sort_by, descending, **facets)
+
     def get_song_by_id(self, song_id):
         """
         Returns a song by its ID.
         """
-        for song in self.songs:
-            if song.id == song_id:
-                return song
-        return None
+        return self.songs_by_id.get(song_id)
@@ -0,0 +1,354 @@
+# game/utils/song_package.py
+
+import io
+import os
+import json
+import mmap
+import struct
+import shutil
+import hashlib
+import threading
+
+PACKAGE_EXTENSION = '.koe'
+MAGIC = b'KOEP'
+VERSION = 1
+ALIGNMENT = 16
+READ_AHEAD = 65536  # Заголовок и оглавление обычно читаются одним чтением
+CACHE_DIR = 'package_cache'  # Кэши песен из пакетов, которые нельзя записать в сам пакет
+
+_HEADER = struct.Struct('<4sHI')  # magic, версия, длина JSON-оглавления
+
+
+def _align(value):
+    return (value + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class SliceReader(io.RawIOBase):
+    """Файловый объект только для чтения поверх среза памяти (без копирования данных)."""
+
+    def __init__(self, view, name=''):
+        super().__init__()
+        self.view = view
+        self.name = name
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = max(0, min(len(buffer), len(self.view) - self.position))
+        buffer[:count] = self.view[self.position:self.position + count]
+        self.position += count
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += len(self.view)
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self.position = offset
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        if not self.closed:
+            self.view.release()  # Иначе срез не даёт закрыть mmap пакета
+        super().close()
+
+
+class SongPackage:
+    """
+    Песня в одном несжатом файле .koe.
+
+    Формат: заголовок (magic, версия, длина оглавления), JSON-оглавление
+    и выровненные данные файлов. Оглавление хранит для каждого файла смещение
+    от начала данных, размер и время изменения, а также текст info.json,
+    поэтому для списка песен хватает одного чтения начала файла. Данные
+    файлов отдаются срезами memoryview одного mmap, который открывается при
+    первом обращении (из любого потока) и закрывается close().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        self.mapping = None
+        self.buffer = None
+        self.lock = threading.Lock()
+        with open(path, 'rb') as f:
+            head = f.read(READ_AHEAD)
+            magic, version, index_length = _HEADER.unpack_from(head, 0)
+            if magic != MAGIC:
+                raise ValueError(f"Not a song package: {path}")
+            if version != VERSION:
+                raise ValueError(f"Unsupported song package version: {version}")
+            index_end = _HEADER.size + index_length
+            if len(head) < index_end:
+                head += f.read(index_end - len(head))
+        index = json.loads(head[_HEADER.size:index_end].decode('utf-8'))
+        self.data_start = _align(index_end)
+        self.files = index['files']  # имя -> [смещение, размер, время изменения]
+        self.info_bytes = index['info'].encode('utf-8')
+
+    def names(self):
+        return list(self.files)
+
+    def has(self, name):
+        return name in self.files
+
+    def view(self, name):
+        """Срез данных файла без копирования."""
+        if name not in self.files:
+            raise FileNotFoundError(f"'{name}' not found in {self.path}")
+        with self.lock:
+            if self.buffer is None:
+                with open(self.path, 'rb') as f:
+                    self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.buffer = memoryview(self.mapping)
+            buffer = self.buffer
+        offset, size, _ = self.files[name]
+        start = self.data_start + offset
+        return buffer[start:start + size]
+
+    def read(self, name):
+        if name == 'info.json':
+            return self.info_bytes
+        return bytes(self.view(name))
+
+    def open(self, name):
+        return SliceReader(self.view(name), name)
+
+    def close(self):
+        """
+        Закрывает mmap пакета, чтобы файл можно было заменить или удалить.
+        Если срезы ещё используются, mmap закроется сборщиком мусора вместе с ними.
+
+        :return: True, если mmap закрыт (или не открывался).
+        """
+        with self.lock:
+            if self.buffer is None:
+                return True
+            try:
+                self.buffer.release()
+                self.mapping.close()
+            except BufferError:
+                return False
+            finally:
+                self.buffer = None
+                self.mapping = None
+            return True
+
+
+def pack_song(song_dir, output_path):
+    """
+    Упаковывает папку песни в файл .koe (через временный файл).
+
+    :return: Количество упакованных файлов.
+    """
+    entries = []
+    for root, _, filenames in os.walk(song_dir):
+        for filename in sorted(filenames):
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, song_dir).replace(os.sep, '/')
+            entries.append((name, path, os.path.getsize(path), os.path.getmtime(path)))
+    entries.sort()
+
+    info_path = os.path.join(song_dir, 'info.json')
+    with open(info_path, 'r', encoding='utf-8-sig') as f:
+        info_text = f.read()
+
+    files = {}
+    offset = 0
+    for name, _, size, mtime in entries:
+        files[name] = [offset, size, mtime]
+        offset = _align(offset + size)
+    index = json.dumps({'info': info_text, 'files': files}, ensure_ascii=False).encode('utf-8')
+    data_start = _align(_HEADER.size + len(index))
+
+    temp_path = output_path + '.tmp'
+    with open(temp_path, 'wb') as out:
+        out.write(_HEADER.pack(MAGIC, VERSION, len(index)))
+        out.write(index)
+        for name, path, _, _ in entries:
+            out.write(b'\0' * (data_start + files[name][0] - out.tell()))
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, out, 1024 * 1024)
+    os.replace(temp_path, output_path)
+    return len(entries)
+
+
+def unpack_song(package_path, output_dir):
+    """
+    Распаковывает файл .koe в папку песни с исходными временами изменения.
+
+    :return: Количество распакованных файлов.
+    """
+    package = SongPackage(package_path)
+    try:
+        for name, (_, _, mtime) in package.files.items():
+            path = os.path.join(output_dir, *name.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(package.view(name))
+            os.utime(path, (mtime, mtime))
+    finally:
+        package.close()
+    return len(package.files)
+
+
+# Открытые пакеты: путь -> SongPackage (используются и из потоков загрузчиков)
+_packages = {}
+_packages_lock = threading.Lock()
+
+
+def is_package(path):
+    return path.lower().endswith(PACKAGE_EXTENSION) and os.path.isfile(path)
+
+
+def get_package(path):
+    """Возвращает открытый пакет; при изменении файла пакет открывается заново."""
+    mtime = os.path.getmtime(path)
+    with _packages_lock:
+        package = _packages.get(path)
+        if package is not None and package.mtime == mtime:
+            return package
+        if package is not None:
+            package.close()
+        package = _packages[path] = SongPackage(path)
+        return package
+
+
+def close_packages():
+    """Закрывает все открытые пакеты."""
+    with _packages_lock:
+        for package in _packages.values():
+            package.close()
+        _packages.clear()
+
+
+def split_path(path):
+    """
+    Разделяет путь к файлу внутри пакета.
+
+    :return: (путь к пакету, имя файла в пакете) или None для обычного пути.
+    """
+    lowered = path.lower()
+    for separator in {os.sep, '/'}:
+        position = lowered.find(PACKAGE_EXTENSION + separator)
+        if position >= 0:
+            package_path = path[:position + len(PACKAGE_EXTENSION)]
+            if package_path in _packages or os.path.isfile(package_path):
+                return package_path, path[position + len(PACKAGE_EXTENSION) + 1:].replace(os.sep, '/')
+    return None
+
+
+# Функции ниже повторяют os.path и open, но понимают пути внутри пакетов
+
+def isfile(path):
+    parts = split_path(path)
+    if parts is None:
+        return os.path.isfile(path)
+    try:
+        return get_package(parts[0]).has(parts[1])
+    except (OSError, ValueError):
+        return False
+
+
+def exists(path):
+    if split_path(path) is None:
+        return os.path.exists(path)
+    return isfile(path)
+
+
+def getsize(path):
+    parts = split_path(path)
+    if parts is None:
+        return os.path.getsize(path)
+    package = get_package(parts[0])
+    if not package.has(parts[1]):
+        raise FileNotFoundError(path)
+    return package.files[parts[1]][1]
+
+
+def getmtime(path):
+    parts = split_path(path)
+    if parts is None:
+        return os.path.getmtime(path)
+    package = get_package(parts[0])
+    if not package.has(parts[1]):
+        raise FileNotFoundError(path)
+    return package.files[parts[1]][2]
+
+
+def read_bytes(path):
+    parts = split_path(path)
+    if parts is None:
+        with open(path, 'rb') as f:
+            return f.read()
+    return get_package(parts[0]).read(parts[1])
+
+
+def open_binary(path):
+    """Открывает файл для чтения; файлы из пакета отдаются без копирования."""
+    parts = split_path(path)
+    if parts is None:
+        return open(path, 'rb')
+    return get_package(parts[0]).open(parts[1])
+
+
+def open_text(path, encoding='utf-8'):
+    return io.TextIOWrapper(io.BufferedReader(open_binary(path)), encoding=encoding)
+
+
+def map_file(path):
+    """
+    Буфер с содержимым файла только для чтения: срез mmap пакета
+    или mmap обычного файла.
+    """
+    parts = split_path(path)
+    if parts is not None:
+        return get_package(parts[0]).view(parts[1])
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def is_packaged(path):
+    """Путь указывает внутрь пакета (такие файлы только для чтения)."""
+    return split_path(path) is not None
+
+
+def writable_path(path, key):
+    """
+    Путь для сохранения кэш-файла песни вместо path: сам path для папки песни,
+    а для файла внутри пакета (пакеты только для чтения) - файл в CACHE_DIR,
+    в отдельной папке для каждого ключа песни.
+
+    :param key: Постоянный ключ песни (Song.id).
+    """
+    if not is_packaged(path):
+        return path
+    folder = hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+    return os.path.join(CACHE_DIR, folder, os.path.basename(path))
+
+
+def info_mtime(song_dir):
+    """
+    Время изменения описания песни: info.json папки или самого файла пакета
+    (пакет перезаписывается целиком, поэтому его время покрывает все файлы).
+    """
+    if song_dir.lower().endswith(PACKAGE_EXTENSION):
+        return os.path.getmtime(song_dir)
+    return os.path.getmtime(os.path.join(song_dir, 'info.json'))
+
+
+def is_song_entry(entry):
+    """Элемент os.scandir папки песен, который может быть песней: папка или файл .koe."""
+    if entry.is_dir():
+        return True
+    return entry.name.lower().endswith(PACKAGE_EXTENSION) and entry.is_file()
@@ -0,0 +1,214 @@
+# game/utils/song_table.py
+
+import re
+import numpy as np
+
+# Порядок известных сложностей; остальные получают коды после них в порядке появления
+DIFFICULTY_ORDER = ('easy', 'normal', 'medium', 'hard', 'expert')
+
+_YEAR_PATTERN = re.compile(r'\d{4}')
+
+
+def _parse_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _parse_year(value):
+    match = _YEAR_PATTERN.search(str(value or ''))
+    return int(match.group()) if match else 0
+
+
+class SongTable:
+    """
+    Колоночное представление библиотеки для фильтров и сортировки.
+
+    Поля песен хранятся в массивах numpy в порядке SongManager.songs (той же
+    нумерации, что и в SearchIndex). Перестановки сортировки по каждой колонке
+    вычисляются один раз и кэшируются; фильтры складываются как булевы маски,
+    а результат - массив позиций песен, который получает карусель.
+    Неизвестная длительность хранится как NaN: такие песни не проходят фильтр
+    по длительности и идут последними при сортировке по ней, пока
+    длительность не придёт через update_song.
+    """
+
+    # Ключ сортировки -> колонка
+    SORT_COLUMNS = {
+        'Name': 'name',
+        'Artist': 'artist',
+        'Duration': 'duration',
+        'BPM': 'bpm',
+        'Year': 'year',
+        'Difficulty': 'difficulty',
+        'Genre': 'genre',
+        'Plays': 'play_count',
+        'Score': 'best_score',
+    }
+
+    def __init__(self, songs=(), stats=None):
+        self.songs = []
+        self.stats = stats or {}
+        self.difficulty_codes = {name: code for code, name in enumerate(DIFFICULTY_ORDER)}
+        self.genre_codes = {}
+        self.rows = {name: [] for name in ('duration', 'bpm', 'year', 'difficulty', 'genre')}
+        self.columns = None
+        self.orders = {}
+        self.add_songs(songs)
+
+    def add_songs(self, songs):
+        """Добавляет песни в конец таблицы; колонки пересобираются при следующем запросе."""
+        rows = self.rows
+        for song in songs:
+            self.songs.append(song)
+            for name, value in self.row_values(song).items():
+                rows[name].append(value)
+        self.columns = None
+        self.orders.clear()
+
+    def update_song(self, position, song):
+        """Заменяет песню на позиции (например, когда стала известна её длительность)."""
+        self.songs[position] = song
+        for name, value in self.row_values(song).items():
+            self.rows[name][position] = value
+        self.columns = None
+        self.orders.clear()
+
+    def row_values(self, song):
+        """Значения колонок для одной песни."""
+        difficulty = str(song.difficulty or '').casefold()
+        genre = str(song.genre or '').casefold()
+        return {
+            'duration': _parse_float(song.get_duration(None)),  # Без чтения аудио; None -> NaN
+            'bpm': _parse_float(song.bpm),
+            'year': _parse_year(song.year),
+            'difficulty': self.difficulty_codes.setdefault(difficulty, len(self.difficulty_codes)),
+            'genre': self.genre_codes.setdefault(genre, len(self.genre_codes)),
+        }
+
+    def rebuild(self, songs):
+        """Строит таблицу заново (после удаления или изменения песен)."""
+        self.songs = []
+        self.rows = {name: [] for name in self.rows}
+        self.add_songs(songs)
+
+    def set_stats(self, stats):
+        """
+        :param stats: Словарь song_id -> (число игр, лучший счёт), см. ScoreManager.get_song_stats.
+        """
+        self.stats = stats
+        self.columns = None
+        self.orders.clear()
+
+    def get_columns(self):
+        if self.columns is None:
+            columns = {
+                'duration': np.array(self.rows['duration'], dtype=np.float64),
+                'bpm': np.array(self.rows['bpm'], dtype=np.float32),
+                'year': np.array(self.rows['year'], dtype=np.int32),
+                'difficulty': np.array(self.rows['difficulty'], dtype=np.int16),
+                'genre': np.array(self.rows['genre'], dtype=np.int32),
+            }
+            stats = [self.stats.get(song.id, (0, 0)) for song in self.songs]
+            columns['play_count'] = np.array([plays for plays, _ in stats], dtype=np.int32)
+            columns['best_score'] = np.array([best for _, best in stats], dtype=np.float64)
+            self.columns = columns
+        return self.columns
+
+    def text_rank(self, field):
+        """Ранг песен по строковому полю без учёта регистра (для сортировки по имени и исполнителю)."""
+        keys = np.array([str(getattr(song, field, '') or '').casefold() for song in self.songs], dtype=str)
+        # Одинаковые строки получают одинаковый ранг, чтобы работала досортировка по следующему ключу
+        return np.unique(keys, return_inverse=True)[1].astype(np.int32)
+
+    def column(self, name):
+        columns = self.get_columns()
+        if name not in columns:
+            columns[name] = self.text_rank(name)
+        return columns[name]
+
+    def order(self, key):
+        """Кэшированная перестановка позиций по возрастанию одной колонки."""
+        column_name = self.SORT_COLUMNS[key]
+        order = self.orders.get(column_name)
+        if order is None:
+            order = np.argsort(self.column(column_name), kind='stable').astype(np.int32)
+            self.orders[column_name] = order
+        return order
+
+    def sort(self, keys, descending=False):
+        """
+        Перестановка по нескольким ключам: первый ключ главный, следующие разрешают равенство.
+
+        :param keys: Ключ из SORT_COLUMNS или последовательность ключей.
+        :param descending: Главный ключ по убыванию; равные значения по-прежнему
+                           упорядочены следующими ключами по возрастанию.
+        """
+        if isinstance(keys, str):
+            keys = (keys,)
+        keys = [key for key in keys if key in self.SORT_COLUMNS]
+        if not keys:
+            return np.arange(len(self.songs), dtype=np.int32)
+        if len(keys) == 1 and not descending:
+            return self.order(keys[0])
+        # Младший ключ берём из кэша, старшие досортировываем устойчиво
+        tie_keys = keys[1:]
+        order = self.order(tie_keys[-1]) if tie_keys else np.arange(len(self.songs), dtype=np.int32)
+        for key in reversed(tie_keys[:-1]):
+            order = order[np.argsort(self.column(self.SORT_COLUMNS[key])[order], kind='stable')]
+        values = self.column(self.SORT_COLUMNS[keys[0]])[order]
+        # Отрицание сохраняет устойчивость (в отличие от разворота), а NaN остаются последними
+        return order[np.argsort(-values if descending else values, kind='stable')]
+
+    def mask(self, difficulty=None, genre=None, bpm=None, duration=None, year=None):
+        """
+        Булева маска песен, проходящих все фильтры.
+
+        :param difficulty: Название сложности.
+        :param genre: Название жанра.
+        :param bpm: Диапазон (от, до); любая граница может быть None.
+        :param duration: Диапазон длительности в секундах.
+        :param year: Диапазон годов.
+        """
+        columns = self.get_columns()
+        mask = np.ones(len(self.songs), dtype=bool)
+        if difficulty is not None:
+            mask &= columns['difficulty'] == self.difficulty_codes.get(str(difficulty).casefold(), -1)
+        if genre is not None:
+            mask &= columns['genre'] == self.genre_codes.get(str(genre).casefold(), -1)
+        for name, value_range in (('bpm', bpm), ('duration', duration), ('year', year)):
+            if value_range is None:
+                continue
+            low, high = value_range
+            if low is not None:
+                mask &= columns[name] >= low
+            if high is not None:
+                mask &= columns[name] < high
+        return mask
+
+    def query(self, positions=None, sort_by=None, descending=False, **facets):
+        """
+        Позиции песен для карусели: результат поиска, отфильтрованный и отсортированный.
+
+        :param positions: Позиции, найденные поиском, или None (все песни).
+        :param sort_by: Ключ или ключи сортировки; None - порядок библиотеки.
+        :param facets: Фильтры, см. mask.
+        """
+        keep = self.mask(**facets)
+        if positions is not None:
+            found = np.zeros(len(self.songs), dtype=bool)
+            found[positions] = True
+            keep &= found
+        order = self.sort(sort_by, descending) if sort_by else np.arange(len(self.songs), dtype=np.int32)
+        return order[keep[order]]
+
+    def difficulties(self):
+        """Сложности, которые есть в библиотеке, в порядке их кодов."""
+        present = set(self.rows['difficulty'])
+        return [name for name, code in sorted(self.difficulty_codes.items(), key=lambda item: item[1])
+                if code in present and name]
+
+    def genres(self):
+        """Жанры, которые есть в библиотеке, по алфавиту."""
+        return sorted(name for name in self.genre_codes if name)
@@ -0,0 +1,116 @@
+# game/utils/thumbnail_cache.py
+
+import os
+import queue
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from models.song import DEFAULT_COVER
+from utils import song_package
+
+
+class ThumbnailCache:
+    """
+    Дисковый кэш обложек для карусели песен.
+
+    Обложка один раз обрезается под пропорции элемента карусели, уменьшается
+    до его размера и сохраняется в cache_dir. Имя файла строится из
+    идентификатора песни и размера миниатюры, а время изменения обложки
+    записывается временем изменения миниатюры: изменённая обложка
+    перезаписывает свою миниатюру, и проверка свежести - один stat.
+    Миниатюры создаются в пуле потоков; JPEG декодируется сразу в уменьшенном
+    масштабе (draft mode PIL), так что полноразмерная обложка не распаковывается.
+    Готовые пути складываются в очередь и забираются основным потоком.
+    """
+
+    CACHE_DIR = 'thumbnails'
+    QUALITY = 90
+
+    def __init__(self, cache_dir=CACHE_DIR, workers=2):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.cache_dir = cache_dir
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnail')
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.completed = queue.Queue()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def thumbnail_path(self, song, width, height):
+        """
+        Путь к миниатюре обложки песни заданного размера.
+
+        :return: Путь (файл может ещё не существовать).
+        """
+        # Обложка по умолчанию общая для всех песен, её миниатюра тоже одна
+        identity = 'default' if song.cover_image == DEFAULT_COVER else song.id
+        name = hashlib.blake2b(identity.encode('utf-8'), digest_size=12).hexdigest()
+        return os.path.join(self.cache_dir, f'{name}-{width}x{height}.jpg')
+
+    def get(self, song, width, height):
+        """
+        Возвращает путь к готовой миниатюре. Если её ещё нет, ставит создание
+        в очередь и возвращает None; путь появится в completed.
+        """
+        path = self.thumbnail_path(song, width, height)
+        try:
+            source_mtime = song_package.getmtime(song.cover_image)
+        except OSError:
+            return None
+        try:
+            if os.path.getmtime(path) == source_mtime:
+                return path
+        except OSError:
+            pass  # Миниатюры ещё нет
+        with self.lock:
+            if path in self.pending:
+                return None
+            self.pending.add(path)
+        self.executor.submit(self._build, song.cover_image, source_mtime, path, width, height)
+        return None
+
+    def _build(self, source, source_mtime, path, width, height):
+        try:
+            self.make_thumbnail(source, path, width, height)
+            os.utime(path, (source_mtime, source_mtime))
+            self.completed.put(path)
+        except Exception as e:
+            self.logger.exception(f"Ошибка при создании миниатюры для {source}")
+        finally:
+            with self.lock:
+                self.pending.discard(path)
+
+    @classmethod
+    def make_thumbnail(cls, source, path, width, height):
+        """Обрезает обложку по пропорциям width x height, уменьшает и сохраняет в path."""
+        with song_package.open_binary(source) as f, Image.open(f) as image:
+            # Для JPEG декодер сразу уменьшает изображение в 2-8 раз, не ниже нужного размера
+            image.draft('RGB', (width, height))
+            image = image.convert('RGB')
+            target_ratio = width / height
+            if image.width / image.height > target_ratio:
+                crop_width = int(image.height * target_ratio)
+                left = (image.width - crop_width) // 2
+                box = (left, 0, left + crop_width, image.height)
+            else:
+                crop_height = int(image.width / target_ratio)
+                top = (image.height - crop_height) // 2
+                box = (0, top, image.width, top + crop_height)
+            thumbnail = image.resize((width, height), Image.LANCZOS, box=box)
+
+        temp_path = path + '.tmp'
+        thumbnail.save(temp_path, 'JPEG', quality=cls.QUALITY)
+        os.replace(temp_path, path)
+
+    def get_completed(self):
+        """:return: Пути миниатюр, созданных с прошлого вызова."""
+        paths = []
+        while True:
+            try:
+                paths.append(self.completed.get_nowait())
+            except queue.Empty:
+                return paths
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
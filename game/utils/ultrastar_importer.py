@@ -0,0 +1,380 @@
+# game/utils/ultrastar_importer.py
+
+import os
+import json
+import time
+import shutil
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from models.note_chart import NoteChart
+
+MANIFEST_FILE = 'ultrastar_import.json'
+SUBTITLE_FILE = 'lyrics.srt'
+TEXT_ENCODINGS = ('utf-8-sig', 'cp1251', 'cp1252')
+FORBIDDEN_CHARS = '<>:"/\\|?*'
+
+# Типы нот UltraStar: обычная, золотая, фристайл, рэп, золотой рэп
+NOTE_TYPES = {':': 'normal', '*': 'golden', 'F': 'freestyle', 'R': 'rap', 'G': 'rap_golden'}
+PITCHED_TYPES = ('normal', 'golden')
+MIDI_C4 = 60  # Высота 0 в UltraStar соответствует C4
+
+
+class UltraStarNote:
+    """Слог UltraStar: время в секундах, MIDI-высота, текст и тип."""
+
+    def __init__(self, start_time, duration, pitch, text, kind):
+        self.start_time = start_time
+        self.duration = duration
+        self.pitch = pitch
+        self.text = text
+        self.kind = kind
+
+    @property
+    def end_time(self):
+        return self.start_time + self.duration
+
+
+class UltraStarSong:
+    """Результат разбора файла UltraStar: заголовки и строки из слогов."""
+
+    def __init__(self, headers, lines):
+        self.headers = headers
+        self.lines = lines  # Список строк, каждая - список UltraStarNote
+
+    @property
+    def notes(self):
+        return [note for line in self.lines for note in line]
+
+
+def read_text(path):
+    """Читает текстовый файл, подбирая кодировку: UTF-8, затем Windows-1251 и Windows-1252."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    for encoding in TEXT_ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('latin-1')
+
+
+def parse_number(value, default=0.0):
+    """Числа в UltraStar могут быть записаны с запятой: '300,5'."""
+    try:
+        return float(value.strip().replace(',', '.'))
+    except (AttributeError, ValueError):
+        return default
+
+
+def parse_ultrastar(path):
+    """
+    Разбирает файл UltraStar .txt.
+    Для дуэтов берётся только партия P1.
+
+    :param path: Путь к файлу.
+    :return: Экземпляр UltraStarSong.
+    """
+    headers = {}
+    lines = [[]]
+    bpm = None
+    gap = 0.0
+    relative = False
+    line_offset = 0  # Смещение долей в режиме #RELATIVE
+    player = None
+
+    for raw in read_text(path).splitlines():
+        if not raw:
+            continue
+        tag = raw[0]
+        if tag == '#':
+            key, _, value = raw[1:].partition(':')
+            key = key.strip().upper()
+            headers[key] = value.strip()
+            if key == 'BPM':
+                bpm = parse_number(value)
+            elif key == 'GAP':
+                gap = parse_number(value) / 1000.0
+            elif key == 'RELATIVE':
+                relative = value.strip().lower() == 'yes'
+            continue
+        if tag == 'E':
+            break
+        if tag == 'P':
+            player = raw[1:].strip()
+            continue
+        if player not in (None, '1'):
+            continue
+        if not bpm:
+            raise ValueError(f"#BPM is missing before notes in {path}")
+        # Длительность одной доли UltraStar - четверть от заданного BPM
+        beat = 60.0 / (bpm * 4)
+
+        if tag == '-':
+            parts = raw[1:].split()
+            if lines[-1]:
+                lines.append([])
+            if relative and parts:
+                line_offset += int(parts[-1])
+            continue
+        if tag in NOTE_TYPES:
+            parts = raw[2:].split(' ', 3) if len(raw) > 1 and raw[1] == ' ' else raw[1:].split(' ', 3)
+            if len(parts) < 3:
+                continue
+            start_beat = int(parts[0]) + line_offset
+            length = int(parts[1])
+            pitch = int(parts[2]) + MIDI_C4
+            text = parts[3] if len(parts) > 3 else ''
+            lines[-1].append(UltraStarNote(gap + start_beat * beat, length * beat, pitch, text, NOTE_TYPES[tag]))
+
+    return UltraStarSong(headers, [line for line in lines if line])
+
+
+def format_srt_time(seconds):
+    milliseconds = int(round(max(seconds, 0.0) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{milliseconds:03d}"
+
+
+def build_srt(song):
+    """
+    Собирает SRT с караоке-тегами {\\k}: каждая строка UltraStar - отдельный субтитр.
+    Длительность слога отсчитывается до начала следующего, чтобы паузы
+    между слогами не сдвигали подсветку.
+    """
+    entries = []
+    for number, line in enumerate(song.lines, start=1):
+        start = line[0].start_time
+        end = max(note.end_time for note in line)
+        text = ''
+        for i, note in enumerate(line):
+            next_time = line[i + 1].start_time if i + 1 < len(line) else note.end_time
+            # Сотые доли считаются от начала строки, чтобы округление не накапливалось
+            duration = int(round(next_time * 100)) - int(round(note.start_time * 100))
+            syllable = note.text.replace('~', '')
+            text += f"{{\\k{max(duration, 0)}}}{syllable}"
+        entries.append(f"{number}\n{format_srt_time(start)} --> {format_srt_time(end)}\n{text.strip()}\n")
+    return '\n'.join(entries)
+
+
+def sanitize_folder_name(name):
+    cleaned = ''.join('_' if c in FORBIDDEN_CHARS or ord(c) < 32 else c for c in name).strip(' .')
+    return cleaned or 'song'
+
+
+def place_media(source, destination):
+    """Кладёт медиафайл в папку песни: жёсткой ссылкой, если возможно, иначе копией."""
+    if os.path.isfile(destination) and os.path.getsize(destination) == os.path.getsize(source):
+        return
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def import_song(txt_path, song_dir):
+    """
+    Задача для пула процессов: импортирует одну песню UltraStar в папку song_dir.
+
+    :return: Словарь с названием песни и числом нот и строк.
+    """
+    song = parse_ultrastar(txt_path)
+    headers = song.headers
+    source_dir = os.path.dirname(txt_path)
+    os.makedirs(song_dir, exist_ok=True)
+
+    def media(key):
+        name = headers.get(key, '')
+        path = os.path.join(source_dir, name)
+        if name and os.path.isfile(path):
+            place_media(path, os.path.join(song_dir, os.path.basename(name)))
+            return os.path.basename(name)
+        return ''
+
+    audio = media('AUDIO') or media('MP3')
+    notes = [note for note in song.notes if note.kind in PITCHED_TYPES]
+    NoteChart(
+        [note.start_time for note in notes],
+        [note.duration for note in notes],
+        [note.pitch for note in notes]
+    ).save(os.path.join(song_dir, NoteChart.CACHE_FILE))
+
+    with open(os.path.join(song_dir, SUBTITLE_FILE), 'w', encoding='utf-8') as f:
+        f.write(build_srt(song))
+
+    info = {
+        'name': headers.get('TITLE', 'Unknown'),
+        'artist': headers.get('ARTIST', 'Unknown'),
+        'album': headers.get('EDITION', ''),
+        'year': headers.get('YEAR', ''),
+        'genre': headers.get('GENRE', ''),
+        'language': headers.get('LANGUAGE', ''),
+        'cover_image': media('COVER'),
+        'background': media('BACKGROUND'),
+        'audio_files': [audio] if audio else [],
+        'subtitle_file': SUBTITLE_FILE,
+        'video_file': media('VIDEO'),
+        'bpm': parse_number(headers.get('BPM')) or 'Unknown',
+        'gap': parse_number(headers.get('GAP')) / 1000.0,
+        'preview_start': parse_number(headers.get('PREVIEWSTART')),
+        'difficulty': 'Normal',
+        'source': 'ultrastar',
+        'source_file': os.path.abspath(txt_path),
+    }
+    with open(os.path.join(song_dir, 'info.json'), 'w', encoding='utf-8') as f:
+        json.dump(info, f, ensure_ascii=False, indent=4)
+
+    return {'name': f"{info['artist']} - {info['name']}", 'notes': len(notes), 'lines': len(song.lines)}
+
+
+def imported_from(song_dir):
+    """
+    :return: Путь к .txt, из которого импортирована папка песни, или None.
+    """
+    try:
+        with open(os.path.join(song_dir, 'info.json'), 'r', encoding='utf-8') as f:
+            return json.load(f).get('source_file')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class UltraStarImporter:
+    """
+    Массовый импорт библиотек UltraStar (.txt + аудио) в формат папок assets/songs.
+
+    Файлы разбираются в пуле процессов. Манифест в папке песен связывает
+    исходный .txt с папкой песни и хранит его размер и время изменения,
+    поэтому повторный запуск импортирует только новые и изменённые песни.
+    """
+
+    def __init__(self, source_directory, songs_directory='assets/songs', workers=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.source_directory = source_directory
+        self.songs_directory = songs_directory
+        self.workers = workers
+        self.manifest_path = os.path.join(songs_directory, MANIFEST_FILE)
+        self.manifest = self.load_manifest()
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception:
+            self.logger.exception(f"Ошибка при чтении манифеста {self.manifest_path}")
+            return {}
+
+    def save_manifest(self):
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=4)
+        os.replace(temp_path, self.manifest_path)
+
+    def scan(self):
+        """Находит все файлы UltraStar (.txt с заголовком #TITLE) в дереве каталогов."""
+        found = []
+        for root, _, files in os.walk(self.source_directory):
+            for name in files:
+                if not name.lower().endswith('.txt'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    with open(path, 'rb') as f:
+                        head = f.read(2048).upper()
+                except OSError:
+                    continue
+                if b'#TITLE' in head and b'#BPM' in head:
+                    found.append(path)
+        return sorted(found)
+
+    def collect_jobs(self, force=False):
+        """
+        :return: Список кортежей (ключ манифеста, путь к .txt, папка песни, подпись файла).
+        """
+        jobs = []
+        used = {entry['folder'] for entry in self.manifest.values()}
+        for path in self.scan():
+            key = os.path.relpath(path, self.source_directory).replace(os.sep, '/')
+            stat = os.stat(path)
+            signature = {'size': stat.st_size, 'mtime': stat.st_mtime}
+            entry = self.manifest.get(key)
+            if entry:
+                folder = entry['folder']
+                unchanged = all(entry.get(k) == v for k, v in signature.items())
+                if unchanged and not force and os.path.isfile(os.path.join(self.songs_directory, folder, 'info.json')):
+                    continue
+            else:
+                base = sanitize_folder_name(os.path.basename(os.path.dirname(path)) or os.path.splitext(os.path.basename(path))[0])
+                folder, counter = base, 2
+                source_file = os.path.abspath(path)
+                # Папка, импортированная из того же файла прерванным запуском (до сохранения
+                # манифеста), переиспользуется, а не дублируется как "имя (2)"
+                while folder in used or (
+                        os.path.exists(os.path.join(self.songs_directory, folder))
+                        and imported_from(os.path.join(self.songs_directory, folder)) != source_file):
+                    folder = f"{base} ({counter})"
+                    counter += 1
+                used.add(folder)
+            jobs.append((key, path, folder, signature))
+        return jobs
+
+    def run(self, force=False, progress=None):
+        """
+        Импортирует новые и изменённые песни.
+
+        :param force: Импортировать заново даже неизменённые песни.
+        :param progress: Необязательный callback(done, total, name, songs_per_second).
+        :return: Словарь со счётчиками imported, failed, total, а также elapsed и songs_per_second.
+        """
+        if not os.path.isdir(self.source_directory):
+            self.logger.error(f"Source directory '{self.source_directory}' not found.")
+            return {'imported': 0, 'failed': 0, 'total': 0, 'elapsed': 0.0, 'songs_per_second': 0.0}
+        os.makedirs(self.songs_directory, exist_ok=True)
+
+        started = time.perf_counter()
+        jobs = self.collect_jobs(force)
+        total = len(jobs)
+        self.logger.info(f"Песен для импорта: {total}")
+        imported = failed = 0
+
+        if jobs:
+            try:
+                with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                    futures = {
+                        executor.submit(import_song, path, os.path.join(self.songs_directory, folder)): (key, folder, signature)
+                        for key, path, folder, signature in jobs
+                    }
+                    for future in as_completed(futures):
+                        key, folder, signature = futures[future]
+                        name = folder
+                        try:
+                            result = future.result()
+                            name = result['name']
+                            self.manifest[key] = dict(signature, folder=folder)
+                            imported += 1
+                            # Манифест сохраняется пачками, чтобы не переписывать его после каждой песни;
+                            # папки, не попавшие в манифест из-за сбоя, узнаются по source_file в info.json
+                            if imported % 50 == 0:
+                                self.save_manifest()
+                        except Exception:
+                            self.logger.exception(f"Ошибка импорта '{key}'")
+                            failed += 1
+                        if progress:
+                            done = imported + failed
+                            progress(done, total, name, done / max(time.perf_counter() - started, 1e-9))
+            finally:
+                # В том числе при прерывании (Ctrl-C)
+                self.save_manifest()
+
+        elapsed = time.perf_counter() - started
+        return {
+            'imported': imported,
+            'failed': failed,
+            'total': total,
+            'elapsed': elapsed,
+            'songs_per_second': (imported + failed) / elapsed if elapsed > 0 else 0.0,
+        }
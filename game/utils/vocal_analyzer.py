@@ -0,0 +1,210 @@
+# game/utils/vocal_analyzer.py
+
+import os
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from models.note import Note
+from models.note_chart import NoteChart
+
+VOCAL_STEM_KEYWORDS = ('vocal', 'voice', 'vox')
+MANIFEST_FILE = 'vocal_analysis.json'
+
+SAMPLE_RATE = 22050
+HOP_LENGTH = 256
+FMIN_HZ = 65.0    # C2
+FMAX_HZ = 1047.0  # C6
+MIN_NOTE_DURATION = 0.08
+MAX_NOTE_GAP = 0.05
+
+
+def find_vocal_stem(song_dir, info):
+    """
+    Находит вокальную дорожку песни.
+    Явно заданный в info.json ключ 'vocal_stem' имеет приоритет,
+    иначе ищется аудиофайл, в имени которого есть 'vocal', 'voice' или 'vox'.
+
+    :return: Полный путь к файлу или None.
+    """
+    candidates = [info['vocal_stem']] if info.get('vocal_stem') else [
+        name for name in info.get('audio_files', [])
+        if any(keyword in os.path.basename(name).lower() for keyword in VOCAL_STEM_KEYWORDS)
+    ]
+    for name in candidates:
+        path = os.path.join(song_dir, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def stem_signature(path):
+    """Подпись файла для манифеста: имя, размер и время изменения."""
+    stat = os.stat(path)
+    return {'stem': os.path.basename(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def quantize_notes(times, midi, min_duration=MIN_NOTE_DURATION, max_gap=MAX_NOTE_GAP):
+    """
+    Превращает трек высоты тона в ноты.
+    Кадры округляются до полутона, подряд идущие кадры одной высоты
+    объединяются (короткие разрывы до max_gap склеиваются),
+    слишком короткие ноты отбрасываются.
+
+    :param times: Время кадров в секундах.
+    :param midi: MIDI-высота кадров (NaN для невокализованных).
+    :return: Список объектов Note.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    midi = np.asarray(midi, dtype=np.float64)
+    voiced = np.flatnonzero(np.isfinite(midi))
+    if len(voiced) == 0:
+        return []
+
+    frame = float(np.median(np.diff(times))) if len(times) > 1 else 0.0
+    rounded = np.round(midi[voiced])
+    # Новая нота начинается при смене полутона или при паузе длиннее max_gap
+    breaks = np.flatnonzero(
+        (np.diff(rounded) != 0) | (np.diff(times[voiced]) > frame + max_gap)
+    ) + 1
+    bounds = np.concatenate(([0], breaks, [len(voiced)]))
+
+    notes = []
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        start = float(times[voiced[first]])
+        duration = float(times[voiced[last - 1]]) - start + frame
+        if duration >= min_duration:
+            pitch = int(np.round(np.median(midi[voiced[first:last]])))
+            notes.append(Note(start, duration, pitch))
+    return notes
+
+
+def extract_notes(stem_path):
+    """Оценивает высоту тона вокальной дорожки через pyin и квантует её в ноты."""
+    import librosa
+
+    y, sr = librosa.load(stem_path, sr=SAMPLE_RATE, mono=True)
+    f0, voiced_flag, _ = librosa.pyin(
+        y, fmin=FMIN_HZ, fmax=FMAX_HZ, sr=sr, hop_length=HOP_LENGTH
+    )
+    times = librosa.times_like(f0, sr=sr, hop_length=HOP_LENGTH)
+    midi = np.where(voiced_flag, librosa.hz_to_midi(f0), np.nan)
+    return quantize_notes(times, midi)
+
+
+def analyze_song(song_dir, stem_path):
+    """
+    Задача для пула процессов: анализирует одну песню и сохраняет кэш нот.
+
+    :return: Кортеж (папка песни, число нот).
+    """
+    notes = extract_notes(stem_path)
+    NoteChart.from_notes(notes).save(os.path.join(song_dir, NoteChart.CACHE_FILE))
+    return song_dir, len(notes)
+
+
+class VocalAnalyzer:
+    """
+    Офлайн-извлечение эталонной высоты тона из вокальных дорожек библиотеки.
+    Результаты пишутся в тот же кэш нот, что читает игра. Манифест в папке песен
+    хранит подписи обработанных дорожек, поэтому повторный запуск пропускает
+    неизменённые песни и продолжает прерванный анализ.
+    """
+
+    def __init__(self, songs_directory='assets/songs', workers=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.songs_directory = songs_directory
+        self.workers = workers
+        self.manifest_path = os.path.join(songs_directory, MANIFEST_FILE)
+        self.manifest = self.load_manifest()
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception:
+            self.logger.exception(f"Ошибка при чтении манифеста {self.manifest_path}")
+            return {}
+
+    def save_manifest(self):
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=4)
+        os.replace(temp_path, self.manifest_path)
+
+    def collect_jobs(self, force=False):
+        """
+        Собирает песни для анализа.
+        Пропускаются песни с MIDI-файлом (он точнее анализа) и песни,
+        чья вокальная дорожка не изменилась с прошлого запуска.
+
+        :return: Список кортежей (ключ, папка песни, путь к дорожке, подпись).
+        """
+        jobs = []
+        if not os.path.isdir(self.songs_directory):
+            self.logger.error(f"Songs directory '{self.songs_directory}' not found.")
+            return jobs
+        for folder in sorted(os.listdir(self.songs_directory)):
+            song_dir = os.path.join(self.songs_directory, folder)
+            info_path = os.path.join(song_dir, 'info.json')
+            if not os.path.isfile(info_path):
+                continue
+            try:
+                with open(info_path, 'r', encoding='utf-8') as f:
+                    info = json.load(f)
+            except Exception:
+                self.logger.exception(f"Ошибка при чтении {info_path}")
+                continue
+
+            midi_file = info.get('midi_file')
+            if midi_file and os.path.isfile(os.path.join(song_dir, midi_file)):
+                continue
+            stem_path = find_vocal_stem(song_dir, info)
+            if stem_path is None:
+                continue
+
+            signature = stem_signature(stem_path)
+            cache_exists = os.path.isfile(os.path.join(song_dir, NoteChart.CACHE_FILE))
+            entry = self.manifest.get(folder, {})
+            if not force and cache_exists and all(entry.get(k) == v for k, v in signature.items()):
+                continue
+            jobs.append((folder, song_dir, stem_path, signature))
+        return jobs
+
+    def run(self, force=False, progress=None):
+        """
+        Анализирует все изменённые песни в пуле процессов.
+
+        :param force: Анализировать заново даже неизменённые песни.
+        :param progress: Необязательный callback(done, total, folder).
+        :return: Словарь со счётчиками analyzed, failed и total.
+        """
+        jobs = self.collect_jobs(force)
+        total = len(jobs)
+        self.logger.info(f"Песен для анализа: {total}")
+        analyzed = failed = 0
+        if not jobs:
+            return {'analyzed': 0, 'failed': 0, 'total': 0}
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(analyze_song, song_dir, stem_path): (folder, signature)
+                for folder, song_dir, stem_path, signature in jobs
+            }
+            for future in as_completed(futures):
+                folder, signature = futures[future]
+                try:
+                    _, note_count = future.result()
+                    self.manifest[folder] = dict(signature, notes=note_count)
+                    # Манифест пишется после каждой песни, чтобы прерванный запуск можно было продолжить
+                    self.save_manifest()
+                    analyzed += 1
+                except Exception:
+                    self.logger.exception(f"Ошибка анализа вокала песни '{folder}'")
+                    failed += 1
+                if progress:
+                    progress(analyzed + failed, total, folder)
+
+        return {'analyzed': analyzed, 'failed': failed, 'total': total}
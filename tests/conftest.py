@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# Модули игры импортируются от папки game, как при запуске main.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'game'))
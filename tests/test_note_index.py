@@ -0,0 +1,73 @@
+# tests/test_note_index.py
+
+import random
+import pytest
+from models.note_chart import NoteChart, NoteIndex
+
+
+def brute_force(starts, ends, t0, t1):
+    return [i for i in range(len(starts)) if starts[i] <= t1 and ends[i] >= t0]
+
+
+def random_notes(rng, count):
+    starts = sorted(rng.uniform(0, 100) for _ in range(count))
+    # Среди коротких нот попадаются длинные, перекрывающие соседей
+    ends = [start + (rng.uniform(5, 20) if rng.random() < 0.1 else rng.uniform(0.05, 1.0)) for start in starts]
+    return starts, ends
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_windows_match_brute_force(seed):
+    rng = random.Random(seed)
+    starts, ends = random_notes(rng, 300)
+    index = NoteIndex(starts, ends)
+    for _ in range(500):
+        t0 = rng.uniform(-5, 110)
+        t1 = t0 + rng.uniform(0, 10)
+        assert index.query(t0, t1) == brute_force(starts, ends, t0, t1)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_forward_playback_with_seeks_matches_brute_force(seed):
+    rng = random.Random(seed)
+    starts, ends = random_notes(rng, 300)
+    index = NoteIndex(starts, ends)
+    time = -1.0
+    while time < 105:
+        # Обычно время идёт вперёд по кадрам, иногда - перемотка в обе стороны или большой прыжок
+        roll = rng.random()
+        if roll < 0.02:
+            time = rng.uniform(-1, 100)
+        elif roll < 0.05:
+            time += rng.uniform(5, 30)
+        else:
+            time += 1 / 60
+        t0, t1 = time - 0.5, time + 3.0
+        assert index.query(t0, t1) == brute_force(starts, ends, t0, t1)
+
+
+def test_boundaries_are_inclusive():
+    index = NoteIndex([1.0, 2.0], [1.5, 3.0])
+    assert index.query(1.5, 1.5) == [0]
+    assert index.query(0.0, 1.0) == [0]
+    assert index.query(3.0, 4.0) == [1]
+    assert index.query(1.6, 1.9) == []
+
+
+def test_empty_index():
+    index = NoteIndex([], [])
+    assert len(index) == 0
+    assert index.query(0.0, 10.0) == []
+
+
+def test_reset_after_seek_back():
+    index = NoteIndex([0.0, 10.0, 20.0], [1.0, 11.0, 21.0])
+    assert index.query(19.5, 20.5) == [2]
+    index.reset()
+    assert index.query(0.5, 10.5) == [0, 1]
+
+
+def test_note_chart_sorts_notes_and_answers_windows():
+    chart = NoteChart([3.0, 1.0, 2.0], [0.5, 0.5, 0.5], [62, 60, 61])
+    assert list(chart.starts) == [1.0, 2.0, 3.0]
+    assert [note.pitch for note in chart.notes_between(1.9, 3.1)] == [61, 62]
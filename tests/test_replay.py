@@ -0,0 +1,75 @@
+# tests/test_replay.py
+
+import random
+import numpy as np
+from controllers.scoring_engine import ScoringEngine
+from models.note_chart import NoteChart
+from utils.replay import ReplayWriter, ReplayReader, ReplayPlayback, score_replay
+
+
+def make_chart():
+    starts = np.arange(0.0, 20.0, 0.5)
+    return NoteChart(starts, np.full(len(starts), 0.4), 60 + (np.arange(len(starts)) % 5))
+
+
+def record(path, chart, rng):
+    """Записывает игру пачками неравного размера, как при неровной частоте кадров."""
+    writer = ReplayWriter(str(path), {'song_dir': '', 'calibration_offset': 0.05}, chunk_frames=64)
+    engine = ScoringEngine(chart)
+    t = 0.0
+    while t < 21.0:
+        count = rng.randint(1, 12)
+        times = t + np.arange(count) * 0.01
+        pitches = (60 + (times * 2).astype(int) % 5 + rng.choice((0.0, 0.3, 3.0))).astype(np.float32)
+        confidences = np.full(count, 0.9, dtype=np.float32)
+        writer.write_frames(times, pitches, confidences)
+        engine.process(times - 0.05, pitches, confidences)
+        t += count * 0.01
+    stats = engine.finish()
+    writer.close(stats)
+    return stats
+
+
+def test_playback_repeats_recorded_batches(tmp_path):
+    rng = random.Random(0)
+    chart = make_chart()
+    path = tmp_path / 'game.koerep'
+    recorded = record(path, chart, rng)
+
+    # Часы песни при просмотре идут другими шагами, чем при записи
+    clock = [0.0]
+    playback = ReplayPlayback(ReplayReader(str(path)), clock=lambda: clock[0])
+    playback.start()
+    engine = ScoringEngine(chart)
+    while clock[0] < 15.0:
+        clock[0] += rng.uniform(0.005, 0.1)
+        for times, pitches, confidences in playback.read_batches():
+            engine.process(times - 0.05, pitches, confidences)
+    playback.stop()
+    for times, pitches, confidences in playback.read_batches():
+        engine.process(times - 0.05, pitches, confidences)
+
+    assert engine.finish() == recorded
+    assert score_replay(str(path), chart)[:2] == (recorded, recorded)
+
+
+def test_batches_are_released_by_their_last_frame(tmp_path):
+    path = tmp_path / 'game.koerep'
+    writer = ReplayWriter(str(path), {})
+    writer.write_frames([0.0, 0.1], [60, 60], [1, 1])
+    writer.write_frames([0.2], [61], [1])
+    writer.close()
+    playback = ReplayPlayback(ReplayReader(str(path)), clock=None)
+    assert playback.read_batches(until=0.05) == []
+    assert [list(times) for times, _, _ in playback.read_batches(until=0.15)] == [[0.0, 0.1]]
+    times, _, _ = playback.read_frames(until=1.0)
+    assert list(times) == [0.2]
+
+
+def test_empty_replay(tmp_path):
+    path = tmp_path / 'empty.koerep'
+    ReplayWriter(str(path), {}).close()
+    playback = ReplayPlayback(ReplayReader(str(path)), clock=lambda: 10.0)
+    playback.start()
+    assert playback.read_batches() == []
+    assert len(playback.read_frames()[0]) == 0
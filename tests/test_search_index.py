@@ -0,0 +1,102 @@
+# tests/test_search_index.py
+
+import random
+from types import SimpleNamespace
+from utils.search_index import SearchIndex, normalize, tokenize
+
+
+def make_song(name, artist='', album='', genre=''):
+    return SimpleNamespace(name=name, artist=artist, album=album, genre=genre)
+
+
+SONGS = [
+    make_song('Группа крови', 'Кино', 'Группа крови', 'Rock'),
+    make_song('Kino', 'Someone', genre='Pop'),
+    make_song('Bohemian Rhapsody', 'Queen', 'A Night at the Opera', 'Rock'),
+    make_song('Crème Brûlée', 'Café Noir'),
+    make_song('Don\'t Stop Me Now', 'Queen', 'Jazz', 'Rock'),
+    make_song('Звезда по имени Солнце', 'Кино', 'Звезда по имени Солнце', 'Rock'),
+]
+
+
+def brute_force(songs, query):
+    return [song for song in songs if SearchIndex.matches(song, query)]
+
+
+def test_normalize_transliterates_and_strips_diacritics():
+    assert normalize('Кино') == 'kino'
+    assert normalize('Crème Brûlée') == 'creme brulee'
+    assert tokenize("Don't-Stop_me") == ['don', 't', 'stop', 'me']
+
+
+def test_transliteration_works_both_ways():
+    index = SearchIndex(SONGS)
+    found = index.search('kino')
+    assert SONGS[0] in found and SONGS[1] in found and SONGS[5] in found
+    assert index.search('кино') == found
+
+
+def test_words_match_word_prefixes_only():
+    index = SearchIndex(SONGS)
+    assert index.search('que') == [SONGS[2], SONGS[4]]
+    assert index.search('ueen') == []
+    assert index.search('queen rock stop') == [SONGS[4]]
+    assert index.search('creme') == [SONGS[3]]
+
+
+def test_empty_query_returns_all_songs():
+    index = SearchIndex(SONGS)
+    assert index.search_positions('  ') is None
+    assert index.search('') == SONGS
+
+
+def test_incremental_typing_matches_fresh_search():
+    index = SearchIndex(SONGS)
+    query = ''
+    for char in 'zvezda po imeni solntse':
+        query += char
+        fresh = SearchIndex(SONGS).search(query)
+        assert index.search(query) == fresh == brute_force(SONGS, query)
+
+
+def test_incremental_refinement_narrows_previous_result():
+    index = SearchIndex(SONGS)
+    index.search('kino')
+    assert index.last_query == 'kino'
+    assert list(index.search_positions('kino gr')) == [0]
+    # Стёртый символ - не дописывание: поиск идёт по всему индексу
+    assert list(index.search_positions('kin')) == [0, 1, 5]
+
+
+def test_long_tokens_are_verified_past_max_gram():
+    songs = [make_song('Rhapsody'), make_song('Rhapsodic'), make_song('Rhythm')]
+    index = SearchIndex(songs)
+    assert index.search('rhapsody') == [songs[0]]
+    assert index.search('rhap') == songs[:2]
+
+
+def test_random_queries_match_brute_force():
+    rng = random.Random(0)
+    words = ['kino', 'queen', 'rock', 'night', 'star', 'zvezda', 'krov', 'cafe', 'pop', 'jazz']
+    songs = [
+        make_song(' '.join(rng.sample(words, 2)), rng.choice(words), genre=rng.choice(words))
+        for _ in range(200)
+    ]
+    index = SearchIndex(songs)
+    for _ in range(200):
+        word = rng.choice(words)
+        query = word[:rng.randint(1, len(word))]
+        if rng.random() < 0.5:
+            other = rng.choice(words)
+            query += ' ' + other[:rng.randint(1, len(other))]
+        assert index.search(query) == brute_force(songs, query)
+
+
+def test_add_songs_and_rebuild():
+    index = SearchIndex(SONGS[:2])
+    index.search('queen')
+    index.add_songs(SONGS[2:])
+    assert index.search('queen') == [SONGS[2], SONGS[4]]
+    index.rebuild(SONGS[2:3])
+    assert index.search('queen') == [SONGS[2]]
+    assert index.search('kino') == []
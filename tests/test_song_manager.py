@@ -0,0 +1,74 @@
+# tests/test_song_manager.py
+
+import os
+from utils.library_watcher import LibraryChanges
+from utils.song_manager import SongManager
+
+
+class FakeSong:
+    def __init__(self, song_dir, name, duration=None):
+        self.song_dir = song_dir
+        self.id = os.path.basename(song_dir)
+        self.name = name
+        self.artist = ''
+        self.album = ''
+        self.genre = ''
+        self.bpm = None
+        self.year = None
+        self.difficulty = ''
+        self.duration = duration
+
+    def get_duration(self, default=0):
+        return self.duration if self.duration is not None else default
+
+
+def make_manager(tmp_path):
+    manager = SongManager(str(tmp_path / 'missing'), str(tmp_path / 'index.db'), watch_interval=0)
+    manager.loading_complete.wait(5)
+    return manager
+
+
+def drain(manager, max_songs=SongManager.MAX_SONGS_PER_FRAME):
+    frames = []
+    while True:
+        changes = manager.apply_changes(max_songs)
+        if changes is None:
+            return frames
+        frames.append(changes)
+
+
+def test_updates_replace_songs_in_place(tmp_path):
+    manager = make_manager(tmp_path)
+    songs = [FakeSong(f'songs/{i}', f'Song {i}') for i in range(5)]
+    manager.changes.put(LibraryChanges(songs, [], []))
+    drain(manager)
+
+    updated = FakeSong('songs/3', 'Song 3', duration=180.0)
+    manager.changes.put(LibraryChanges([], [], [updated]))
+    changes, = drain(manager)
+    assert changes.updated == [(songs[3], updated)]
+    assert manager.songs[3] is updated
+    assert manager.get_song_by_id('3') is updated
+    assert manager.query('song 3', duration=(100, None)).tolist() == [3]
+
+
+def test_updates_and_removals_count_toward_frame_budget(tmp_path):
+    manager = make_manager(tmp_path)
+    songs = [FakeSong(f'songs/{i}', f'Song {i}') for i in range(256)]
+    for start in range(0, len(songs), 32):
+        manager.changes.put(LibraryChanges(songs[start:start + 32], [], []))
+    assert len(drain(manager, 64)) == 4
+
+    for start in range(0, len(songs), 32):
+        batch = [FakeSong(song.song_dir, song.name, 60.0) for song in songs[start:start + 32]]
+        manager.changes.put(LibraryChanges([], [], batch))
+    frames = drain(manager, 64)
+    assert [len(changes.updated) for changes in frames] == [64] * 4
+
+    manager.changes.put(LibraryChanges([], [f'songs/{i}' for i in range(100)], []))
+    manager.changes.put(LibraryChanges([], ['songs/200'], []))
+    frames = drain(manager, 64)
+    assert [len(changes.removed) for changes in frames] == [100, 1]
+    assert [song.song_dir for song in manager.songs] == [f'songs/{i}' for i in range(100, 256) if i != 200]
+    assert manager.positions == {song.song_dir: position for position, song in enumerate(manager.songs)}
+    assert manager.search('song 255') == [manager.songs[-1]]
@@ -0,0 +1,134 @@
+# tests/test_song_table.py
+
+import math
+import random
+import numpy as np
+from utils.song_table import SongTable
+
+
+class FakeSong:
+    def __init__(self, id, name, artist='', duration=None, bpm=None, year=None, difficulty='', genre=''):
+        self.id = id
+        self.name = name
+        self.artist = artist
+        self.duration = duration
+        self.bpm = bpm
+        self.year = year
+        self.difficulty = difficulty
+        self.genre = genre
+
+    def get_duration(self, default=0):
+        return self.duration if self.duration is not None else default
+
+
+def make_library():
+    return [
+        FakeSong('a', 'Beta', 'Queen', 200, 120, '1975', 'Hard', 'Rock'),
+        FakeSong('b', 'alpha', 'Kino', 150, 90, '1988', 'easy', 'rock'),
+        FakeSong('c', 'Gamma', 'Queen', None, 120, '1977', 'normal', 'Pop'),
+        FakeSong('d', 'Delta', 'Abba', 150, 140, None, 'Hard', ''),
+        FakeSong('e', 'Alpha', 'Abba', 300, None, 'released 1980', 'expert', 'Pop'),
+    ]
+
+
+def sort_key(song, key):
+    return {
+        'Name': song.name.casefold(),
+        'Artist': song.artist.casefold(),
+        'BPM': float(song.bpm) if song.bpm is not None else math.inf,
+        'Year': int(song.year[-4:]) if song.year else 0,
+    }[key]
+
+
+def test_single_key_sort_is_stable_and_case_insensitive():
+    table = SongTable(make_library())
+    # 'alpha' и 'Alpha' равны без учёта регистра и остаются в порядке библиотеки
+    assert list(table.sort('Name')) == [1, 4, 0, 3, 2]
+
+
+def test_multi_key_sort_matches_python_sort():
+    songs = make_library()
+    table = SongTable(songs)
+    for keys in (('Artist', 'Name'), ('BPM', 'Artist', 'Name'), ('Year', 'Name')):
+        expected = sorted(range(len(songs)), key=lambda i: tuple(sort_key(songs[i], key) for key in keys))
+        assert list(table.sort(keys)) == expected
+
+
+def test_descending_reverses_only_primary_key():
+    table = SongTable(make_library())
+    # Queen (0, 2) перед Kino (1) перед Abba (3, 4); внутри исполнителя - имя по возрастанию
+    assert list(table.sort(('Artist', 'Name'), descending=True)) == [0, 2, 1, 4, 3]
+
+
+def test_descending_keeps_library_order_for_ties():
+    table = SongTable(make_library())
+    # Равные BPM (0 и 2) не разворачиваются; неизвестный BPM (NaN) - последним
+    assert list(table.sort('BPM', descending=True)) == [3, 0, 2, 1, 4]
+
+
+def test_unknown_duration_sorts_last_both_ways():
+    table = SongTable(make_library())
+    assert list(table.sort('Duration')) == [1, 3, 0, 4, 2]
+    assert list(table.sort('Duration', descending=True)) == [4, 0, 1, 3, 2]
+
+
+def test_random_multi_key_sort_matches_python_sort():
+    rng = random.Random(0)
+    songs = [
+        FakeSong(str(i), rng.choice('ABCD'), rng.choice('xyz'), bpm=rng.choice((90, 120, 140)))
+        for i in range(100)
+    ]
+    table = SongTable(songs)
+    for descending in (False, True):
+        actual = list(table.sort(('BPM', 'Artist', 'Name'), descending=descending))
+        # Устойчивая сортировка по младшим ключам, затем по главному - эталон для "главный по убыванию"
+        expected = sorted(range(len(songs)), key=lambda i: (songs[i].artist, songs[i].name.casefold()))
+        expected.sort(key=lambda i: songs[i].bpm, reverse=descending)
+        assert actual == expected
+
+
+def test_facet_masks():
+    table = SongTable(make_library())
+    assert list(np.flatnonzero(table.mask(difficulty='hard'))) == [0, 3]
+    assert list(np.flatnonzero(table.mask(genre='ROCK'))) == [0, 1]
+    assert list(np.flatnonzero(table.mask(genre='unknown'))) == []
+    assert list(np.flatnonzero(table.mask(bpm=(100, 130)))) == [0, 2]
+    assert list(np.flatnonzero(table.mask(year=(1976, None)))) == [1, 2, 4]
+    assert list(np.flatnonzero(table.mask(difficulty='hard', bpm=(None, 130)))) == [0]
+
+
+def test_unknown_duration_is_excluded_from_duration_facet():
+    table = SongTable(make_library())
+    assert list(np.flatnonzero(table.mask(duration=(0, None)))) == [0, 1, 3, 4]
+    assert list(np.flatnonzero(table.mask(duration=(None, 180)))) == [1, 3]
+    assert table.mask().all()
+
+
+def test_update_song_fills_in_duration():
+    songs = make_library()
+    table = SongTable(songs)
+    table.sort('Duration')
+    songs[2].duration = 100
+    table.update_song(2, songs[2])
+    assert list(table.mask(duration=(0, 120))) == [False, False, True, False, False]
+    assert list(table.sort('Duration')) == [2, 1, 3, 0, 4]
+
+
+def test_query_combines_search_facets_and_sort():
+    table = SongTable(make_library())
+    positions = np.array([0, 2, 3, 4], dtype=np.intc)
+    assert list(table.query(positions, sort_by='Name', genre='pop')) == [4, 2]
+    assert list(table.query(None, sort_by='Name', descending=True, difficulty='hard')) == [3, 0]
+    assert list(table.query(positions)) == [0, 2, 3, 4]
+
+
+def test_stats_columns():
+    table = SongTable(make_library(), stats={'c': (5, 900), 'a': (1, 1000)})
+    assert list(table.sort('Plays', descending=True))[:2] == [2, 0]
+    assert list(table.sort('Score', descending=True))[:2] == [0, 2]
+
+
+def test_difficulties_and_genres():
+    table = SongTable(make_library())
+    assert table.difficulties() == ['easy', 'normal', 'hard', 'expert']
+    assert table.genres() == ['pop', 'rock']
@@ -0,0 +1,49 @@
+# tests/test_subtitle_controller.py
+
+import random
+import pytest
+from controllers.subtitle_controller import SubtitleController
+from models.subtitle import Subtitle
+
+
+def make_controller(times):
+    controller = SubtitleController(None, [Subtitle(start, end, f'{start}') for start, end in times])
+    controller.start()
+    return controller
+
+
+def brute_force(times, t):
+    return [i for i, (start, end) in enumerate(times) if start <= t <= end]
+
+
+def test_overlapping_subtitle_stays_on_screen():
+    controller = make_controller([(0.0, 5.0), (3.0, 4.0), (6.0, 7.0)])
+    assert controller.indices_at(3.5) == [0, 1]
+    # Второй субтитр закончился, первый ещё на экране
+    controller.subtitle_at(4.5)
+    assert controller.current_indices == [0]
+    assert controller.get_current_subtitle() is controller.subtitles[0]
+    controller.subtitle_at(5.5)
+    assert controller.current_indices == [] and controller.get_current_subtitle() is None
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_playback_with_seeks_matches_brute_force(seed):
+    rng = random.Random(seed)
+    starts = sorted(rng.uniform(0, 100) for _ in range(80))
+    times = [(start, start + (rng.uniform(5, 15) if rng.random() < 0.2 else rng.uniform(0.5, 3))) for start in starts]
+    controller = make_controller(times)
+    t = -1.0
+    while t < 110:
+        t = rng.uniform(-1, 110) if rng.random() < 0.02 else t + 1 / 30
+        controller.subtitle_at(t)
+        expected = brute_force(times, t)
+        assert controller.current_indices == expected
+        assert controller.current_index == (expected[-1] if expected else -1)
+
+
+def test_stopped_controller_shows_nothing():
+    controller = make_controller([(0.0, 5.0)])
+    controller.stop()
+    assert controller.subtitle_at(1.0) is None
+    assert controller.current_indices == []
@@ -0,0 +1,51 @@
+# tests/test_ultrastar_importer.py
+
+import os
+from utils.ultrastar_importer import UltraStarImporter, MANIFEST_FILE
+
+SONG = """#TITLE:Test Song
+#ARTIST:Tester
+#BPM:120
+#GAP:0
+: 0 4 60 Hel
+: 4 4 62 lo
+- 10
+: 12 4 64 world
+E
+"""
+
+
+def write_library(path, names):
+    for name in names:
+        os.makedirs(path / name)
+        (path / name / 'song.txt').write_text(SONG, encoding='utf-8')
+
+
+def test_second_run_skips_imported_songs(tmp_path):
+    write_library(tmp_path / 'source', ['A', 'B'])
+    songs = tmp_path / 'songs'
+    assert UltraStarImporter(str(tmp_path / 'source'), str(songs), workers=1).run()['imported'] == 2
+    assert UltraStarImporter(str(tmp_path / 'source'), str(songs), workers=1).run()['total'] == 0
+
+
+def test_folders_missing_from_manifest_are_reused(tmp_path):
+    # Как после прерванного запуска: папки песен записаны, манифест - нет
+    write_library(tmp_path / 'source', ['A', 'B'])
+    songs = tmp_path / 'songs'
+    UltraStarImporter(str(tmp_path / 'source'), str(songs), workers=1).run()
+    os.remove(songs / MANIFEST_FILE)
+
+    result = UltraStarImporter(str(tmp_path / 'source'), str(songs), workers=1).run()
+    assert result['imported'] == 2
+    assert sorted(name for name in os.listdir(songs) if name != MANIFEST_FILE) == ['A', 'B']
+
+
+def test_foreign_folder_with_same_name_is_not_overwritten(tmp_path):
+    write_library(tmp_path / 'source', ['A'])
+    songs = tmp_path / 'songs'
+    os.makedirs(songs / 'A')
+    (songs / 'A' / 'info.json').write_text('{"name": "Other"}', encoding='utf-8')
+
+    UltraStarImporter(str(tmp_path / 'source'), str(songs), workers=1).run()
+    assert (songs / 'A' / 'info.json').read_text(encoding='utf-8') == '{"name": "Other"}'
+    assert os.path.isfile(songs / 'A (2)' / 'info.json')